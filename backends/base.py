@@ -0,0 +1,92 @@
+class Action:
+    """
+    The action enumeration contains the kinds of input a backend injects. An action is a tuple of its kind and the
+    arguments of the backend method of the same name, e.g. (KEY_PRESS, keys) or (MOUSE_CLICK, x, y, down, left).
+
+    Attributes:
+        KEY_PRESS: A keyboard press.
+        MOUSE_CLICK: A mouse click.
+        MOUSE_MOVE: A mouse move.
+        MOUSE_WHEEL: A wheel scroll.
+    """
+    KEY_PRESS = 'key_press'
+    MOUSE_CLICK = 'mouse_click'
+    MOUSE_MOVE = 'mouse_move'
+    MOUSE_WHEEL = 'mouse_wheel'
+
+
+class InputBackend:
+    """
+    The operating system facilities used by the listener, recorder and playback: capturing keyboard and mouse events,
+    looking up the process a window belongs to and injecting input.
+    """
+    # Indicates if capture can run on a thread of the calling process. Backends that need a message loop on their own
+    # main thread, such as the Win32 hooks, are run in a separate process instead.
+    IN_PROCESS = False
+
+    def capture(self, on_mouse_event, on_keyboard_event):
+        """
+        Captures keyboard and mouse events, blocking until capture is stopped. Events are raw, un-decorated events with
+        the same attributes as pyHook's MouseEvent and KeyboardEvent.
+        :param on_mouse_event: The function called for every mouse click, move and wheel scroll, taking the event and
+                               the is_left, is_right, is_down, is_up, is_move and is_wheel keyword arguments.
+        :param on_keyboard_event: The function called for every key press, taking the event and if the key is down.
+        """
+        raise NotImplementedError()
+
+    def stop_capture(self):
+        """
+        Stops capturing events. Backends that can't be stopped from outside of the capturing thread ignore this.
+        """
+        pass
+
+    def get_window_process_id(self, window):
+        """
+        Gets the process that owns a window.
+        :param window: The window handle.
+        :return: The process identifier.
+        """
+        raise NotImplementedError()
+
+    def key_press(self, keys):
+        """
+        Injects a keyboard press.
+        :param keys: The SendKeys command to inject.
+        """
+        raise NotImplementedError()
+
+    def mouse_click(self, x, y, down, left):
+        """
+        Injects a mouse click.
+        :param x: The x-coordinate of the click.
+        :param y: The y-coordinate of the click.
+        :param down: Indicates if the click is a press down.
+        :param left: Indicates if the click is with the left button.
+        """
+        raise NotImplementedError()
+
+    def mouse_move(self, x, y):
+        """
+        Injects a mouse move.
+        :param x: The x-coordinate to move to.
+        :param y: The y-coordinate to move to.
+        """
+        raise NotImplementedError()
+
+    def mouse_wheel(self, x, y, wheel):
+        """
+        Injects a wheel scroll.
+        :param x: The x-coordinate of the scroll.
+        :param y: The y-coordinate of the scroll.
+        :param wheel: The number of notches scrolled, positive to scroll away from the user.
+        """
+        raise NotImplementedError()
+
+    def inject(self, actions):
+        """
+        Injects a batch of input that is due at the same time. Backends that can submit several actions in one call
+        override this, the default makes a call per action.
+        :param actions: The list of Action tuples, in the order they're injected.
+        """
+        for action in actions:
+            getattr(self, action[0])(*action[1:])
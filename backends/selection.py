@@ -0,0 +1,77 @@
+import os
+import sys
+
+import recording.exceptions as exceptions
+
+ArgumentError = exceptions.ArgumentError
+
+
+class Backend:
+    """
+    The backend enumeration contains the input backends that can be selected.
+
+    Attributes:
+        WIN32: pyHook's global hooks with pywin32 injection, Windows only.
+        SIMULATED: A headless backend that generates synthetic input and records injected input.
+    """
+    WIN32 = 'win32'
+    SIMULATED = 'simulated'
+
+
+# The environment variable that overrides the backend chosen for the platform
+ENVIRONMENT_VARIABLE = 'KEY_FERRY_BACKEND'
+
+_backend = None
+
+
+def default_backend():
+    """
+    Gets the backend to use when none was set: the environment variable if present, otherwise WIN32 on Windows and
+    SIMULATED everywhere else.
+    :return: The Backend.
+    """
+    kind = os.environ.get(ENVIRONMENT_VARIABLE)
+    if kind:
+        return kind.lower()
+    return Backend.WIN32 if sys.platform == 'win32' else Backend.SIMULATED
+
+
+def create_backend(kind=None, **kwargs):
+    """
+    Creates an input backend. The backend's module is only imported when it's created, so the Win32 dependencies are
+    never needed by the simulated backend.
+    :param kind: The Backend to create, default_backend() if None.
+    :param kwargs: The keyword arguments passed to the backend's constructor.
+    :return: The new backend.
+    :exception ArgumentError: Thrown if the backend is unknown.
+    """
+    kind = kind or default_backend()
+    if kind == Backend.WIN32:
+        import backends.win32 as win32
+        return win32.Win32Backend(**kwargs)
+    elif kind == Backend.SIMULATED:
+        import backends.simulated as simulated
+        return simulated.SimulatedBackend(**kwargs)
+    raise ArgumentError("unknown input backend '%s'" % kind)
+
+
+def get_backend():
+    """
+    Gets the backend shared by the listener, recorder and playback of this process, creating the default backend the
+    first time it's called.
+    :return: The shared backend.
+    """
+    global _backend
+    if _backend is None:
+        _backend = create_backend()
+    return _backend
+
+
+def set_backend(backend):
+    """
+    Sets the backend shared by the listener, recorder and playback of this process. Must be called before the
+    WindowsListener is first created.
+    :param backend: The backend to share, or None to go back to the default backend.
+    """
+    global _backend
+    _backend = backend
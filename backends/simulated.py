@@ -0,0 +1,291 @@
+import collections
+import os
+import random
+import threading
+import time
+
+import backends.base as base
+import utilities.converter as converter
+import utilities.metrics as metrics
+
+# Window messages reported by the simulated events, the same values the hooks report
+WM_KEYDOWN = 0x0100
+WM_KEYUP = 0x0101
+WM_MOUSEMOVE = 0x0200
+WM_LBUTTONDOWN = 0x0201
+WM_LBUTTONUP = 0x0202
+WM_RBUTTONDOWN = 0x0204
+WM_RBUTTONUP = 0x0205
+
+VK_RETURN = 0x0D
+VK_SPACE = 0x20
+VK_LSHIFT = 0xA0
+
+# The keys typed by the simulated user: letters, digits, space and return
+TYPED_KEYS = list(range(0x41, 0x5B)) + list(range(0x30, 0x3A)) + [VK_SPACE, VK_RETURN]
+
+
+def _hook_time():
+    """
+    Gets the time the hooks report, milliseconds since boot wrapping at 32 bits.
+    :return: The integer milliseconds.
+    """
+    return int(time.monotonic() * 1000) & 0xFFFFFFFF
+
+
+class SimulatedKeyboardEvent:
+    """
+    A raw keyboard event with the same attributes as pyHook's KeyboardEvent.
+    """
+
+    def __init__(self, key_id, is_down, window, window_name, injected=False):
+        """
+        Initializes a new instance of the SimulatedKeyboardEvent class.
+        :param key_id: The virtual key code.
+        :param is_down: True if the key was pressed, false if it was released.
+        :param window: The window handle.
+        :param window_name: The name of the window.
+        :param injected: True if the event was injected rather than typed.
+        """
+        self.Message = WM_KEYDOWN if is_down else WM_KEYUP
+        self.MessageName = 'key down' if is_down else 'key up'
+        self.Time = _hook_time()
+        self.Window = window
+        self.WindowName = window_name
+        self.KeyID = key_id
+        self.ScanCode = key_id & 0x7F
+        self.Ascii = key_id if key_id in TYPED_KEYS else 0
+        self.Key = converter.to_key_name(key_id)
+        self.Extended = False
+        self.Injected = injected
+        self.Alt = False
+        self.Transition = 0 if is_down else 1
+
+
+class SimulatedMouseEvent:
+    """
+    A raw mouse event with the same attributes as pyHook's MouseEvent.
+    """
+
+    def __init__(self, message, x, y, window, window_name, injected=False):
+        """
+        Initializes a new instance of the SimulatedMouseEvent class.
+        :param message: The window message of the click.
+        :param x: The x-coordinate of the click.
+        :param y: The y-coordinate of the click.
+        :param window: The window handle.
+        :param window_name: The name of the window.
+        :param injected: True if the event was injected rather than clicked.
+        """
+        self.Message = message
+        self.MessageName = 'mouse click'
+        self.Time = _hook_time()
+        self.Window = window
+        self.WindowName = window_name
+        self.Position = (x, y)
+        self.Wheel = 0
+        self.Injected = injected
+
+
+class SimulatedBackend(base.InputBackend):
+    """
+    A headless backend that generates a reproducible stream of typing and clicking at a configurable rate and records
+    the input injected into it instead of sending it to the operating system. Capture runs on a thread of the calling
+    process.
+    """
+    IN_PROCESS = True
+
+    # Events generated per second
+    DEFAULT_RATE = 100.0
+    DEFAULT_WINDOW_NAMES = ('Untitled - Notepad', 'Command Prompt', 'Inbox - Outlook', 'Key Ferry',
+                            'Google - Mozilla Firefox', 'Book1 - Excel')
+    # The window owned by the calling process, so the recorder's ignore logic is exercised
+    OWN_WINDOW_NAME = 'Key Ferry'
+
+    def __init__(self, rate=DEFAULT_RATE, count=None, mouse_ratio=0.1, shift_ratio=0.1, move_points=0, seed=0,
+                 window_names=None, paused=False):
+        """
+        Initializes a new instance of the SimulatedBackend class.
+        :param rate: The events generated per second, 0 to generate them as fast as they can be consumed.
+        :param count: The number of events to generate before capture returns, None to generate until stopped.
+        :param mouse_ratio: The fraction of actions that are mouse clicks rather than key presses.
+        :param shift_ratio: The fraction of key presses made while holding shift.
+        :param move_points: The number of mouse moves along the path to every click.
+        :param seed: The random seed.
+        :param window_names: The names of the simulated windows.
+        :param paused: True to hold off generating events until resume is called, so listeners can subscribe first.
+        """
+        self.rate = rate
+        self.count = count
+        self.mouse_ratio = mouse_ratio
+        self.shift_ratio = shift_ratio
+        self.move_points = move_points
+        self.seed = seed
+        self.window_names = list(window_names or SimulatedBackend.DEFAULT_WINDOW_NAMES)
+        self.windows = [0x10000 + index for index in range(len(self.window_names))]
+        self.process_ids = {window: os.getpid() if name == SimulatedBackend.OWN_WINDOW_NAME else 1000 + index
+                            for index, (window, name) in enumerate(zip(self.windows, self.window_names))}
+
+        # Every injected input as a tuple of the method's name and its arguments
+        self.injected = []
+        # The number of injection calls made, a batch counts as one
+        self.calls = 0
+        # Events queued by press_key, delivered ahead of the generated events
+        self.__user_events = collections.deque()
+        self.__stopped = threading.Event()
+        self.__resumed = threading.Event()
+        if not paused:
+            self.__resumed.set()
+
+    def capture(self, on_mouse_event, on_keyboard_event):
+        """
+        Generates events on the calling thread until count events were generated or capture is stopped.
+        :param on_mouse_event: The function called for every mouse click, see InputBackend.capture.
+        :param on_keyboard_event: The function called for every key press, see InputBackend.capture.
+        """
+        self.__stopped.clear()
+        while not self.__resumed.wait(0.05):
+            if self.__stopped.is_set():
+                return
+
+        interval_ns = int(1000000000 / self.rate) if self.rate else 0
+        deadline = metrics.perf_counter_ns()
+        generated = 0
+        actions = self.__generate_actions()
+        while self.count is None or generated < self.count:
+            if interval_ns:
+                deadline += interval_ns
+                remaining = deadline - metrics.perf_counter_ns()
+                if remaining > 0 and self.__stopped.wait(remaining / 1000000000.0):
+                    return
+            if self.__stopped.is_set():
+                return
+
+            if self.__user_events:
+                event, is_down = self.__user_events.popleft()
+                on_keyboard_event(event, is_down)
+                continue
+
+            event, kwargs = next(actions)
+            if isinstance(event, SimulatedMouseEvent):
+                on_mouse_event(event, **kwargs)
+            else:
+                on_keyboard_event(event, **kwargs)
+            generated += 1
+
+    def __generate_actions(self):
+        """
+        Generator over the simulated user's actions.
+        :return: Tuples of the raw event and the keyword arguments of its callback.
+        """
+        rng = random.Random(self.seed)
+        index = 0
+        x, y = 960, 540
+        while True:
+            if rng.random() < self.mouse_ratio:
+                index = rng.randrange(len(self.windows))
+                window, name = self.windows[index], self.window_names[index]
+                start_x, start_y = x, y
+                x, y = rng.randrange(1920), rng.randrange(1080)
+
+                # Move along a gently curving path to the click
+                bend = rng.uniform(-0.25, 0.25)
+                for point in range(1, self.move_points + 1):
+                    fraction = float(point) / self.move_points
+                    offset = bend * fraction * (1 - fraction)
+                    move_x = int(start_x + (x - start_x) * fraction - (y - start_y) * offset)
+                    move_y = int(start_y + (y - start_y) * fraction + (x - start_x) * offset)
+                    yield SimulatedMouseEvent(WM_MOUSEMOVE, move_x, move_y, window, name), {'is_move': True}
+
+                if rng.random() < 0.9:
+                    yield SimulatedMouseEvent(WM_LBUTTONDOWN, x, y, window, name), {'is_left': True, 'is_down': True}
+                    yield SimulatedMouseEvent(WM_LBUTTONUP, x, y, window, name), {'is_left': True, 'is_up': True}
+                else:
+                    yield SimulatedMouseEvent(WM_RBUTTONDOWN, x, y, window, name), {'is_right': True, 'is_down': True}
+                    yield SimulatedMouseEvent(WM_RBUTTONUP, x, y, window, name), {'is_right': True, 'is_up': True}
+                continue
+
+            window, name = self.windows[index], self.window_names[index]
+            key_id = rng.choice(TYPED_KEYS)
+            shifted = rng.random() < self.shift_ratio
+            if shifted:
+                yield SimulatedKeyboardEvent(VK_LSHIFT, True, window, name), {'is_down': True}
+            yield SimulatedKeyboardEvent(key_id, True, window, name), {'is_down': True}
+            yield SimulatedKeyboardEvent(key_id, False, window, name), {'is_down': False}
+            if shifted:
+                yield SimulatedKeyboardEvent(VK_LSHIFT, False, window, name), {'is_down': False}
+
+    def press_key(self, key_id):
+        """
+        Simulates the user pressing and releasing a key, such as F12 to stop a playback. Thread-safe.
+        :param key_id: The virtual key code.
+        """
+        window, name = self.windows[0], self.window_names[0]
+        self.__user_events.append((SimulatedKeyboardEvent(key_id, True, window, name), True))
+        self.__user_events.append((SimulatedKeyboardEvent(key_id, False, window, name), False))
+
+    def resume(self):
+        """
+        Starts generating events if the backend was created paused. Thread-safe.
+        """
+        self.__resumed.set()
+
+    def stop_capture(self):
+        """
+        Stops capturing events. Thread-safe.
+        """
+        self.__stopped.set()
+
+    def get_window_process_id(self, window):
+        """
+        Gets the process that owns a simulated window.
+        :param window: The window handle.
+        :return: The process identifier, 0 for an unknown window.
+        """
+        return self.process_ids.get(window, 0)
+
+    def key_press(self, keys):
+        """
+        Records a keyboard press.
+        :param keys: The SendKeys command.
+        """
+        self.calls += 1
+        self.injected.append(('key_press', keys))
+
+    def mouse_click(self, x, y, down, left):
+        """
+        Records a mouse click.
+        :param x: The x-coordinate of the click.
+        :param y: The y-coordinate of the click.
+        :param down: Indicates if the click is a press down.
+        :param left: Indicates if the click is with the left button.
+        """
+        self.calls += 1
+        self.injected.append(('mouse_click', x, y, down, left))
+
+    def mouse_move(self, x, y):
+        """
+        Records a mouse move.
+        :param x: The x-coordinate to move to.
+        :param y: The y-coordinate to move to.
+        """
+        self.calls += 1
+        self.injected.append(('mouse_move', x, y))
+
+    def mouse_wheel(self, x, y, wheel):
+        """
+        Records a wheel scroll.
+        :param x: The x-coordinate of the scroll.
+        :param y: The y-coordinate of the scroll.
+        :param wheel: The number of notches scrolled, positive to scroll away from the user.
+        """
+        self.calls += 1
+        self.injected.append(('mouse_wheel', x, y, wheel))
+
+    def inject(self, actions):
+        """
+        Records a batch of input as a single injection call.
+        :param actions: The list of Action tuples.
+        """
+        self.calls += 1
+        self.injected.extend(tuple(x) for x in actions)
@@ -0,0 +1,203 @@
+from __future__ import print_function
+
+import threading
+
+import pyHook
+import pythoncom
+import win32api
+import win32com.client
+import win32con
+import win32process
+
+import backends.base as base
+
+
+class Win32Backend(base.InputBackend):
+    """
+    Captures input with pyHook's global hooks and injects it with the WScript.Shell and win32api. The shell is created
+    once per thread and reused for every key press of the playback.
+    """
+    IN_PROCESS = False
+
+    def __init__(self):
+        """
+        Initializes a new instance of the Win32Backend class.
+        """
+        self.__local = threading.local()
+
+    def __getstate__(self):
+        """
+        Pickles the backend so it can be handed to the hook manager's process. The shells are COM objects bound to
+        the threads that created them, so the thread-local holding them is left behind.
+        """
+        state = self.__dict__.copy()
+        del state['_Win32Backend__local']
+        return state
+
+    def __setstate__(self, state):
+        """
+        Restores a backend pickled for the hook manager's process with a thread-local of its own.
+        """
+        self.__dict__.update(state)
+        self.__local = threading.local()
+
+    def capture(self, on_mouse_event, on_keyboard_event):
+        """
+        Hooks onto the global keyboard and mouse events and pumps messages until the process ends.
+        :param on_mouse_event: The function called for every mouse click, see InputBackend.capture.
+        :param on_keyboard_event: The function called for every key press, see InputBackend.capture.
+        """
+        # Create the hook manager
+        hook_manager = pyHook.HookManager()
+
+        # Register mouse and keyboard events globally
+        hook_manager.MouseLeftDown = lambda event: on_mouse_event(event, is_left=True, is_down=True)
+        hook_manager.MouseLeftUp = lambda event: on_mouse_event(event, is_left=True, is_up=True)
+        hook_manager.MouseRightDown = lambda event: on_mouse_event(event, is_right=True, is_down=True)
+        hook_manager.MouseRightUp = lambda event: on_mouse_event(event, is_right=True, is_up=True)
+        hook_manager.MouseMove = lambda event: on_mouse_event(event, is_move=True)
+        hook_manager.MouseWheel = lambda event: on_mouse_event(event, is_wheel=True)
+        hook_manager.KeyDown = lambda event: on_keyboard_event(event, True)
+        hook_manager.KeyUp = lambda event: on_keyboard_event(event, False)
+
+        # Hook into the mouse and keyboard events
+        hook_manager.HookMouse()
+        hook_manager.HookKeyboard()
+
+        # Suspend the thread indefinitely waiting for callbacks
+        pythoncom.PumpMessages()
+
+    def get_window_process_id(self, window):
+        """
+        Gets the process that owns a window.
+        :param window: The window handle.
+        :return: The process identifier.
+        """
+        _, process_id = win32process.GetWindowThreadProcessId(window)
+        return process_id
+
+    def __get_shell(self):
+        """
+        Gets the calling thread's WScript.Shell, creating it the first time. COM objects can't be shared between
+        threads, so every thread that injects keys has its own.
+        :return: The shell.
+        """
+        shell = getattr(self.__local, 'shell', None)
+        if shell is None:
+            if threading.current_thread() is not threading.main_thread():
+                pythoncom.CoInitialize()
+            shell = self.__local.shell = win32com.client.Dispatch("WScript.Shell")
+        return shell
+
+    def key_press(self, keys):
+        """
+        Injects a keyboard press through the WScript.Shell.
+        :param keys: The SendKeys command to inject.
+        """
+        try:
+            self.__get_shell().SendKeys(keys)
+        except Exception as e:
+            e_msg = win32api.FormatMessage(e.excepinfo[5])
+            print("Failure replaying the '", keys, "' key with the following exception: ", e_msg, end='', sep='')
+
+            # if is_down_only:
+            #     win32api.keybd_event(key_id, 0, win32con.KEYEVENTF_EXTENDEDKEY, 0)
+            # elif is_up_only:
+            #     win32api.keybd_event(key_id, 0, win32con.KEYEVENTF_EXTENDEDKEY | win32con.KEYEVENTF_KEYUP, 0)
+            # else:
+            #     win32api.keybd_event(key_id, 0, 0, 0)
+
+    def mouse_click(self, x, y, down, left):
+        """
+        Injects a mouse click.
+        :param x: The x-coordinate of the click.
+        :param y: The y-coordinate of the click.
+        :param down: Indicates if the click is a press down.
+        :param left: Indicates if the click is with the left button.
+        """
+        win32api.SetCursorPos((x, y))
+        win32api.mouse_event(self.__click_code(down, left), x, y, 0, 0)
+
+    @staticmethod
+    def __click_code(down, left):
+        """
+        Gets the mouse_event flag of a click.
+        :param down: Indicates if the click is a press down.
+        :param left: Indicates if the click is with the left button.
+        :return: The MOUSEEVENTF flag.
+        """
+        if down:
+            if left:
+                return win32con.MOUSEEVENTF_LEFTDOWN
+            return win32con.MOUSEEVENTF_RIGHTDOWN
+        if left:
+            return win32con.MOUSEEVENTF_LEFTUP
+        return win32con.MOUSEEVENTF_RIGHTUP
+
+    def mouse_move(self, x, y):
+        """
+        Injects a mouse move.
+        :param x: The x-coordinate to move to.
+        :param y: The y-coordinate to move to.
+        """
+        win32api.SetCursorPos((x, y))
+
+    def mouse_wheel(self, x, y, wheel):
+        """
+        Injects a wheel scroll.
+        :param x: The x-coordinate of the scroll.
+        :param y: The y-coordinate of the scroll.
+        :param wheel: The number of notches scrolled, positive to scroll away from the user.
+        """
+        win32api.SetCursorPos((x, y))
+        win32api.mouse_event(win32con.MOUSEEVENTF_WHEEL, x, y, wheel * win32con.WHEEL_DELTA, 0)
+
+    def inject(self, actions):
+        """
+        Injects a batch of input that is due at the same time with as few calls as possible. A run of key presses is
+        sent as one SendKeys command, the cursor is only positioned when it moves and the clicks at one position are
+        combined into one mouse_event where their order allows.
+        :param actions: The list of Action tuples, in the order they're injected.
+        """
+        keys = []
+        position = None
+        flags = 0
+        for action in actions:
+            kind = action[0]
+            if kind == base.Action.KEY_PRESS:
+                if flags:
+                    win32api.mouse_event(flags, position[0], position[1], 0, 0)
+                    flags = 0
+                keys.append(action[1])
+                continue
+
+            if keys:
+                self.key_press(''.join(keys))
+                keys = []
+
+            x, y = action[1], action[2]
+            if (x, y) != position:
+                if flags:
+                    win32api.mouse_event(flags, position[0], position[1], 0, 0)
+                    flags = 0
+                win32api.SetCursorPos((x, y))
+                position = (x, y)
+
+            if kind == base.Action.MOUSE_CLICK:
+                code = self.__click_code(action[3], action[4])
+                if flags >= code:
+                    # Combined flags are applied lowest bit first, a click that must come after a higher flag, such as
+                    # the second press of a double click, needs its own call
+                    win32api.mouse_event(flags, x, y, 0, 0)
+                    flags = 0
+                flags |= code
+            elif kind == base.Action.MOUSE_WHEEL:
+                if flags:
+                    win32api.mouse_event(flags, x, y, 0, 0)
+                    flags = 0
+                win32api.mouse_event(win32con.MOUSEEVENTF_WHEEL, x, y, action[3] * win32con.WHEEL_DELTA, 0)
+
+        if keys:
+            self.key_press(''.join(keys))
+        if flags:
+            win32api.mouse_event(flags, position[0], position[1], 0, 0)
@@ -0,0 +1,130 @@
+"""
+Measures the compression ratio and the encode and decode throughput of recording archives with each codec, against
+the raw event log and the generated playback script, and checks that archives stream without their index, survive
+truncation, catch corruption and convert to the same script as the events they hold.
+
+Usage: python -m benchmarks.archive [event count]
+"""
+import io
+import sys
+import time
+
+import benchmarks.synthetic as synthetic
+import playback.playback as playback
+import recording.archive as archive
+import recording.event_log as event_log
+
+ArchiveCodec = archive.ArchiveCodec
+
+
+class _Unseekable(io.RawIOBase):
+    """
+    Read-only view of a bytes object that can't seek, like a pipe.
+    """
+
+    def __init__(self, data):
+        """
+        Initializes a new instance of the _Unseekable class.
+        :param data: The bytes to read.
+        """
+        self.__file = io.BytesIO(data)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self.__file.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def encode(events, codec):
+    """
+    Writes events to an archive.
+    :param events: The events.
+    :param codec: The ArchiveCodec.
+    :return: Tuple of the seconds it took and the archive's bytes.
+    """
+    file = io.BytesIO()
+    start = time.perf_counter()
+    writer = archive.ArchiveWriter(file, codec)
+    for event in events:
+        writer.append(event)
+    writer.close()
+    return time.perf_counter() - start, file.getvalue()
+
+
+def decode(data):
+    """
+    Reads every event of an archive, sequentially.
+    :param data: The archive's bytes.
+    :return: Tuple of the seconds it took and the number of events read.
+    """
+    start = time.perf_counter()
+    count = sum(1 for _ in archive.ArchiveReader(io.BytesIO(data)))
+    return time.perf_counter() - start, count
+
+
+def script(events):
+    """
+    Converts events to a playback script.
+    :param events: The events, or the string filename of a recording.
+    :return: The script.
+    """
+    file = io.StringIO()
+    playback.WindowsPlaybackManager.create_executable_playback_file(file, events)
+    return file.getvalue()
+
+
+def run(count):
+    """
+    Runs the benchmark.
+    :param count: The number of events.
+    :return: Dictionary of results.
+    """
+    events = synthetic.generate_events(count)
+    log = io.BytesIO()
+    writer = event_log.EventLogWriter(log)
+    for event in events:
+        writer.append(event)
+    results = {'events': count, 'event_log_bytes': len(log.getvalue()),
+               'script_bytes': len(script(events).encode('utf-8'))}
+
+    for codec in (ArchiveCodec.ZLIB, ArchiveCodec.LZMA):
+        seconds, data = min((encode(events, codec) for _ in range(3)), key=lambda x: x[0])
+        results['%s_bytes' % codec] = len(data)
+        results['%s_ratio' % codec] = float(results['event_log_bytes']) / len(data)
+        results['%s_ratio_to_script' % codec] = float(results['script_bytes']) / len(data)
+        results['%s_encode_events_per_second' % codec] = count / seconds
+        seconds, decoded = min(decode(data) for _ in range(3))
+        results['%s_decode_events_per_second' % codec] = count / seconds
+        results['%s_decoded_all' % codec] = decoded == count
+
+    # Streaming from a pipe, without the index at the end of the file
+    _, data = encode(events, ArchiveCodec.ZLIB)
+    streamed = archive.ArchiveReader(io.BufferedReader(_Unseekable(data)))
+    results['streamed_without_index'] = streamed.index is None and sum(1 for _ in streamed) == count
+
+    # A recording cut short keeps every complete chunk
+    truncated = archive.ArchiveReader(io.BytesIO(data[:len(data) // 2]))
+    results['truncated_events_read'] = sum(1 for _ in truncated)
+
+    # A flipped bit is caught rather than played back
+    corrupt = bytearray(data)
+    corrupt[archive.HEADER.size + archive.CHUNK.size + 100] ^= 0x01
+    try:
+        sum(1 for _ in archive.ArchiveReader(io.BytesIO(bytes(corrupt))))
+        results['corruption_detected'] = False
+    except archive.ArchiveError:
+        results['corruption_detected'] = True
+
+    # Converting the archive gives the same script as converting the events
+    reader = archive.ArchiveReader(io.BytesIO(data))
+    results['same_script'] = script(reader) == script(events)
+    return results
+
+
+if __name__ == '__main__':
+    results = run(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
+    for name, value in results.items():
+        print('%-36s %12s' % (name, round(value, 2) if isinstance(value, float) else value))
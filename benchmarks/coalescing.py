@@ -0,0 +1,115 @@
+"""
+Measures how much keystroke coalescing shrinks the playback script and the number of injections of a text-heavy
+recording.
+
+Usage: python -m benchmarks.coalescing [word count]
+"""
+import io
+import random
+import sys
+
+import backends.simulated as simulated
+import playback.preprocessing as preprocessing
+import playback.script_writer as script_writer
+import recording.constants as constants
+
+WORDS = ['the', 'quick', 'brown', 'fox', 'jumps', 'over', 'lazy', 'dog', 'key', 'ferry', 'records', 'every',
+         'keystroke', 'and', 'click', 'playback', 'script', 'window', 'report', 'meeting', 'tomorrow', '2024']
+
+VK_BACK = 0x08
+VK_RETURN = 0x0D
+VK_SPACE = 0x20
+
+
+def keystroke(key_id, timestamp, shift=False):
+    """
+    Creates a recorded key down event.
+    :param key_id: The virtual key code.
+    :param timestamp: The capture timestamp in nanoseconds.
+    :param shift: True if shift was held.
+    :return: The event.
+    """
+    event = simulated.SimulatedKeyboardEvent(key_id, True, 0x10000, 'Untitled - Notepad')
+    event.Type = constants.EventType.KEYBOARD
+    event.Is_Down = True
+    event.Timestamp = timestamp
+    event.Is_Shift = shift
+    event.Is_Ctrl = False
+    event.Is_Alt = False
+    return event
+
+
+def generate_typing(words, seed=0):
+    """
+    Generates a reproducible recording of someone typing sentences, fixing the odd typo with backspace.
+    :param words: The number of words to type.
+    :param seed: The random seed.
+    :return: The list of recorded events.
+    """
+    rng = random.Random(seed)
+    events = []
+    timestamp = 0
+    capitalize = True
+    for index in range(words):
+        word = rng.choice(WORDS)
+        for position, character in enumerate(word.upper()):
+            timestamp += rng.randrange(60000000, 200000000)
+            events.append(keystroke(ord(character), timestamp, capitalize and position == 0))
+        capitalize = False
+
+        if rng.random() < 0.05:
+            for _ in range(rng.randrange(2, 5)):
+                timestamp += rng.randrange(80000000, 150000000)
+                events.append(keystroke(VK_BACK, timestamp))
+
+        # Think before the next word, or end the sentence
+        timestamp += rng.randrange(100000000, 600000000)
+        if index % 12 == 11:
+            events.append(keystroke(VK_RETURN, timestamp))
+            capitalize = True
+        else:
+            events.append(keystroke(VK_SPACE, timestamp))
+    return events
+
+
+def measure(events, preprocessor):
+    """
+    Writes the events to a playback script.
+    :param events: The recorded events.
+    :param preprocessor: The EventPreprocessor to use.
+    :return: Tuple of the number of steps and the script's size in bytes.
+    """
+    script = io.StringIO()
+    writer = script_writer.PlaybackScriptWriter(script, preprocessor)
+    for event in events:
+        writer.append(event)
+    writer.close()
+    return preprocessor.steps, len(script.getvalue())
+
+
+def run(words):
+    """
+    Runs the benchmark.
+    :param words: The number of words typed.
+    :return: Dictionary of results.
+    """
+    events = generate_typing(words)
+    steps, size = measure(events, preprocessing.EventPreprocessor(max_run=1))
+    preprocessor = preprocessing.EventPreprocessor()
+    coalesced_steps, coalesced_size = measure(events, preprocessor)
+    return {
+        'keystrokes': len(events),
+        'steps': steps,
+        'coalesced_steps': coalesced_steps,
+        'saved_events': preprocessor.saved_events,
+        'script_bytes': size,
+        'coalesced_script_bytes': coalesced_size,
+        'step_reduction': float(steps) / coalesced_steps,
+        'size_reduction': float(size) / coalesced_size,
+    }
+
+
+if __name__ == '__main__':
+    results = run(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
+    for name, value in results.items():
+        print('%-30s %12s' % (name, round(value, 2) if isinstance(value, float) else value))
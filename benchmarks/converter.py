@@ -0,0 +1,83 @@
+"""
+Compares translating a million keystrokes to SendKeys commands one at a time by key name, one at a time from the
+precomputed table and in a single batch, and checks that all of them give the same commands.
+
+Usage: python -m benchmarks.converter [keystroke count]
+"""
+import random
+import sys
+import time
+
+import benchmarks.synthetic as synthetic
+import utilities.converter as converter
+
+
+def generate_keystrokes(count, seed=0):
+    """
+    Generates key presses held with modifiers, one in twenty of them repeated a few times.
+    :param count: The number of key presses.
+    :param seed: The random seed.
+    :return: Tuple of the list of keyboard events and the list of the times each key was pressed.
+    """
+    rng = random.Random(seed)
+    events = [x for x in synthetic.iterate_events(count * 2, seed, mouse_ratio=0.0) if x.Is_Down][:count]
+    times = [rng.randint(2, 4) if rng.random() < 0.05 else 1 for _ in events]
+    return events, times
+
+
+def by_name(events, times):
+    """
+    Translates keystrokes with to_send_key.
+    """
+    to_send_key = converter.to_send_key
+    return [to_send_key(x.Key, x.Is_Ctrl, x.Is_Alt, x.Is_Shift, count) for x, count in zip(events, times)]
+
+
+def by_code(events, times):
+    """
+    Translates keystrokes with to_send_key_code.
+    """
+    to_send_key_code = converter.to_send_key_code
+    to_modifiers = converter.to_modifiers
+    return [to_send_key_code(x.KeyID, to_modifiers(x), count) for x, count in zip(events, times)]
+
+
+def run(count):
+    """
+    Runs the benchmark.
+    :param count: The number of keystrokes.
+    :return: Dictionary of results.
+    """
+    events, times = generate_keystrokes(count)
+    once = [1] * len(events)
+    runs = [
+        ('by_name', by_name, times),
+        ('by_code', by_code, times),
+        ('batch', converter.events_to_send_keys, times),
+        ('by_name_once', by_name, once),
+        ('batch_once', lambda x, _: converter.events_to_send_keys(x), once),
+    ]
+
+    results = {'keystrokes': len(events)}
+    commands = {}
+    for name, function, counts in runs:
+        best = None
+        for _ in range(3):
+            start = time.perf_counter()
+            commands[name] = function(events, counts)
+            seconds = time.perf_counter() - start
+            best = seconds if best is None else min(best, seconds)
+        results['%s_ns_per_key' % name] = best / len(events) * 1e9
+
+    results['by_code_speedup'] = results['by_name_ns_per_key'] / results['by_code_ns_per_key']
+    results['batch_speedup'] = results['by_name_ns_per_key'] / results['batch_ns_per_key']
+    results['batch_once_speedup'] = results['by_name_once_ns_per_key'] / results['batch_once_ns_per_key']
+    results['same_commands'] = (commands['by_name'] == commands['by_code'] == commands['batch'] and
+                                commands['by_name_once'] == commands['batch_once'])
+    return results
+
+
+if __name__ == '__main__':
+    results = run(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
+    for name, value in results.items():
+        print('%-30s %12s' % (name, round(value, 2) if isinstance(value, float) else value))
@@ -0,0 +1,132 @@
+"""
+Measures how well mouse moves are decimated on a synthetic high rate stream of drags: the compression of the hook's
+MoveFilter and of the recorder's PathDecimator, the throughput of both, and the furthest any dropped move is from the
+recorded path.
+
+Usage: python -m benchmarks.decimation [drag count] [moves per second]
+"""
+import math
+import random
+import sys
+import time
+
+import backends.simulated as simulated
+import utilities.decimation as decimation
+
+
+def generate_drags(count, rate, seed=0):
+    """
+    Generates a reproducible stream of mouse moves: curved drags across the screen with hand jitter, separated by
+    pauses.
+    :param count: The number of drags.
+    :param rate: The moves reported per second while the mouse is moving.
+    :param seed: The random seed.
+    :return: The list of moves.
+    """
+    rng = random.Random(seed)
+    interval = int(1000000000 / rate)
+    events = []
+    timestamp = 0
+    x, y = 960.0, 540.0
+    for _ in range(count):
+        target_x, target_y = rng.uniform(0, 1919), rng.uniform(0, 1079)
+        bend = rng.uniform(-0.4, 0.4)
+        points = int(math.hypot(target_x - x, target_y - y) / rng.uniform(1.0, 4.0)) + 2
+        start_x, start_y = x, y
+        for point in range(1, points + 1):
+            fraction = float(point) / points
+            offset = bend * fraction * (1 - fraction)
+            x = start_x + (target_x - start_x) * fraction - (target_y - start_y) * offset + rng.uniform(-0.6, 0.6)
+            y = start_y + (target_y - start_y) * fraction + (target_x - start_x) * offset + rng.uniform(-0.6, 0.6)
+            timestamp += interval
+            event = simulated.SimulatedMouseEvent(simulated.WM_MOUSEMOVE, int(round(x)), int(round(y)), 0x10000,
+                                                  'Untitled - Notepad')
+            event.Timestamp = timestamp
+            events.append(event)
+        timestamp += int(rng.uniform(0.3, 1.5) * 1000000000)
+    return events
+
+
+def deviation(original, kept):
+    """
+    Finds the furthest any original move is from the path through the kept moves.
+    :param original: The moves before decimation.
+    :param kept: The moves kept, a subsequence of original.
+    :return: The largest distance in pixels.
+    """
+    worst = 0.0
+    positions = {id(x): index for index, x in enumerate(original)}
+    indices = [positions[id(x)] for x in kept]
+    for first, last in zip(indices, indices[1:]):
+        x0, y0 = original[first].Position
+        x1, y1 = original[last].Position
+        length = math.hypot(x1 - x0, y1 - y0)
+        for index in range(first + 1, last):
+            px, py = original[index].Position
+            if length:
+                distance = abs((px - x0) * (y1 - y0) - (py - y0) * (x1 - x0)) / length
+            else:
+                distance = math.hypot(px - x0, py - y0)
+            worst = max(worst, distance)
+    return worst
+
+
+def run_decimator(events, use_numpy):
+    """
+    Runs the moves through a PathDecimator.
+    :param events: The moves.
+    :param use_numpy: True to simplify with NumPy, false for pure Python.
+    :return: Tuple of the moves kept and the seconds it took.
+    """
+    decimator = decimation.PathDecimator(use_numpy=use_numpy)
+    kept = []
+    start = time.perf_counter()
+    for event in events:
+        kept.extend(decimator.append(event))
+    kept.extend(decimator.flush())
+    return kept, time.perf_counter() - start
+
+
+def run(count, rate):
+    """
+    Runs the benchmark.
+    :param count: The number of drags.
+    :param rate: The moves reported per second while the mouse is moving.
+    :return: Dictionary of results.
+    """
+    events = generate_drags(count, rate)
+
+    move_filter = decimation.MoveFilter()
+    start = time.perf_counter()
+    filtered = [x for x in events if move_filter.accept(x)]
+    filter_seconds = time.perf_counter() - start
+
+    kept, decimator_seconds = run_decimator(filtered, False)
+    results = {
+        'moves': len(events),
+        'filtered_moves': len(filtered),
+        'recorded_moves': len(kept),
+        'moves_per_drag': float(len(kept)) / count,
+        'filter_compression': float(len(events)) / len(filtered),
+        'total_compression': float(len(events)) / len(kept),
+        'max_deviation_px': deviation(filtered, kept),
+        'filter_moves_per_second': len(events) / filter_seconds,
+        'python_decimator_moves_per_second': len(filtered) / decimator_seconds,
+    }
+    # Longer paths, as if the hook didn't filter, favour NumPy
+    _, raw_seconds = run_decimator(events, False)
+    results['python_unfiltered_moves_per_second'] = len(events) / raw_seconds
+    if decimation.numpy is not None:
+        numpy_kept, numpy_seconds = run_decimator(filtered, True)
+        results['numpy_decimator_moves_per_second'] = len(filtered) / numpy_seconds
+        results['numpy_matches_python'] = [id(x) for x in numpy_kept] == [id(x) for x in kept]
+        _, raw_seconds = run_decimator(events, True)
+        results['numpy_unfiltered_moves_per_second'] = len(events) / raw_seconds
+    return results
+
+
+if __name__ == '__main__':
+    results = run(int(sys.argv[1]) if len(sys.argv) > 1 else 200,
+                  int(sys.argv[2]) if len(sys.argv) > 2 else 500)
+    for name, value in results.items():
+        print('%-36s %12s' % (name, round(value, 2) if isinstance(value, float) else value))
@@ -0,0 +1,94 @@
+"""
+Compares the compact EventLog against the original path of appending decorated pyHook events to a
+multiprocessing.Manager().list().
+
+Usage: python -m benchmarks.event_log [event count]
+"""
+import multiprocessing
+import pickle
+import sys
+import time
+import tracemalloc
+
+import benchmarks.synthetic as synthetic
+import recording.event_log as event_log
+
+
+def measure_memory(build):
+    """
+    Measures the memory retained by the object returned from build.
+    :param build: Function building the collection to measure.
+    :return: The number of bytes retained.
+    """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    collection = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del collection
+    return after - before
+
+
+def manager_list_append(events):
+    """
+    Appends every event to a manager list, the way the recorder used to.
+    :param events: The events to append.
+    :return: The seconds taken.
+    """
+    manager = multiprocessing.Manager()
+    try:
+        recorded_events = manager.list()
+        start = time.perf_counter()
+        for event in events:
+            recorded_events.append(event)
+        return time.perf_counter() - start
+    finally:
+        manager.shutdown()
+
+
+def event_log_append(events):
+    """
+    Appends every event to an EventLog.
+    :param events: The events to append.
+    :return: The seconds taken.
+    """
+    log = event_log.EventLog()
+    start = time.perf_counter()
+    for event in events:
+        log.append(event)
+    return time.perf_counter() - start
+
+
+def run(count):
+    """
+    Runs the benchmark.
+    :param count: The number of synthetic events to record.
+    :return: Dictionary of results.
+    """
+    events = synthetic.generate_events(count)
+
+    def build_objects():
+        # The manager process holds an unpickled copy of every event.
+        return [pickle.loads(pickle.dumps(event)) for event in events]
+
+    def build_log():
+        log = event_log.EventLog()
+        for event in events:
+            log.append(event)
+        return log
+
+    ipc_count = min(count, 20000)
+    return {
+        'events': count,
+        'pickled_bytes_per_event': sum(len(pickle.dumps(event)) for event in events) / count,
+        'manager_list_bytes_per_event': measure_memory(build_objects) / count,
+        'event_log_bytes_per_event': measure_memory(build_log) / count,
+        'manager_list_appends_per_second': ipc_count / manager_list_append(events[:ipc_count]),
+        'event_log_appends_per_second': count / event_log_append(events),
+    }
+
+
+if __name__ == '__main__':
+    results = run(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
+    for name, value in results.items():
+        print('%-35s %14.1f' % (name, value))
@@ -0,0 +1,67 @@
+"""
+Counts the injection calls the PlaybackEngine makes with and without batching the steps due together, on recordings
+played at different densities. The simulated backend counts the calls and records the input, so the batched playback
+can be checked to inject exactly the same input.
+
+Usage: python -m benchmarks.injection [event count]
+"""
+import sys
+
+import backends.simulated as simulated
+import benchmarks.synthetic as synthetic
+import playback.engine as engine
+
+
+def scaled_events(count, interval_ms):
+    """
+    Generates synthetic events and rescales their timestamps.
+    :param count: The number of events.
+    :param interval_ms: The mean milliseconds between events.
+    :return: The list of events.
+    """
+    events = synthetic.generate_events(count)
+    scale = interval_ms * 1000000.0 / (events[-1].Timestamp / count)
+    for event in events:
+        event.Timestamp = int(event.Timestamp * scale)
+    return events
+
+
+def play(events, batch_window):
+    """
+    Plays the events into a simulated backend.
+    :param events: The events.
+    :param batch_window: The engine's batch window in seconds.
+    :return: Tuple of the backend and the PlaybackReport.
+    """
+    backend = simulated.SimulatedBackend()
+    report = engine.PlaybackEngine(backend, batch_window=batch_window).play(events)
+    return backend, report
+
+
+def run(count):
+    """
+    Runs the benchmark.
+    :param count: The number of events in each recording.
+    :return: Dictionary of results keyed by the recording's mean milliseconds between events.
+    """
+    results = {}
+    for interval_ms in (5.0, 1.0, 0.1):
+        events = scaled_events(count, interval_ms)
+        unbatched, _ = play(events, 0)
+        batched, report = play(events, engine.PlaybackEngine.DEFAULT_BATCH_WINDOW)
+        results['%sms' % interval_ms] = {
+            'steps': len(unbatched.injected),
+            'calls': unbatched.calls,
+            'batched_calls': batched.calls,
+            'reduction': float(unbatched.calls) / batched.calls,
+            'same_input': batched.injected == unbatched.injected,
+            'error_p99_us': report.summary()['p99'] / 1000.0,
+        }
+    return results
+
+
+if __name__ == '__main__':
+    results = run(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
+    for interval, summary in results.items():
+        print(interval, ' '.join('%s=%s' % (name, round(value, 2) if isinstance(value, float) else value)
+                                 for name, value in summary.items()))
@@ -0,0 +1,80 @@
+"""
+Measures the overhead of the pipeline instrumentation by capturing the same simulated input into a WindowsRecorder
+with the instrumentation off and on, then prints the per-stage latencies and queue depths it collected.
+
+Usage: python -m benchmarks.instrumentation [event count] [events per second]
+"""
+import json
+import os
+import sys
+import time
+
+import backends.selection as selection
+import backends.simulated as simulated
+import benchmarks.pipeline as pipeline
+import recording.event_log as event_log
+import recording.recorder as recorder
+import utilities.instrumentation as instrumentation
+import utilities.listeners as listeners
+
+
+def capture(count, rate):
+    """
+    Captures simulated input into a WindowsRecorder.
+    :param count: The number of events the simulated user generates.
+    :param rate: The events generated per second, 0 for as fast as possible.
+    :return: The nanoseconds per event from resuming the backend to the last event being dispatched.
+    """
+    backend = simulated.SimulatedBackend(rate=rate, count=count, paused=True)
+    selection.set_backend(backend)
+    windows_recorder = recorder.WindowsRecorder(event_log.EventLog(), os.getpid())
+    windows_recorder.start()
+    counter = pipeline.EventCounter()
+    listener = listeners.WindowsListener()
+    listener.add_listener(counter)
+
+    start = time.perf_counter()
+    backend.resume()
+    while counter.count < count:
+        time.sleep(0.001)
+    seconds = time.perf_counter() - start
+
+    windows_recorder.release()
+    listener.release()
+    selection.set_backend(None)
+    return seconds / count * 1e9
+
+
+def run(count, rate, repeat=3):
+    """
+    Runs the benchmark.
+    :param count: The number of events captured per run.
+    :param rate: The events generated per second, 0 for as fast as possible.
+    :param repeat: The runs with the instrumentation off and on, the fastest of each is kept.
+    :return: Tuple of a dictionary of results and the instrumentation snapshot.
+    """
+    pipeline_instrumentation = instrumentation.get_instrumentation()
+    pipeline_instrumentation.disable()
+    disabled = min(capture(count, rate) for _ in range(repeat))
+
+    pipeline_instrumentation.enable()
+    enabled = min(capture(count, rate) for _ in range(repeat))
+    snapshot = pipeline_instrumentation.snapshot()
+    pipeline_instrumentation.disable()
+    pipeline_instrumentation.reset()
+
+    results = {
+        'events': count,
+        'disabled_ns_per_event': disabled,
+        'enabled_ns_per_event': enabled,
+        'overhead_ns_per_event': enabled - disabled,
+    }
+    return results, snapshot
+
+
+if __name__ == '__main__':
+    results, snapshot = run(int(sys.argv[1]) if len(sys.argv) > 1 else 20000,
+                            float(sys.argv[2]) if len(sys.argv) > 2 else 0)
+    for name, value in results.items():
+        print('%-30s %12s' % (name, round(value, 2) if isinstance(value, float) else value))
+    print(json.dumps(snapshot, indent=2))
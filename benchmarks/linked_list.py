@@ -0,0 +1,115 @@
+"""
+Compares utilities.collections.LinkedList, with and without its index, against collections.deque and list on a million
+values: building, iterating, finding, removing and inserting before values picked at random, and the memory every
+element takes. Operations that scan the whole collection are timed on a sample and reported per operation.
+
+Usage: python -m benchmarks.linked_list [value count] [scanned operation count]
+"""
+import collections
+import random
+import sys
+import time
+import tracemalloc
+
+import utilities.collections as linked
+
+
+class _DictNode:
+    """
+    The node as it was before it had __slots__, to measure what they save.
+    """
+
+    def __init__(self, value):
+        self.value = value
+        self.next = None
+        self.prev = None
+
+
+def _per_op(function, values):
+    """
+    Times a function called with every value.
+    :param function: The function to call.
+    :param values: The values to call it with.
+    :return: The nanoseconds per call.
+    """
+    start = time.perf_counter()
+    for value in values:
+        function(value)
+    return (time.perf_counter() - start) / len(values) * 1e9
+
+
+def _held_bytes(function):
+    """
+    Measures the memory held by the value a function returns.
+    :param function: The function to call.
+    :return: The bytes allocated and still held.
+    """
+    tracemalloc.start()
+    value = function()
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del value
+    return held
+
+
+def _insert_before(container):
+    """
+    Gets the function that inserts a new value before an existing one.
+    :param container: The LinkedList, deque or list.
+    :return: The function of the existing value.
+    """
+    if isinstance(container, linked.LinkedList):
+        return lambda x: container.insert_data(-x - 1, x)
+    return lambda x: container.insert(container.index(x), -x - 1)
+
+
+def run(count, scans):
+    """
+    Runs the benchmark.
+    :param count: The number of values.
+    :param scans: The number of finds, removes and inserts timed on the collections that scan for the value.
+    :return: Dictionary of results.
+    """
+    rng = random.Random(0)
+    values = list(range(count))
+    picked = rng.sample(values, count // 10)
+    results = {'values': count}
+
+    factories = [
+        ('linked_list', lambda: linked.LinkedList(values)),
+        ('indexed_linked_list', lambda: linked.LinkedList(values, indexed=True)),
+        ('deque', lambda: collections.deque(values)),
+        ('list', lambda: list(values)),
+    ]
+    for name, factory in factories:
+        start = time.perf_counter()
+        container = factory()
+        results['%s_build_ns' % name] = (time.perf_counter() - start) / count * 1e9
+
+        start = time.perf_counter()
+        for _ in container:
+            pass
+        results['%s_iterate_ns' % name] = (time.perf_counter() - start) / count * 1e9
+
+        # Only the index makes finding a value cheap, everything else is timed on a sample of scans
+        sample = picked if name == 'indexed_linked_list' else picked[:scans]
+        if isinstance(container, linked.LinkedList):
+            results['%s_find_ns' % name] = _per_op(container.find, sample)
+        else:
+            results['%s_find_ns' % name] = _per_op(container.index, sample)
+        results['%s_insert_before_ns' % name] = _per_op(_insert_before(container), sample)
+        remove = container.remove_data if isinstance(container, linked.LinkedList) else container.remove
+        results['%s_remove_ns' % name] = _per_op(remove, sample)
+        results['%s_length_ok' % name] = len(container) == count
+
+    # The memory of the nodes alone, the values are shared by every collection
+    results['node_bytes_slots'] = float(_held_bytes(lambda: [linked.Node(x) for x in values])) / count
+    results['node_bytes_dict'] = float(_held_bytes(lambda: [_DictNode(x) for x in values])) / count
+    results['index_bytes'] = float(_held_bytes(lambda: {x: x for x in values})) / count
+    return results
+
+
+if __name__ == '__main__':
+    results = run(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000, int(sys.argv[2]) if len(sys.argv) > 2 else 200)
+    for name, value in results.items():
+        print('%-36s %14s' % (name, round(value, 1) if isinstance(value, float) else value))
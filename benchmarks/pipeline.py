@@ -0,0 +1,108 @@
+"""
+Runs the full record, convert and playback pipeline on the simulated input backend, so it can be load tested off a
+Windows desktop. The recording is played by the PlaybackEngine and by the generated script, and the input each
+injected is compared.
+
+Usage: python -m benchmarks.pipeline [event count] [events per second]
+"""
+import io
+import os
+import sys
+import time
+
+import backends.selection as selection
+import backends.simulated as simulated
+import playback.engine as engine
+import playback.script_writer as script_writer
+import recording.event_log as event_log
+import recording.recorder as recorder
+import utilities.listeners as listeners
+
+
+class EventCounter:
+    """
+    Listener that counts every event dispatched by the WindowsListener.
+    """
+
+    def __init__(self):
+        """
+        Initializes a new instance of the EventCounter class.
+        """
+        self.count = 0
+
+    def on_mouse_event(self, event):
+        self.count += 1
+
+    def on_keyboard_event(self, event):
+        self.count += 1
+
+
+def run(count, rate):
+    """
+    Runs the benchmark.
+    :param count: The number of events the simulated user generates.
+    :param rate: The events generated per second, 0 for as fast as possible.
+    :return: Dictionary of results.
+    """
+    backend = simulated.SimulatedBackend(rate=rate, count=count, paused=True)
+    selection.set_backend(backend)
+
+    # Record
+    log = event_log.EventLog()
+    script = io.StringIO()
+    writer = script_writer.PlaybackScriptWriter(script)
+    windows_recorder = recorder.WindowsRecorder(log, os.getpid())
+    windows_recorder.add_recording_callback(writer.append)
+    windows_recorder.start()
+    counter = EventCounter()
+    listener = listeners.WindowsListener()
+    listener.add_listener(counter)
+
+    start = time.perf_counter()
+    backend.resume()
+    while counter.count < count:
+        time.sleep(0.001)
+    record_seconds = time.perf_counter() - start
+    windows_recorder.release()
+    listener.remove_listener(counter)
+    writer.close()
+
+    # Play back through the engine
+    report = engine.PlaybackEngine(backend).play(log)
+    engine_injected = backend.injected
+    engine_calls = backend.calls
+    backend.injected = []
+    backend.calls = 0
+
+    # Play back through the generated script
+    start = time.perf_counter()
+    exec(script.getvalue(), {})
+    script_seconds = time.perf_counter() - start
+    script_injected = backend.injected
+
+    listener.release()
+    selection.set_backend(None)
+    summary = report.summary()
+    return {
+        'events': count,
+        'recorded_events': len(log),
+        'record_events_per_second': count / record_seconds,
+        'event_log_bytes': log.nbytes,
+        'script_bytes': len(script.getvalue()),
+        'engine_injections': len(engine_injected),
+        'engine_calls': engine_calls,
+        'engine_seconds': summary['duration'],
+        'engine_error_p50_us': summary['p50'] / 1000.0,
+        'engine_error_p99_us': summary['p99'] / 1000.0,
+        'script_injections': len(script_injected),
+        'script_calls': backend.calls,
+        'script_seconds': script_seconds,
+        'injections_match': engine_injected == script_injected,
+    }
+
+
+if __name__ == '__main__':
+    results = run(int(sys.argv[1]) if len(sys.argv) > 1 else 2000,
+                  float(sys.argv[2]) if len(sys.argv) > 2 else 1000)
+    for name, value in results.items():
+        print('%-30s %12s' % (name, round(value, 2) if isinstance(value, float) else value))
@@ -0,0 +1,88 @@
+"""
+Compares the scheduling error of the PlaybackEngine against the generated script's chain of time.sleep calls.
+
+Usage: python -m benchmarks.playback_timing [event count] [milliseconds between events]
+"""
+import sys
+import time
+
+import benchmarks.synthetic as synthetic
+import playback.engine as engine
+import playback.preprocessing as preprocessing
+import utilities.metrics as metrics
+
+
+class NullInjector:
+    """
+    Injector that only counts the input it is asked to inject.
+    """
+
+    def __init__(self):
+        """
+        Initializes a new instance of the NullInjector class.
+        """
+        self.calls = 0
+
+    def key_press(self, keys):
+        self.calls += 1
+
+    def mouse_click(self, x, y, down, left):
+        self.calls += 1
+
+    def mouse_move(self, x, y):
+        self.calls += 1
+
+    def mouse_wheel(self, x, y, wheel):
+        self.calls += 1
+
+    def inject(self, actions):
+        self.calls += 1
+
+
+def play_sleep_chain(events, injector):
+    """
+    Plays the events the way a generated script does, sleeping for the delta before every event.
+    :param events: The recorded events.
+    :param injector: The injector to play into.
+    :return: The scheduling error Histogram in nanoseconds.
+    """
+    histogram = metrics.Histogram()
+    previous_offset = 0
+    start = time.perf_counter()
+    for event, times, offset, keys in preprocessing.preprocess(events):
+        time.sleep((offset - previous_offset) / 1000000000.0)
+        histogram.record((time.perf_counter() - start) * 1000000000 - offset)
+        previous_offset = offset
+        if event.Type == engine.EventType.MOUSE:
+            injector.mouse_click(event.Position[0], event.Position[1], event.Is_Down, event.Is_Left)
+        else:
+            injector.key_press(keys)
+    return histogram
+
+
+def run(count, interval_ms):
+    """
+    Runs the benchmark.
+    :param count: The number of events to play.
+    :param interval_ms: The mean milliseconds between events.
+    :return: Dictionary of scheduling error summaries keyed by playback method.
+    """
+    events = synthetic.generate_events(count)
+    scale = interval_ms * 1000000.0 / (events[-1].Timestamp / count)
+    for event in events:
+        event.Timestamp = int(event.Timestamp * scale)
+
+    return {
+        'sleep_chain': play_sleep_chain(events, NullInjector()).summary(),
+        'engine': engine.PlaybackEngine(NullInjector(), spin=0).play(events).summary(),
+        'engine_spin': engine.PlaybackEngine(NullInjector()).play(events).summary(),
+    }
+
+
+if __name__ == '__main__':
+    results = run(int(sys.argv[1]) if len(sys.argv) > 1 else 1000,
+                  float(sys.argv[2]) if len(sys.argv) > 2 else 5)
+    for method, summary in results.items():
+        print(method)
+        for name in ('p50', 'p95', 'p99', 'max'):
+            print('    error %-4s %12.1f us' % (name, summary[name] / 1000.0))
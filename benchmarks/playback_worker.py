@@ -0,0 +1,154 @@
+"""
+Measures the time from asking for a playback to its first injection when every playback spawns a new process (cold)
+against the warm PlaybackWorker, and checks that a job can be stopped, and a crash recovered from, without losing the
+worker.
+
+Usage: python -m benchmarks.playback_worker [playbacks]
+"""
+import io
+import multiprocessing
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+import playback.script_writer as script_writer
+import playback.worker as worker
+import python_executor
+
+
+def write_script(directory, name, body):
+    """
+    Writes a playback script with the generated header.
+    :param directory: The directory to write to.
+    :param name: The file name.
+    :param body: The lines after the header.
+    :return: The path of the script.
+    """
+    header = io.StringIO()
+    script_writer.PlaybackScriptWriter(header).close()
+    path = os.path.join(directory, name)
+    with open(path, 'w') as f:
+        f.write(header.getvalue())
+        f.write(body)
+    return path
+
+
+def first_injection_script(directory, marker):
+    """
+    Writes a script that injects a keystroke and then stores the perf_counter_ns value it was injected at in a file.
+    :param directory: The directory to write to.
+    :param marker: The path of the file the timestamp is written to.
+    :return: The path of the script.
+    """
+    return write_script(directory, 'first_injection.py',
+                        'WindowsPlaybackManager.key_press("a")\n'
+                        'with open(r"%s", "w") as marker:\n'
+                        '    marker.write(str(time.perf_counter_ns()))\n' % marker)
+
+
+def read_marker(marker, start):
+    """
+    Reads the time of the first injection.
+    :param marker: The path of the file the timestamp was written to.
+    :param start: The perf_counter_ns value the playback was asked for at.
+    :return: The milliseconds from asking for the playback to its first injection.
+    """
+    with open(marker) as f:
+        injected = int(f.read())
+    os.remove(marker)
+    return (injected - start) / 1000000.0
+
+
+def cold_starts(script, marker, count, context):
+    """
+    Plays the script in a new process every time, the way WindowsPlaybackManager does without a worker.
+    :param script: The path of the first injection script.
+    :param marker: The path of the file the script writes to.
+    :param count: The number of playbacks.
+    :param context: The multiprocessing context to start the processes with.
+    :return: The list of milliseconds to the first injection.
+    """
+    results = []
+    for _ in range(count):
+        start = time.perf_counter_ns()
+        process = context.Process(target=python_executor.execute_file, args=(script,))
+        process.start()
+        process.join()
+        results.append(read_marker(marker, start))
+    return results
+
+
+def warm_starts(playback_worker, script, marker, count):
+    """
+    Plays the script on the warm worker every time.
+    :param playback_worker: The started PlaybackWorker.
+    :param script: The path of the first injection script.
+    :param marker: The path of the file the script writes to.
+    :param count: The number of playbacks.
+    :return: The list of milliseconds to the first injection.
+    """
+    results = []
+    for _ in range(count):
+        start = time.perf_counter_ns()
+        playback_worker.submit(script).wait()
+        results.append(read_marker(marker, start))
+    return results
+
+
+def run(count):
+    """
+    Runs the benchmark.
+    :param count: The number of playbacks of each kind.
+    :return: Dictionary of results.
+    """
+    results = {}
+    directory = tempfile.mkdtemp()
+    marker = os.path.join(directory, 'marker')
+    script = first_injection_script(directory, marker)
+
+    for method in multiprocessing.get_all_start_methods():
+        if method != 'forkserver':
+            cold = cold_starts(script, marker, count, multiprocessing.get_context(method))
+            results['cold_%s_median_ms' % method] = statistics.median(cold)
+
+    playback_worker = worker.PlaybackWorker()
+    start = time.perf_counter()
+    playback_worker.start()
+    results['worker_warm_up_ms'] = (time.perf_counter() - start) * 1000.0
+    warm = warm_starts(playback_worker, script, marker, count)
+    results['warm_median_ms'] = statistics.median(warm)
+    results['warm_max_ms'] = max(warm)
+
+    # Stop a long playback, the worker should survive it and play the next job
+    process_id = playback_worker.process_id
+    job = playback_worker.submit(write_script(directory, 'long.py', 'WindowsPlaybackManager.sleep(60)\n'))
+    time.sleep(0.1)
+    start = time.perf_counter()
+    playback_worker.stop_job(job)
+    job.wait()
+    results['stop_ms'] = (time.perf_counter() - start) * 1000.0
+    results['stopped_status'] = job.status
+    results['same_worker_after_stop'] = playback_worker.process_id == process_id
+
+    # Crash the worker, the supervisor should restart it
+    job = playback_worker.submit(write_script(directory, 'crash.py', 'import os\nos._exit(3)\n'))
+    job.wait()
+    results['crashed_status'] = job.status
+    job = playback_worker.submit(script)
+    job.wait()
+    os.remove(marker)
+    results['after_crash_status'] = job.status
+    results['restarts'] = playback_worker.restarts
+
+    playback_worker.release()
+    shutil.rmtree(directory)
+    return results
+
+
+if __name__ == '__main__':
+    results = run(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
+    for name, value in results.items():
+        print('%-30s %12s' % (name, round(value, 2) if isinstance(value, float) else value))
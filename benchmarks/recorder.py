@@ -0,0 +1,99 @@
+"""
+Measures the WindowsRecorder's throughput on a synthetic keystroke stream with held modifiers and the occasional
+CTRL + ALT + DEL.
+
+Usage: python -m benchmarks.recorder [keystroke count]
+"""
+import random
+import sys
+import time
+
+import backends.selection as selection
+import backends.simulated as simulated
+import recording.constants as constants
+import recording.recorder as recorder
+import utilities.listeners as listeners
+
+# Left Shift, Right Shift, Left Control, Right Control, Left Alt, Right Alt
+MODIFIER_KEYS = [0xA0, 0xA1, 0xA2, 0xA3, 0xA4, 0xA5]
+VK_DELETE = 0x2E
+
+
+def keyboard_event(key_id, is_down, timestamp):
+    """
+    Creates a keyboard event as the WindowsListener delivers it.
+    :param key_id: The virtual key code.
+    :param is_down: True if the key was pressed, false if it was released.
+    :param timestamp: The capture timestamp in nanoseconds.
+    :return: The event.
+    """
+    event = simulated.SimulatedKeyboardEvent(key_id, is_down, 0x10000, 'Untitled - Notepad')
+    event.Type = constants.EventType.KEYBOARD
+    event.Is_Down = is_down
+    event.Timestamp = timestamp
+    return event
+
+
+def generate_keystrokes(count, seed=0):
+    """
+    Generates a reproducible keystroke stream, a fifth of the keystrokes are made holding one or two modifiers.
+    :param count: The number of keystrokes to generate.
+    :param seed: The random seed.
+    :return: The list of key down and key up events.
+    """
+    rng = random.Random(seed)
+    events = []
+    timestamp = 0
+    for _ in range(count):
+        held = rng.sample(MODIFIER_KEYS, rng.choice((1, 2))) if rng.random() < 0.2 else []
+        if rng.random() < 0.001:
+            held = [0xA2, 0xA4]
+            key_id = VK_DELETE
+        else:
+            key_id = rng.choice(simulated.TYPED_KEYS)
+
+        for modifier in held:
+            timestamp += 1000000
+            events.append(keyboard_event(modifier, True, timestamp))
+        timestamp += 1000000
+        events.append(keyboard_event(key_id, True, timestamp))
+        events.append(keyboard_event(key_id, False, timestamp))
+        for modifier in reversed(held):
+            timestamp += 1000000
+            events.append(keyboard_event(modifier, False, timestamp))
+    return events
+
+
+def run(count):
+    """
+    Runs the benchmark.
+    :param count: The number of keystrokes to record.
+    :return: Dictionary of results.
+    """
+    selection.set_backend(simulated.SimulatedBackend(paused=True))
+    events = generate_keystrokes(count)
+    recorded = []
+    windows_recorder = recorder.WindowsRecorder(None, None)
+    windows_recorder.add_recording_callback(recorded.append)
+    windows_recorder.start()
+
+    start = time.perf_counter()
+    for event in events:
+        windows_recorder.on_keyboard_event(event)
+    seconds = time.perf_counter() - start
+
+    windows_recorder.release()
+    listeners.WindowsListener().release()
+    selection.set_backend(None)
+    return {
+        'events': len(events),
+        'recorded_events': len(recorded),
+        'events_per_second': len(events) / seconds,
+        'ns_per_event': seconds / len(events) * 1e9,
+    }
+
+
+if __name__ == '__main__':
+    results = run(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
+    for name, value in results.items():
+        print('%-30s %14.1f' % (name, value))
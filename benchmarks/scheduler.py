@@ -0,0 +1,89 @@
+"""
+Measures the throughput of the PlaybackScheduler as the worker pool grows, playing short scripts into the simulated
+backend, and checks that timeouts and cancellation stop only the jobs they're meant to.
+
+Usage: python -m benchmarks.scheduler [jobs] [seconds per job]
+"""
+import io
+import os
+import shutil
+import sys
+import tempfile
+
+import backends.selection as selection
+import playback.scheduler as scheduler
+import playback.script_writer as script_writer
+
+
+def write_script(directory, name, steps, interval):
+    """
+    Writes a playback script that types a key at a fixed interval.
+    :param directory: The directory to write to.
+    :param name: The file name.
+    :param steps: The number of key presses.
+    :param interval: The seconds before every key press.
+    :return: The path of the script.
+    """
+    script = io.StringIO()
+    script_writer.PlaybackScriptWriter(script).close()
+    for _ in range(steps):
+        script.write('WindowsPlaybackManager.sleep(%s)\nWindowsPlaybackManager.key_press("a")\n' % interval)
+    path = os.path.join(directory, name)
+    with open(path, 'w') as f:
+        f.write(script.getvalue())
+    return path
+
+
+def run(jobs, seconds):
+    """
+    Runs the benchmark.
+    :param jobs: The number of scripts played for every pool size.
+    :param seconds: The seconds every script plays for.
+    :return: Dictionary of results.
+    """
+    results = {}
+    directory = tempfile.mkdtemp()
+    script = write_script(directory, 'short.py', 20, seconds / 20)
+
+    for workers in (1, 2, 4, 8):
+        events = []
+        pool = scheduler.PlaybackScheduler(workers, selection.Backend.SIMULATED,
+                                           on_playback_started=[lambda: events.append('started')],
+                                           on_playback_ended=[lambda: events.append('ended')])
+        pool.start()
+        for _ in range(jobs):
+            pool.submit(script)
+        pool.wait()
+        report = pool.report()
+        pool.release()
+        results['workers_%s_scripts_per_minute' % workers] = report['scripts_per_minute']
+        results['workers_%s_wall_time_p50' % workers] = report['wall_time_p50']
+        results['workers_%s_callbacks' % workers] = ','.join(events)
+
+    # One job runs past its timeout, one is cancelled while playing and one while waiting, the rest complete
+    pool = scheduler.PlaybackScheduler(2, selection.Backend.SIMULATED)
+    pool.start()
+    long_script = write_script(directory, 'long.py', 1, 60)
+    timed_out = pool.submit(long_script, timeout=0.5)
+    playing = pool.submit(long_script)
+    waiting = pool.submit(script)
+    completed = pool.submit(script)
+    pool.cancel(waiting)
+    playing.wait(0.2)
+    pool.cancel(playing)
+    pool.wait()
+    results['timeout_status'] = timed_out.status
+    results['timeout_wall_time'] = timed_out.wall_time
+    results['cancelled_playing_status'] = playing.status
+    results['cancelled_waiting_status'] = waiting.status
+    results['other_status'] = completed.status
+    pool.release()
+    shutil.rmtree(directory)
+    return results
+
+
+if __name__ == '__main__':
+    results = run(int(sys.argv[1]) if len(sys.argv) > 1 else 32,
+                  float(sys.argv[2]) if len(sys.argv) > 2 else 0.5)
+    for name, value in results.items():
+        print('%-36s %12s' % (name, round(value, 2) if isinstance(value, float) else value))
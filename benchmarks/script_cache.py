@@ -0,0 +1,92 @@
+"""
+Measures how long a large playback script takes to load when it's compiled from source, when another process already
+cached it on disk and when this process cached it in memory.
+
+Usage: python -m benchmarks.script_cache [event count] [repeats]
+"""
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+import benchmarks.synthetic as synthetic
+import playback.script_cache as script_cache
+import playback.script_writer as script_writer
+
+
+def write_script(path, count):
+    """
+    Writes a playback script of synthetic events.
+    :param path: The path to write to.
+    :param count: The number of events recorded.
+    :return: The number of lines in the script.
+    """
+    with open(path, 'w') as f:
+        writer = script_writer.PlaybackScriptWriter(f)
+        for event in synthetic.generate_events(count):
+            writer.append(event)
+        writer.close()
+    with open(path) as f:
+        return sum(1 for _ in f)
+
+
+def time_load(cache, path):
+    """
+    Loads a script through a cache.
+    :param cache: The ScriptCache.
+    :param path: The path of the script.
+    :return: The milliseconds it took.
+    """
+    start = time.perf_counter()
+    cache.load(path)
+    return (time.perf_counter() - start) * 1000.0
+
+
+def run(count, repeats):
+    """
+    Runs the benchmark.
+    :param count: The number of events recorded in the script.
+    :param repeats: The number of loads of each kind.
+    :return: Dictionary of results.
+    """
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'recording.py')
+    lines = write_script(path, count)
+    cache_directory = os.path.join(directory, 'cache')
+
+    # A cache per load with an empty directory always compiles, a new cache over the same directory is a new process
+    # finding the script on disk and reusing one cache finds it in memory
+    compiles = []
+    for _ in range(repeats):
+        shutil.rmtree(cache_directory, ignore_errors=True)
+        compiles.append(time_load(script_cache.ScriptCache(cache_directory), path))
+    disk_loads = [time_load(script_cache.ScriptCache(cache_directory), path) for _ in range(repeats)]
+    cache = script_cache.ScriptCache(cache_directory)
+    memory_loads = [time_load(cache, path) for _ in range(repeats + 1)][1:]
+
+    # A cache with a smaller budget evicts the script
+    script_cache.ScriptCache(cache_directory, max_bytes=1).trim()
+    entries = [x for x in os.listdir(cache_directory) if x.endswith(script_cache.EXTENSION)]
+
+    results = {
+        'script_lines': lines,
+        'script_bytes': os.path.getsize(path),
+        'compile_median_ms': statistics.median(compiles),
+        'disk_hit_median_ms': statistics.median(disk_loads),
+        'memory_hit_median_ms': statistics.median(memory_loads),
+        'disk_speedup': statistics.median(compiles) / statistics.median(disk_loads),
+        'memory_speedup': statistics.median(compiles) / statistics.median(memory_loads),
+        'evicted_to_budget': len(entries) == 0,
+    }
+    results.update(('cache_%s' % name, value) for name, value in cache.stats().items())
+    shutil.rmtree(directory)
+    return results
+
+
+if __name__ == '__main__':
+    results = run(int(sys.argv[1]) if len(sys.argv) > 1 else 50000,
+                  int(sys.argv[2]) if len(sys.argv) > 2 else 5)
+    for name, value in results.items():
+        print('%-30s %12s' % (name, round(value, 2) if isinstance(value, float) else value))
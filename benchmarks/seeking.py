@@ -0,0 +1,109 @@
+"""
+Measures how long it takes to start playing a recording from an event number or a time through its RecordingIndex,
+against reading the recording from the start up to that event, for event logs and recording archives. The index is
+loaded from the checkpoints the writers store, as a new playback process does, and is also built by reading the whole
+recording, as it is for files written without them. Also checks the index finds the same events and input state as
+the linear read.
+
+Usage: python -m benchmarks.seeking [event count]
+"""
+import io
+import sys
+import time
+
+import benchmarks.synthetic as synthetic
+import playback.engine as engine
+import playback.recording_index as recording_index
+import recording.archive as archive
+import recording.event_log as event_log
+
+
+def write(events, kind):
+    """
+    Writes events to a recording.
+    :param events: The events.
+    :param kind: 'event_log' or 'archive'.
+    :return: The recording's bytes.
+    """
+    file = io.BytesIO()
+    writer = archive.ArchiveWriter(file) if kind == 'archive' else event_log.EventLogWriter(file)
+    for event in events:
+        writer.append(event)
+    writer.close()
+    return file.getvalue()
+
+
+def linear(data, target):
+    """
+    Reads a recording from the start up to an event, the way playback had to before the index.
+    :param data: The recording's bytes.
+    :param target: The number of the event.
+    :return: Tuple of the event's timestamp and the InputState just before it.
+    """
+    state = recording_index.InputState()
+    for number, (record, _) in enumerate(engine.open_recording(io.BytesIO(data)).records()):
+        if number == target:
+            return record[-1], state
+        state.update(record)
+    return None, state
+
+
+def seek(index, data, playback_range):
+    """
+    Reads a recording from the index's checkpoint closest to a range's start up to its first event.
+    :param index: The RecordingIndex.
+    :param data: The recording's bytes.
+    :param playback_range: The PlaybackRange.
+    :return: Tuple of the first event's timestamp and the InputState just before it.
+    """
+    recording_slice = index.read(engine.open_recording(io.BytesIO(data)), playback_range)
+    for event in recording_slice:
+        return event.Timestamp, recording_slice.start_state
+    return None, recording_slice.start_state
+
+
+def run(count):
+    """
+    Runs the benchmark.
+    :param count: The number of events.
+    :return: Dictionary of results.
+    """
+    events = synthetic.generate_events(count, mouse_ratio=0.3)
+    targets = [min(9000, count - 1), count // 2, count - 1]
+    results = {'events': count}
+    same = True
+    for kind in ('event_log', 'archive'):
+        data = write(events, kind)
+        start = time.perf_counter()
+        index = recording_index.RecordingIndex(engine.open_recording(io.BytesIO(data)))
+        results['%s_index_load_ms' % kind] = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        rebuilt = recording_index.RecordingIndex(engine.open_recording(io.BytesIO(data)), rebuild=True)
+        results['%s_index_build_ms' % kind] = (time.perf_counter() - start) * 1000
+        results['%s_checkpoints' % kind] = len(index)
+        same = same and len(rebuilt) == len(index) and rebuilt.count == index.count == count
+
+        for target in targets:
+            start = time.perf_counter()
+            expected_timestamp, expected_state = linear(data, target)
+            results['%s_linear_ms_to_%s' % (kind, target)] = (time.perf_counter() - start) * 1000
+
+            start = time.perf_counter()
+            timestamp, state = seek(index, data, recording_index.PlaybackRange(target))
+            results['%s_seek_ms_to_%s' % (kind, target)] = (time.perf_counter() - start) * 1000
+            rebuilt_timestamp, rebuilt_state = seek(rebuilt, data, recording_index.PlaybackRange(target))
+
+            seconds = (expected_timestamp - index.first_timestamp) / 1000000000.0
+            by_time, _ = seek(index, data, recording_index.PlaybackRange(start_time=seconds))
+            same = (same and timestamp == expected_timestamp == by_time == rebuilt_timestamp and
+                    (state.left, state.right, state.held_keys, state.modifiers) ==
+                    (rebuilt_state.left, rebuilt_state.right, rebuilt_state.held_keys, rebuilt_state.modifiers) ==
+                    (expected_state.left, expected_state.right, expected_state.held_keys, expected_state.modifiers))
+    results['same_events_and_state'] = same
+    return results
+
+
+if __name__ == '__main__':
+    results = run(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
+    for name, value in results.items():
+        print('%-36s %12s' % (name, round(value, 3) if isinstance(value, float) else value))
@@ -0,0 +1,136 @@
+"""
+Measures what dictionary encoding the window names saves on a multi-window session: the memory held by the events
+decoded from the ring buffer transport, the bytes the ring buffer copies, the size of the event log and the size of
+the generated script, each compared with repeating the window name on every event.
+
+Usage: python -m benchmarks.string_table [event count]
+"""
+import io
+import random
+import sys
+import tracemalloc
+
+import benchmarks.synthetic as synthetic
+import playback.preprocessing as preprocessing
+import playback.script_writer as script_writer
+import recording.event_log as event_log
+import utilities.ring_buffer as ring_buffer
+import utilities.transports as transports
+
+# The windows of a working day: a handful of applications and many browser tabs and documents
+WINDOW_NAMES = (['Inbox - user@example.com - Outlook', 'Command Prompt', 'Calculator', 'Key Ferry'] +
+                ['Issue %s: Crash when saving the report - Mozilla Firefox' % x for x in range(100, 112)] +
+                ['Quarterly report %s.docx - Word' % x for x in range(1, 7)] +
+                ['Budget %s.xlsx - Excel' % x for x in range(2019, 2025)])
+
+
+def generate_session(count, seed=0):
+    """
+    Generates a session of typing and clicking that moves between windows on clicks, going back to the recently used
+    windows more often than the others.
+    :param count: The number of events.
+    :param seed: The random seed.
+    :return: The list of events.
+    """
+    rng = random.Random(seed)
+    weights = [1.0 / (index + 1) for index in range(len(WINDOW_NAMES))]
+    events = synthetic.generate_events(count, seed, mouse_ratio=0.25)
+    window_name = WINDOW_NAMES[0]
+    for event in events:
+        if event.Type == synthetic.EventType.MOUSE and event.Is_Down:
+            window_name = rng.choices(WINDOW_NAMES, weights)[0]
+        event.WindowName = window_name
+    return events
+
+
+def traced_bytes(function):
+    """
+    Measures the memory held by the value a function returns.
+    :param function: The function to call.
+    :return: Tuple of the bytes allocated and still held, and the return value.
+    """
+    tracemalloc.start()
+    value = function()
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return held, value
+
+
+def receive(events):
+    """
+    Sends events through a RingBufferTransport and decodes them on the other side.
+    :param events: The events to send.
+    :return: The list of decoded events.
+    """
+    transport = transports.RingBufferTransport()
+    received = []
+    for start in range(0, len(events), 256):
+        batch = events[start:start + 256]
+        transport.put_many(batch)
+        received.extend(transport.get() for _ in batch)
+    transport.shutdown()
+    transport.close()
+    return received
+
+
+def script_bytes(events, intern_windows):
+    """
+    Writes the events to a playback script.
+    :param events: The events.
+    :param intern_windows: True to dictionary encode the window comments.
+    :return: The size of the script in bytes.
+    """
+    script = io.StringIO()
+    writer = script_writer.PlaybackScriptWriter(script, preprocessing.EventPreprocessor(), intern_windows)
+    for event in events:
+        writer.append(event)
+    writer.close()
+    return len(script.getvalue().encode('utf-8'))
+
+
+def run(count):
+    """
+    Runs the benchmark.
+    :param count: The number of events in the session.
+    :return: Dictionary of results.
+    """
+    events = generate_session(count)
+    name_bytes = [len(x.WindowName.encode('utf-8')) for x in events]
+    results = {'events': count, 'windows': len(set(x.WindowName for x in events))}
+
+    # Events decoded from the ring buffer, sharing one string per window against a string per event
+    if ring_buffer.is_supported():
+        held, received = traced_bytes(lambda: receive(events))
+        results['decoded_bytes'] = held
+        copied, _ = traced_bytes(lambda: [x.WindowName.encode('utf-8').decode('utf-8') for x in received])
+        results['decoded_bytes_names_inline'] = held + copied
+        results['decoded_names_match'] = [x.WindowName for x in received] == [x.WindowName for x in events]
+        results['ring_bytes_per_event'] = float(transports.INPUT_RECORD.size * len(events) +
+                                                sum(len(x.encode('utf-8')) for x in set(WINDOW_NAMES))) / len(events)
+        # The records used to carry the name's bytes instead of its 4 byte id
+        results['ring_bytes_per_event_names_inline'] = transports.INPUT_RECORD.size - 4 + \
+            float(sum(name_bytes)) / len(events)
+
+    # The event log in memory and on disk, against storing the name with every record
+    log = event_log.EventLog()
+    for event in events:
+        log.append(event)
+    saved = io.BytesIO()
+    log.save(saved)
+    results['event_log_bytes'] = log.nbytes + log.strings.nbytes
+    results['event_log_bytes_names_inline'] = log.nbytes + sum(name_bytes)
+    results['event_log_file_bytes'] = len(saved.getvalue())
+
+    # The generated script
+    results['script_bytes'] = script_bytes(events, True)
+    results['script_bytes_names_inline'] = script_bytes(events, False)
+    for name in ('decoded_bytes', 'ring_bytes_per_event', 'event_log_bytes', 'script_bytes'):
+        if name in results:
+            results['%s_saved' % name] = 1.0 - float(results[name]) / results['%s_names_inline' % name]
+    return results
+
+
+if __name__ == '__main__':
+    results = run(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
+    for name, value in results.items():
+        print('%-36s %12s' % (name, round(value, 3) if isinstance(value, float) else value))
@@ -0,0 +1,238 @@
+"""
+Runs the microbenchmarks of the recording and conversion hot paths on synthetic events and writes the results to a
+JSON file, so runs can be compared to spot regressions. Everything runs on the simulated input backend, so neither
+pyHook nor pywin32 is needed.
+
+Usage: python -m benchmarks.suite [--output FILE] [--max-events N] [--repeat N] [--only NAME[,NAME...]]
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+import backends.selection as selection
+import backends.simulated as simulated
+import benchmarks.recorder as recorder_benchmark
+import benchmarks.synthetic as synthetic
+import playback.playback as playback
+import recording.recorder as recorder
+import utilities.converter as converter
+import utilities.listeners as listeners
+
+# The number of events every sized benchmark is run with, up to --max-events
+SIZES = [1000, 10000, 100000, 1000000]
+
+# The special keys translated by the to_send_key benchmark along with plain letters and control+digits, alternately
+# with shift and repeated up to three times
+_SPECIAL_KEYS = sorted(converter.FROM_KEY_TO_SENDKEY)
+
+
+def _timed(function, *args):
+    """
+    Times a call.
+    :param function: The function to call.
+    :param args: The arguments to call it with.
+    :return: Tuple of the seconds the call took and its return value.
+    """
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def recorder_keyboard(size):
+    """
+    WindowsRecorder.on_keyboard_event throughput on keystrokes with held modifiers.
+    :param size: The number of keystrokes.
+    :return: Dictionary of results.
+    """
+    results = recorder_benchmark.run(size)
+    return {'ops': results['events'], 'ns_per_op': results['ns_per_event']}
+
+
+def recorder_mouse(size):
+    """
+    WindowsRecorder.on_mouse_event throughput on clicks, looking up the process of every clicked window.
+    :param size: The number of clicks.
+    :return: Dictionary of results.
+    """
+    selection.set_backend(simulated.SimulatedBackend(paused=True))
+    events = synthetic.generate_events(size, mouse_ratio=1.0)
+    recorded = []
+    windows_recorder = recorder.WindowsRecorder(None, os.getpid())
+    windows_recorder.add_recording_callback(recorded.append)
+    windows_recorder.start()
+    seconds, _ = _timed(lambda: [windows_recorder.on_mouse_event(x) for x in events])
+    windows_recorder.release()
+    listeners.WindowsListener().release()
+    selection.set_backend(None)
+    return {'ops': len(events), 'ns_per_op': seconds / len(events) * 1e9, 'recorded': len(recorded)}
+
+
+def pre_process_events(size):
+    """
+    WindowsPlaybackManager.pre_process_events throughput.
+    :param size: The number of recorded events.
+    :return: Dictionary of results.
+    """
+    events = synthetic.generate_events(size)
+    seconds, steps = _timed(playback.WindowsPlaybackManager.pre_process_events, events)
+    return {'ops': size, 'ns_per_op': seconds / size * 1e9, 'steps': len(steps)}
+
+
+def to_send_key(size):
+    """
+    converter.to_send_key throughput on a mix of letters, digits and special keys held with modifiers.
+    :param size: The number of translations.
+    :return: Dictionary of results.
+    """
+    strokes = [(chr(x), False, False, False, 1) for x in range(0x41, 0x5B)]
+    strokes += [(chr(x), True, False, False, 1) for x in range(0x30, 0x3A)]
+    strokes += [(x, False, False, i % 2 == 0, i % 3 + 1) for i, x in enumerate(_SPECIAL_KEYS)]
+    inputs = (strokes * (size // len(strokes) + 1))[:size]
+    function = converter.to_send_key
+    seconds, _ = _timed(lambda: [function(*x) for x in inputs])
+    return {'ops': size, 'ns_per_op': seconds / size * 1e9}
+
+
+def events_to_send_keys(size):
+    """
+    converter.events_to_send_keys throughput translating key presses held with modifiers in one batch.
+    :param size: The number of key presses.
+    :return: Dictionary of results.
+    """
+    events = [x for x in synthetic.generate_events(size * 2, mouse_ratio=0.0) if x.Is_Down][:size]
+    seconds, _ = _timed(converter.events_to_send_keys, events)
+    return {'ops': len(events), 'ns_per_op': seconds / len(events) * 1e9}
+
+
+def create_executable_playback_file(size):
+    """
+    WindowsPlaybackManager.create_executable_playback_file throughput, streaming the events so a million of them
+    don't have to be held in memory.
+    :param size: The number of recorded events.
+    :return: Dictionary of results.
+    """
+    script = io.StringIO()
+    seconds, _ = _timed(playback.WindowsPlaybackManager.create_executable_playback_file, script,
+                        synthetic.iterate_events(size))
+    return {'ops': size, 'ns_per_op': seconds / size * 1e9, 'script_bytes': len(script.getvalue())}
+
+
+class _EventCounter:
+    """
+    Listener that counts the events dispatched to it.
+    """
+
+    def __init__(self):
+        """
+        Initializes a new instance of the _EventCounter class.
+        """
+        self.count = 0
+
+    def on_mouse_event(self, event):
+        self.count += 1
+
+    def on_keyboard_event(self, event):
+        self.count += 1
+
+
+def listener_dispatch(size):
+    """
+    WindowsListener throughput from the simulated backend's capture thread through the transport to a listener,
+    generating events as fast as they're consumed.
+    :param size: The number of events captured.
+    :return: Dictionary of results.
+    """
+    selection.set_backend(simulated.SimulatedBackend(rate=0, count=size, paused=True))
+    counter = _EventCounter()
+    listener = listeners.WindowsListener()
+    listener.add_listener(counter)
+    start = time.perf_counter()
+    selection.get_backend().resume()
+    while counter.count < size:
+        time.sleep(0.001)
+    seconds = time.perf_counter() - start
+    listener.release()
+    selection.set_backend(None)
+    return {'ops': size, 'ns_per_op': seconds / size * 1e9}
+
+
+# The benchmarks in the order they run, and the largest size each one is run with
+BENCHMARKS = [
+    ('recorder_keyboard', recorder_keyboard, 1000000),
+    ('recorder_mouse', recorder_mouse, 100000),
+    ('pre_process_events', pre_process_events, 100000),
+    ('to_send_key', to_send_key, 1000000),
+    ('events_to_send_keys', events_to_send_keys, 1000000),
+    ('create_executable_playback_file', create_executable_playback_file, 1000000),
+    ('listener_dispatch', listener_dispatch, 100000),
+]
+
+
+def environment():
+    """
+    Describes the machine and the revision the benchmarks ran on.
+    :return: Dictionary of the environment.
+    """
+    try:
+        revision = subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL,
+                                           cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = None
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'revision': revision,
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def run(max_events=max(SIZES), repeat=3, only=None):
+    """
+    Runs the benchmarks.
+    :param max_events: The largest size to run any benchmark with.
+    :param repeat: The number of times every benchmark and size is run, the fastest run is reported.
+    :param only: The names of the benchmarks to run, None for all of them.
+    :return: Dictionary of the environment and of the results of every benchmark keyed by size.
+    """
+    results = {}
+    for name, function, largest in BENCHMARKS:
+        if only is not None and name not in only:
+            continue
+
+        results[name] = {}
+        for size in SIZES:
+            if size > min(largest, max_events):
+                break
+            runs = [function(size) for _ in range(repeat)]
+            best = min(runs, key=lambda x: x['ns_per_op'])
+            best['ns_per_op_median'] = statistics.median(x['ns_per_op'] for x in runs)
+            best['ops_per_second'] = 1e9 / best['ns_per_op']
+            results[name][str(size)] = best
+            print('%-32s %8s %14.1f ns/op %14.0f ops/s' % (name, size, best['ns_per_op'], best['ops_per_second']),
+                  file=sys.stderr)
+    return {'environment': environment(), 'results': results}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Runs the recording and conversion microbenchmarks.')
+    parser.add_argument('--output', default='benchmark_results.json', help='the JSON file to write, - for stdout')
+    parser.add_argument('--max-events', type=int, default=max(SIZES), help='the largest number of events to run')
+    parser.add_argument('--repeat', type=int, default=3, help='the runs of every benchmark, the fastest is kept')
+    parser.add_argument('--only', default=None, help='comma separated names of the benchmarks to run')
+    arguments = parser.parse_args()
+
+    report = run(arguments.max_events, arguments.repeat, arguments.only.split(',') if arguments.only else None)
+    if arguments.output == '-':
+        json.dump(report, sys.stdout, indent=2, sort_keys=True)
+    else:
+        with open(arguments.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
@@ -0,0 +1,117 @@
+import random
+
+import recording.constants as constants
+
+EventType = constants.EventType
+
+WINDOW_NAMES = ['Untitled - Notepad', 'Command Prompt', 'Inbox - Outlook', 'Key Ferry',
+                'Google - Mozilla Firefox', 'Book1 - Excel']
+
+
+class SyntheticKeyboardEvent:
+    """
+    Stand-in for a pyHook KeyboardEvent after it has been decorated by the WindowsListener and WindowsRecorder.
+    """
+
+    def __init__(self, key_id, is_down, window_name, timestamp):
+        """
+        Initializes a new instance of the SyntheticKeyboardEvent class.
+        :param key_id: The virtual key code.
+        :param is_down: True if the key was pressed, false if it was released.
+        :param window_name: The name of the window the event occurred in.
+        :param timestamp: The capture timestamp in nanoseconds.
+        """
+        self.Message = 0x0100 if is_down else 0x0101
+        self.Timestamp = timestamp
+        self.Time = timestamp // 1000000
+        self.Window = hash(window_name) & 0xFFFF
+        self.WindowName = window_name
+        self.KeyID = key_id
+        self.ScanCode = key_id & 0x7F
+        self.Ascii = key_id if 0x30 <= key_id <= 0x5A else 0
+        self.flags = 0
+        self.Key = chr(key_id) if 0x30 <= key_id <= 0x5A else 'Return'
+        self.Extended = False
+        self.Injected = False
+        self.Type = EventType.KEYBOARD
+        self.Is_Down = is_down
+        self.Is_Shift = False
+        self.Is_Ctrl = False
+        self.Is_Alt = False
+
+
+class SyntheticMouseEvent:
+    """
+    Stand-in for a pyHook MouseEvent after it has been decorated by the WindowsListener and WindowsRecorder.
+    """
+
+    def __init__(self, x, y, is_left, is_down, window_name, timestamp):
+        """
+        Initializes a new instance of the SyntheticMouseEvent class.
+        :param x: The x-coordinate of the click.
+        :param y: The y-coordinate of the click.
+        :param is_left: True if the left button was clicked, false for the right button.
+        :param is_down: True if the button was pressed, false if it was released.
+        :param window_name: The name of the window the event occurred in.
+        :param timestamp: The capture timestamp in nanoseconds.
+        """
+        self.Message = 0x0201 if is_down else 0x0202
+        self.Timestamp = timestamp
+        self.Time = timestamp // 1000000
+        self.Window = hash(window_name) & 0xFFFF
+        self.WindowName = window_name
+        self.Position = (x, y)
+        self.Wheel = 0
+        self.Injected = False
+        self.Type = EventType.MOUSE
+        self.Is_Left = is_left
+        self.Is_Right = not is_left
+        self.Is_Down = is_down
+        self.Is_Up = not is_down
+        self.Is_Double = False
+        self.Is_Move = False
+        self.Is_Shift = False
+        self.Is_Ctrl = False
+        self.Is_Alt = False
+
+
+def iterate_events(count, seed=0, mouse_ratio=0.1):
+    """
+    Generator over a reproducible stream of recorded events, mostly typing with the occasional click in another
+    window. Only one event is alive at a time, so it scales to millions of events.
+    :param count: The number of events to generate.
+    :param seed: The random seed.
+    :param mouse_ratio: The fraction of events that are mouse clicks.
+    :return: The events.
+    """
+    rng = random.Random(seed)
+    window_name = WINDOW_NAMES[0]
+    timestamp = 0
+    generated = 0
+    while generated < count:
+        timestamp += int(rng.uniform(0.02, 0.25) * 1000000000)
+        if rng.random() < mouse_ratio:
+            window_name = rng.choice(WINDOW_NAMES)
+            x, y = rng.randrange(1920), rng.randrange(1080)
+            yield SyntheticMouseEvent(x, y, True, True, window_name, timestamp)
+            timestamp += 80000000
+            if generated + 1 < count:
+                yield SyntheticMouseEvent(x, y, True, False, window_name, timestamp)
+        else:
+            key_id = rng.choice(range(0x41, 0x5B))
+            yield SyntheticKeyboardEvent(key_id, True, window_name, timestamp)
+            timestamp += 50000000
+            if generated + 1 < count:
+                yield SyntheticKeyboardEvent(key_id, False, window_name, timestamp)
+        generated += 2
+
+
+def generate_events(count, seed=0, mouse_ratio=0.1):
+    """
+    Generates a reproducible stream of recorded events, mostly typing with the occasional click in another window.
+    :param count: The number of events to generate.
+    :param seed: The random seed.
+    :param mouse_ratio: The fraction of events that are mouse clicks.
+    :return: The list of events.
+    """
+    return list(iterate_events(count, seed, mouse_ratio))
@@ -0,0 +1,98 @@
+"""
+Measures how much time compression shortens a recording full of idle periods, for generated scripts and for the
+PlaybackEngine, and checks that both actually play in the compressed time.
+
+Usage: python -m benchmarks.time_compression [event count]
+"""
+import io
+import random
+import sys
+import time
+
+import backends.selection as selection
+import backends.simulated as simulated
+import benchmarks.synthetic as synthetic
+import playback.engine as engine
+import playback.playback as playback
+import playback.preprocessing as preprocessing
+import playback.script_writer as script_writer
+
+# The timings compared, as (name, speed, max_pause, min_pause)
+TIMINGS = [
+    ('as_recorded', 1.0, None, 0.0),
+    ('clamp_2s', 1.0, 2.0, 0.0),
+    ('speed_2x', 2.0, None, 0.0),
+    ('speed_4x_clamp_1s', 4.0, 1.0, 0.02),
+]
+
+
+def generate_idle_events(count, seed=0):
+    """
+    Generates synthetic events where the user occasionally stops to read for half a minute to five minutes.
+    :param count: The number of events.
+    :param seed: The random seed.
+    :return: The list of events.
+    """
+    rng = random.Random(seed)
+    events = synthetic.generate_events(count, seed)
+    idle = 0
+    for event in events:
+        if rng.random() < 0.01:
+            idle += int(rng.uniform(30, 300) * 1000000000)
+        event.Timestamp += idle
+    return events
+
+
+def script_duration(events, timing):
+    """
+    Writes the events to a script.
+    :param events: The events.
+    :param timing: The PlaybackTiming.
+    :return: Tuple of the recorded and compressed seconds of the script.
+    """
+    writer = script_writer.PlaybackScriptWriter(io.StringIO(), preprocessing.EventPreprocessor(timing=timing))
+    for event in events:
+        writer.append(event)
+    writer.close()
+    return writer.recorded_duration, writer.duration
+
+
+def run(count):
+    """
+    Runs the benchmark.
+    :param count: The number of events recorded.
+    :return: Dictionary of results.
+    """
+    events = generate_idle_events(count)
+    results = {}
+    for name, speed, max_pause, min_pause in TIMINGS:
+        recorded, compressed = script_duration(events, preprocessing.PlaybackTiming(speed, max_pause, min_pause))
+        results['%s_recorded_minutes' % name] = recorded / 60.0
+        results['%s_played_minutes' % name] = compressed / 60.0
+        results['%s_reduction' % name] = recorded / compressed
+
+    # Play a slice of the recording squeezed into a couple of seconds, through the engine and through a script
+    # written as recorded but played with the timing, both should take the scheduled time
+    played = events[:400]
+    timing = preprocessing.PlaybackTiming(1000.0, 0.01, 0.002)
+    backend = simulated.SimulatedBackend()
+    selection.set_backend(backend)
+    report = engine.PlaybackEngine(backend).play(played, preprocessing.EventPreprocessor(timing=timing))
+    results['engine_scheduled_seconds'] = report.scheduled_duration
+    results['engine_played_seconds'] = report.duration
+
+    script = io.StringIO()
+    playback.WindowsPlaybackManager.create_executable_playback_file(script, played)
+    playback.WindowsPlaybackManager.timing = timing
+    start = time.perf_counter()
+    exec(script.getvalue(), {})
+    results['script_played_seconds'] = time.perf_counter() - start
+    playback.WindowsPlaybackManager.timing = None
+    selection.set_backend(None)
+    return results
+
+
+if __name__ == '__main__':
+    results = run(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
+    for name, value in results.items():
+        print('%-36s %12s' % (name, round(value, 2) if isinstance(value, float) else value))
@@ -0,0 +1,99 @@
+"""
+Times the edits of a playback.timeline.Timeline on recordings of increasing length, to check they cost time in
+proportion to the edit rather than to the recording: cutting a range, inserting and merging another recording,
+retiming a range and changing a pause, once on a fresh timeline and again after a hundred random edits have split it
+into many segments. Also times turning the edited timeline into a playback script.
+
+Usage: python -m benchmarks.timeline [largest event count]
+"""
+import io
+import random
+import sys
+import time
+
+import benchmarks.synthetic as synthetic
+import playback.playback as playback
+import playback.timeline as timeline
+
+# The recording lengths the edits are timed on, up to the largest event count
+SIZES = [10000, 100000, 1000000]
+
+
+def _ms(function, *args):
+    """
+    Times a call.
+    :param function: The function to call.
+    :param args: The arguments to call it with.
+    :return: The milliseconds the call took.
+    """
+    start = time.perf_counter()
+    function(*args)
+    return (time.perf_counter() - start) * 1000
+
+
+def edits(edited, inserted, rng):
+    """
+    Times one of every edit in the middle of a timeline.
+    :param edited: The Timeline to edit.
+    :param inserted: The Timeline inserted and merged into it.
+    :param rng: The random.Random the positions are picked with.
+    :return: Dictionary of the milliseconds every edit took.
+    """
+    middle = rng.randrange(len(edited) // 4, len(edited) // 2)
+    return {
+        'cut_1000': _ms(edited.cut, middle, middle + 1000),
+        'insert_%s' % len(inserted): _ms(edited.insert, middle, inserted),
+        'retime_1000': _ms(edited.retime, middle, middle + 1000, 2.0),
+        'set_pause': _ms(edited.set_pause, middle + 5, 0.25),
+        'copy_1000': _ms(edited.copy, middle, middle + 1000),
+        'merge_%s' % len(inserted): _ms(edited.merge, inserted, edited.time_of(middle)),
+        'event_at': _ms(edited.event_at, edited.duration / 2),
+    }
+
+
+def run(largest):
+    """
+    Runs the benchmark.
+    :param largest: The largest number of events in the edited recording.
+    :return: Dictionary of results keyed by the recording's length.
+    """
+    rng = random.Random(0)
+    inserted = timeline.Timeline(synthetic.generate_events(1000, seed=1))
+    results = {}
+    for size in SIZES:
+        if size > largest:
+            break
+        events = synthetic.generate_events(size)
+        start = time.perf_counter()
+        edited = timeline.Timeline(events)
+        result = {'load_ms': (time.perf_counter() - start) * 1000}
+        result.update(('fresh_%s_ms' % name, value) for name, value in edits(edited, inserted, rng).items())
+
+        # Split the timeline into many segments
+        for _ in range(100):
+            position = rng.randrange(len(edited) - 2000)
+            choice = rng.randrange(3)
+            if choice == 0:
+                edited.cut(position, position + rng.randrange(1, 200))
+            elif choice == 1:
+                edited.insert(position, inserted)
+            else:
+                edited.retime(position, position + rng.randrange(1, 2000), rng.choice((0.5, 2.0)))
+        result['segments'] = edited.segments
+        result.update(('split_%s_ms' % name, value) for name, value in edits(edited, inserted, rng).items())
+
+        script = io.StringIO()
+        seconds = _ms(playback.WindowsPlaybackManager.create_executable_playback_file, script, edited) / 1000
+        result['script_ns_per_event'] = seconds / len(edited) * 1e9
+        result['events'] = len(edited)
+        results[size] = result
+    return results
+
+
+if __name__ == '__main__':
+    results = run(int(sys.argv[1]) if len(sys.argv) > 1 else max(SIZES))
+    names = list(next(iter(results.values())))
+    print('%-32s' % 'events' + ''.join('%14s' % x for x in results))
+    for name in names:
+        print('%-32s' % name + ''.join('%14s' % (round(x[name], 3) if isinstance(x[name], float) else x[name])
+                                       for x in results.values()))
@@ -0,0 +1,111 @@
+"""
+Replays synthetic event streams with a known spacing and reports the timing error percentiles of recording and
+playback. Recording compares the capture timestamps taken in the hook process against timestamping events when the
+recorder receives them, which is what the recorder used to do.
+
+Usage: python -m benchmarks.timing_fidelity [event count] [milliseconds between events]
+"""
+import multiprocessing
+import sys
+import time
+
+import benchmarks.playback_timing as playback_timing
+import benchmarks.synthetic as synthetic
+import utilities.metrics as metrics
+import utilities.transports as transports
+
+# The WindowsListener's batching, which can't be imported without pyHook.
+BATCH_SIZE = 32
+BATCH_INTERVAL_NS = 2000000
+
+
+def producer(transport, events, interval_ns):
+    """
+    Stands in for the hook manager's process. Events are timestamped as they occur and sent in batches, the same way
+    the WindowsListener's sender thread does.
+    :param transport: The transport to put events into.
+    :param events: The events to send.
+    :param interval_ns: The nanoseconds between events.
+    """
+    pending = []
+    batch_start = 0
+    deadline = metrics.perf_counter_ns()
+    for event in events:
+        remaining = deadline - metrics.perf_counter_ns()
+        if remaining > 0:
+            time.sleep(remaining / 1000000000.0)
+        event.Timestamp = metrics.perf_counter_ns()
+        if not pending:
+            batch_start = event.Timestamp
+        pending.append(event)
+        if len(pending) >= BATCH_SIZE or metrics.perf_counter_ns() - batch_start >= BATCH_INTERVAL_NS:
+            transport.put_many(pending)
+            pending = []
+        deadline += interval_ns
+
+    if pending:
+        transport.put_many(pending)
+
+
+def spacing_error(timestamps, interval_ns):
+    """
+    Measures how far the spacing between consecutive timestamps is from the known spacing.
+    :param timestamps: The nanosecond timestamps of the events.
+    :param interval_ns: The known nanoseconds between events.
+    :return: The Histogram of absolute spacing errors in nanoseconds.
+    """
+    histogram = metrics.Histogram()
+    for index in range(1, len(timestamps)):
+        histogram.record(abs(timestamps[index] - timestamps[index - 1] - interval_ns))
+    return histogram
+
+
+def run_recording(count, interval_ms):
+    """
+    Records synthetic events sent through the default transport.
+    :param count: The number of events to record.
+    :param interval_ms: The milliseconds between events.
+    :return: Dictionary of spacing error summaries keyed by timestamp source.
+    """
+    interval_ns = int(interval_ms * 1000000)
+    events = synthetic.generate_events(count)
+    transport = transports.create_transport()
+    process = multiprocessing.Process(target=producer, args=(transport, events, interval_ns))
+    process.start()
+
+    captured = []
+    received = []
+    for _ in range(count):
+        event = transport.get()
+        received.append(metrics.perf_counter_ns())
+        captured.append(event.Timestamp)
+    process.join()
+    transport.shutdown()
+    transport.close()
+
+    return {
+        'recording_capture': spacing_error(captured, interval_ns).summary(),
+        'recording_receipt': spacing_error(received, interval_ns).summary(),
+    }
+
+
+def run(count, interval_ms):
+    """
+    Runs the benchmark.
+    :param count: The number of events to record and play.
+    :param interval_ms: The milliseconds between events.
+    :return: Dictionary of timing error summaries.
+    """
+    results = run_recording(count, interval_ms)
+    for method, summary in playback_timing.run(count, interval_ms).items():
+        results['playback_' + method] = summary
+    return results
+
+
+if __name__ == '__main__':
+    results = run(int(sys.argv[1]) if len(sys.argv) > 1 else 1000,
+                  float(sys.argv[2]) if len(sys.argv) > 2 else 5)
+    for method, summary in results.items():
+        print(method)
+        for name in ('p50', 'p95', 'p99', 'max'):
+            print('    error %-4s %12.1f us' % (name, summary[name] / 1000.0))
@@ -0,0 +1,100 @@
+"""
+Measures hook-to-listener latency and CPU per event for the Manager queue and the shared memory ring buffer
+transports.
+
+Usage: python -m benchmarks.transport [event count] [microseconds between events]
+"""
+import multiprocessing
+import sys
+import time
+
+import benchmarks.synthetic as synthetic
+import utilities.transports as transports
+
+
+def percentile(values, fraction):
+    """
+    Gets a percentile from a list of values.
+    :param values: The sorted values.
+    :param fraction: The percentile as a fraction between 0 and 1.
+    :return: The value at the percentile.
+    """
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def producer(transport, events, interval_ns, sent, cpu_seconds):
+    """
+    Stands in for the hook manager's process, putting events into the transport at a fixed rate.
+    :param transport: The transport to put events into.
+    :param events: The events to send.
+    :param interval_ns: The nanoseconds between events.
+    :param sent: Shared array receiving the time every event was sent.
+    :param cpu_seconds: Shared value receiving the CPU time used by the producer.
+    """
+    cpu_start = time.process_time()
+    deadline = time.perf_counter_ns()
+    for index, event in enumerate(events):
+        remaining = deadline - time.perf_counter_ns()
+        if remaining > 0:
+            time.sleep(remaining / 1e9)
+        sent[index] = time.perf_counter_ns()
+        transport.put(event)
+        deadline += interval_ns
+    cpu_seconds.value = time.process_time() - cpu_start
+
+
+def run_transport(kind, events, interval_ns):
+    """
+    Sends every event through a transport and measures the results.
+    :param kind: The Transport to measure.
+    :param events: The events to send.
+    :param interval_ns: The nanoseconds between events.
+    :return: Dictionary of results.
+    """
+    count = len(events)
+    transport = transports.create_transport(kind)
+    sent = multiprocessing.Array('q', count, lock=False)
+    producer_cpu = multiprocessing.Value('d', 0.0, lock=False)
+    received = [0] * count
+
+    process = multiprocessing.Process(target=producer, args=(transport, events, interval_ns, sent, producer_cpu))
+    cpu_start = time.process_time()
+    process.start()
+    for index in range(count):
+        transport.get()
+        received[index] = time.perf_counter_ns()
+    consumer_cpu = time.process_time() - cpu_start
+    process.join()
+    transport.shutdown()
+    transport.close()
+
+    latencies = sorted((received[x] - sent[x]) / 1000.0 for x in range(count))
+    return {
+        'latency_p50_us': percentile(latencies, 0.50),
+        'latency_p95_us': percentile(latencies, 0.95),
+        'latency_p99_us': percentile(latencies, 0.99),
+        'latency_max_us': latencies[-1],
+        'producer_cpu_us_per_event': producer_cpu.value / count * 1e6,
+        'consumer_cpu_us_per_event': consumer_cpu / count * 1e6,
+    }
+
+
+def run(count, interval_us):
+    """
+    Runs the benchmark. The Manager server's own CPU time is not included in the queue's numbers.
+    :param count: The number of events to send.
+    :param interval_us: The microseconds between events.
+    :return: Dictionary of results keyed by transport.
+    """
+    events = synthetic.generate_events(count)
+    return {kind: run_transport(kind, events, interval_us * 1000)
+            for kind in (transports.Transport.QUEUE, transports.Transport.RING_BUFFER)}
+
+
+if __name__ == '__main__':
+    results = run(int(sys.argv[1]) if len(sys.argv) > 1 else 20000,
+                  int(sys.argv[2]) if len(sys.argv) > 2 else 200)
+    for kind, measurements in results.items():
+        print(kind)
+        for name, value in measurements.items():
+            print('    %-30s %10.2f' % (name, value))
@@ -0,0 +1,124 @@
+"""
+Measures the WindowCache behind the recorder's "ignore this process" filter: how many clicks are answered without
+asking the backend who owns the window, what a click costs with and without the cache, and that a reused window
+handle is looked up again.
+
+Usage: python -m benchmarks.window_cache [click count]
+"""
+import random
+import sys
+import time
+
+import backends.selection as selection
+import backends.simulated as simulated
+import benchmarks.synthetic as synthetic
+import recording.recorder as recorder
+import utilities.listeners as listeners
+import utilities.window_cache as window_cache
+
+
+class CountingBackend(simulated.SimulatedBackend):
+    """
+    Simulated backend that counts the window owner lookups.
+    """
+
+    def __init__(self):
+        """
+        Initializes a new instance of the CountingBackend class.
+        """
+        super().__init__(paused=True)
+        self.lookups = 0
+
+    def get_window_process_id(self, window):
+        self.lookups += 1
+        return super().get_window_process_id(window)
+
+
+def generate_clicks(backend, count, seed=0):
+    """
+    Generates clicks spread over the backend's windows, most of them in the first few windows like a user going back
+    and forth between a couple of applications.
+    :param backend: The SimulatedBackend whose windows are clicked.
+    :param count: The number of clicks.
+    :param seed: The random seed.
+    :return: The list of events.
+    """
+    rng = random.Random(seed)
+    weights = [1.0 / (index + 1) for index in range(len(backend.windows))]
+    clicks = []
+    for index in range(count):
+        window, name = rng.choices(list(zip(backend.windows, backend.window_names)), weights)[0]
+        event = synthetic.SyntheticMouseEvent(rng.randrange(1920), rng.randrange(1080), True, index % 2 == 0, name,
+                                              index * 1000000)
+        event.Window = window
+        clicks.append(event)
+    return clicks
+
+
+def record(backend, cache, clicks, process_to_ignore):
+    """
+    Passes clicks to a WindowsRecorder using a window cache.
+    :param backend: The CountingBackend.
+    :param cache: The WindowCache the recorder uses.
+    :param clicks: The click events.
+    :param process_to_ignore: The process whose windows are ignored.
+    :return: Tuple of the nanoseconds per click, the clicks recorded and the owner lookups made.
+    """
+    recorded = []
+    windows_recorder = recorder.WindowsRecorder(recorded, process_to_ignore, windows=cache)
+    windows_recorder.start()
+    backend.lookups = 0
+    start = time.perf_counter()
+    for event in clicks:
+        windows_recorder.on_mouse_event(event)
+    seconds = time.perf_counter() - start
+    windows_recorder.release()
+    return seconds / len(clicks) * 1e9, len(recorded), backend.lookups
+
+
+def run(count):
+    """
+    Runs the benchmark.
+    :param count: The number of clicks.
+    :return: Dictionary of results.
+    """
+    backend = CountingBackend()
+    selection.set_backend(backend)
+    clicks = generate_clicks(backend, count)
+
+    # Ignore a process other than ours, the recorder used to compare against its own process whatever it was told
+    ignored_window = backend.windows[1]
+    ignored_process = backend.process_ids[ignored_window]
+    expected = sum(1 for x in clicks if x.Window != ignored_window)
+
+    # The uncached recorder asks the backend about every click, the cached one uses the cache recorders share by default
+    uncached, uncached_recorded, uncached_lookups = record(
+        backend, window_cache.WindowCache(backend, max_age=0), clicks, ignored_process)
+    cache = window_cache.get_window_cache()
+    cached, cached_recorded, cached_lookups = record(backend, cache, clicks, ignored_process)
+    results = {
+        'clicks': count,
+        'uncached_ns_per_click': uncached,
+        'cached_ns_per_click': cached,
+        'uncached_backend_lookups': uncached_lookups,
+        'cached_backend_lookups': cached_lookups,
+        'ignored_clicks_dropped': uncached_recorded == cached_recorded == expected,
+    }
+    results.update(('cache_%s' % name, value) for name, value in cache.stats().items())
+
+    # The ignored window is destroyed and its handle reused by another process' window
+    backend.process_ids[ignored_window] = 4242
+    reused = synthetic.SyntheticMouseEvent(10, 10, True, True, 'Reused - Paint', 0)
+    reused.Window = ignored_window
+    results['reused_handle_process'] = cache.get_process_id(reused.Window, reused.WindowName)
+    results['reused_handle_invalidations'] = cache.invalidations
+
+    listeners.WindowsListener().release()
+    selection.set_backend(None)
+    return results
+
+
+if __name__ == '__main__':
+    results = run(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
+    for name, value in results.items():
+        print('%-30s %12s' % (name, round(value, 4) if isinstance(value, float) else value))
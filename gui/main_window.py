@@ -23,6 +23,7 @@ class MainWindow:
 
         # Variables
         self.should_ignore_own_window = tkinter.IntVar(value=1)
+        self.should_record_moves = tkinter.IntVar(value=0)
 
         # GUI Elements
         self.record_button = tkinter.Button(self.window, text='Record')
@@ -31,6 +32,9 @@ class MainWindow:
         self.recording_options_record_own_window_checkbutton = tkinter.Checkbutton(self.recording_options_group,
                                                                                    text="Ignore this Process",
                                                                                    variable=self.should_ignore_own_window)
+        self.recording_options_record_moves_checkbutton = tkinter.Checkbutton(self.recording_options_group,
+                                                                              text="Record Mouse Movement",
+                                                                              variable=self.should_record_moves)
         # self.macro_group = tkinter.LabelFrame(self.window, text="Macros", padx=5, pady=5)
         # self.macro_current_macros = ttk.Treeview(self.macro_group)
         # self.macro_key_label = tkinter.Label(self.macro_group, text="Key:")
@@ -56,6 +60,7 @@ class MainWindow:
         self.recording_options_group.grid(column="0", row="1", columnspan="2")
         # self.macro_group.grid(column="0", row="2", columnspan="2")
         self.recording_options_record_own_window_checkbutton.grid(column="0", row="0")
+        self.recording_options_record_moves_checkbutton.grid(column="0", row="1")
         # self.macro_current_macros.grid(column="0", row="0", columnspan="6")
         # self.macro_key_label.grid(column="0", row="1")
         # self.macro_key_text.grid(column="1", row="1")
@@ -90,6 +95,7 @@ class MainWindow:
         """
         self.play_button.config(state=tkinter.DISABLED)
         self.recording_options_record_own_window_checkbutton.config(state=tkinter.DISABLED)
+        self.recording_options_record_moves_checkbutton.config(state=tkinter.DISABLED)
         self.record_button.config(text='Stop Recording')
 
     def on_record_ended(self):
@@ -98,4 +104,5 @@ class MainWindow:
         """
         self.play_button.config(state=tkinter.NORMAL)
         self.recording_options_record_own_window_checkbutton.config(state=tkinter.NORMAL)
+        self.recording_options_record_moves_checkbutton.config(state=tkinter.NORMAL)
         self.record_button.config(text='Record')
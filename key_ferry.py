@@ -1,17 +1,25 @@
 import multiprocessing
 import os
+import shutil
+import tempfile
 import tkinter
 import tkinter.filedialog
 import tkinter.messagebox
 
 import gui.main_window as main_window
 import playback.playback as playback
+import playback.script_writer as script_writer
+import playback.worker as worker
+import recording.archive as archive
 import recording.constants as constants
 import recording.recorder as recorder
 import utilities.listeners as listeners
 
 EventType = constants.EventType
 
+# The extension of recordings, saved as compressed recording archives
+RECORDING_EXTENSION = archive.EXTENSION
+
 
 class GlobalInfo:
     """
@@ -26,9 +34,13 @@ class GlobalInfo:
         self.window = None  # A reference to the main window
         self.recording = False  # Indicates if we're currently recording
         self.end_recording_event = None  # A reference to the event handle to end the recording process
-        self.recorded_events = None  # A list of values outputted by the recording process
+        self.recording_file = None  # The temporary file the recording archive is written to while recording
+        self.archive_writer = None  # Streams the recorded events into the recording_file in compressed chunks
+        self.script_file = None  # The temporary file the script is written to while recording
+        self.script_writer = None  # Writes the recorded events to the script_file as they arrive
         self.playing_file = None  # The subprocess that is playing a file currently
         self.playing_back = False  # Indicates if we're currently playing back a file
+        self.playback_worker = worker.PlaybackWorker()  # The warm process every file is played back on
         self.input_listener = listeners.WindowsListener()
         self.windows_recorder = None
 
@@ -43,7 +55,13 @@ def record_click():
     if global_info.recording:
         # Start the recording
         process_to_ignore = os.getpid() if global_info.window.should_ignore_own_window.get() else None
-        global_info.windows_recorder = recorder.WindowsRecorder(global_info.recorded_events, process_to_ignore)
+        global_info.recording_file = tempfile.NamedTemporaryFile(mode='wb', suffix=RECORDING_EXTENSION, delete=False)
+        global_info.archive_writer = archive.ArchiveWriter(global_info.recording_file)
+        global_info.script_file = tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False)
+        global_info.script_writer = script_writer.PlaybackScriptWriter(global_info.script_file)
+        global_info.windows_recorder = recorder.WindowsRecorder(global_info.archive_writer, process_to_ignore,
+                                                                global_info.window.should_record_moves.get() == 1)
+        global_info.windows_recorder.add_recording_callback(global_info.script_writer.append)
         global_info.windows_recorder.start()
         global_info.window.on_record_started()
     else:
@@ -52,14 +70,31 @@ def record_click():
             global_info.windows_recorder.release()
             global_info.windows_recorder = None
 
-        # Open a save file dialog so the user can save their script
-        file = tkinter.filedialog.asksaveasfile(mode='w', defaultextension=".py")
-
-        # If the cancel button wasn't pressed, save the script
-        if file is not None:
-            playback.WindowsPlaybackManager.create_executable_playback_file(file, global_info.recorded_events)
-            file.close()
-        global_info.recorded_events = manager.list()
+        # The recording and script were written while recording, we only need to finish them off. Releasing the
+        # recorder waited for its last event to be written, so nothing writes to them anymore.
+        global_info.script_writer.close()
+        global_info.script_file.close()
+        # Closing the archive writes its chunk index, a late event would be written after it and corrupt the file
+        global_info.archive_writer.close()
+        global_info.recording_file.close()
+        global_info.script_writer = None
+        global_info.archive_writer = None
+
+        # Open a save file dialog so the user can save their recording or export it as a script
+        file = tkinter.filedialog.asksaveasfilename(defaultextension=RECORDING_EXTENSION,
+                                                    filetypes=[('Key Ferry Recording', '*' + RECORDING_EXTENSION),
+                                                               ('Python Script', '*.py')])
+
+        # If the cancel button wasn't pressed, save the chosen format and throw away the other
+        saved = None
+        if file:
+            saved = global_info.script_file if file.lower().endswith('.py') else global_info.recording_file
+            shutil.move(saved.name, file)
+        for temporary_file in (global_info.recording_file, global_info.script_file):
+            if temporary_file is not saved:
+                os.remove(temporary_file.name)
+        global_info.recording_file = None
+        global_info.script_file = None
         global_info.window.on_record_ended()
 
 
@@ -92,7 +127,8 @@ def play_file():
 
         # If the user didn't push cancel launch a subprocess
         if file is not None and os.path.exists(file):
-            global_info.playing_file = playback.WindowsPlaybackManager(file, [on_playback_started], [on_playback_ended])
+            global_info.playing_file = playback.WindowsPlaybackManager(file, [on_playback_started], [on_playback_ended],
+                                                                       global_info.playback_worker)
             global_info.playing_file.start()
     else:
         # Stop the playback
@@ -108,7 +144,9 @@ if __name__ == '__main__':
     global_info = GlobalInfo()
     manager = multiprocessing.Manager()
     global_info.end_recording_event = manager.Event()
-    global_info.recorded_events = manager.list()
+
+    # Warm up the playback worker while the user is busy with the window
+    global_info.playback_worker.start(wait=False)
 
     # Create our GUI
     global_info.window = main_window.MainWindow()
@@ -119,10 +157,11 @@ if __name__ == '__main__':
     if global_info.playing_file is not None:
         global_info.playing_file.stop()
 
+    global_info.playback_worker.release()
+
     if global_info.input_listener is not None:
         global_info.input_listener.release()
 
-        # TODO: Combine keyboard events together to save space
         # Text to speech that made me laugh
         # message = ""
         # for event in rec.events:
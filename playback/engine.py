@@ -0,0 +1,241 @@
+import array
+import threading
+
+import backends.base as base
+import playback.preprocessing as preprocessing
+import playback.recording_index as recording_index
+import recording.archive as archive
+import recording.constants as constants
+import recording.event_log as event_log
+import utilities.metrics as metrics
+
+EventType = constants.EventType
+
+
+class PlaybackReport:
+    """
+    The scheduling error of every event injected during a playback.
+    """
+
+    def __init__(self):
+        """
+        Initializes a new instance of the PlaybackReport class.
+        """
+        self.errors_ns = array.array('q')  # How late every event was injected, in nanoseconds
+        self.histogram = metrics.Histogram()
+        self.duration = 0.0  # The seconds the playback took
+        self.saved_events = 0  # The number of keystrokes coalesced into an earlier injection
+        self.injections = 0  # The number of injection calls, a batch of steps due together counts as one
+        self.recorded_duration = 0.0  # The seconds from the first to the last step as recorded
+        self.scheduled_duration = 0.0  # The seconds from the first to the last step once the pauses were compressed
+        self.cancelled = False  # Indicates if the playback was stopped before it finished
+
+    def record(self, error_ns):
+        """
+        Records the scheduling error of an event.
+        :param error_ns: The nanoseconds between the event's deadline and its injection.
+        """
+        self.errors_ns.append(error_ns)
+        self.histogram.record(error_ns)
+
+    def summary(self):
+        """
+        Summarizes the report.
+        :return: Dictionary with the number of events, the playback's duration and the scheduling error percentiles in
+                 nanoseconds.
+        """
+        summary = self.histogram.summary()
+        summary['duration'] = self.duration
+        summary['cancelled'] = self.cancelled
+        summary['saved_events'] = self.saved_events
+        summary['injections'] = self.injections
+        summary['recorded_duration'] = self.recorded_duration
+        summary['scheduled_duration'] = self.scheduled_duration
+        return summary
+
+
+class PlaybackEngine:
+    """
+    Plays recorded events directly instead of through a generated script. Every injection is scheduled against an
+    absolute deadline computed from the recording's timestamps, so sleep overshoot never accumulates into drift. Steps
+    due within the batch window of each other are handed to the injector as one batch.
+    """
+    # Seconds before a deadline at which the engine stops sleeping and spins, 0 to never spin.
+    DEFAULT_SPIN = 0.002
+    # Steps due within this many seconds of the first step of a batch are injected with it, 0 to never batch.
+    DEFAULT_BATCH_WINDOW = 0.001
+
+    def __init__(self, injector, spin=DEFAULT_SPIN, stop_event=None, batch_window=DEFAULT_BATCH_WINDOW):
+        """
+        Initializes a new instance of the PlaybackEngine class.
+        :param injector: The object that injects the input. Must have key_press(keys), mouse_click(x, y, down, left),
+                         mouse_move(x, y), mouse_wheel(x, y, wheel) and inject(actions) methods, such as the
+                         WindowsPlaybackManager class or an InputBackend.
+        :param spin: The seconds before each deadline spent spin-waiting for sub-millisecond accuracy.
+        :param stop_event: The threading.Event that stops the playback when set, a new one if None.
+        :param batch_window: The seconds after a step within which later steps are injected in the same batch.
+        """
+        self.__injector = injector
+        self.__spin_ns = int(spin * 1000000000)
+        self.__batch_window_ns = int(batch_window * 1000000000)
+        self.__stopped = stop_event if stop_event is not None else threading.Event()
+
+    def play(self, events, preprocessor=None):
+        """
+        Plays the events, blocking until the playback finishes or stop is called.
+        :param events: The EventLog, EventLogReader or any iterable of recorded events to play.
+        :param preprocessor: The EventPreprocessor that turns the events into playback steps, a new one with the
+                             default settings if None.
+        :return: The PlaybackReport of the playback.
+        """
+        if preprocessor is None:
+            preprocessor = preprocessing.EventPreprocessor()
+
+        report = PlaybackReport()
+        batch = []
+        batch_deadline = 0
+        start = metrics.perf_counter_ns()
+        for event, times, offset, keys in preprocessing.preprocess(events, preprocessor):
+            deadline = start + offset
+            if batch and deadline - batch_deadline > self.__batch_window_ns:
+                if not self.__play_batch(batch, batch_deadline, report):
+                    break
+                batch = []
+            if not batch:
+                batch_deadline = deadline
+            batch.append(to_action(event, keys))
+        else:
+            if batch:
+                self.__play_batch(batch, batch_deadline, report)
+
+        report.saved_events = preprocessor.saved_events
+        report.recorded_duration = preprocessor.recorded_offset / 1000000000.0
+        report.scheduled_duration = preprocessor.offset / 1000000000.0
+        report.duration = (metrics.perf_counter_ns() - start) / 1000000000.0
+        return report
+
+    def __play_batch(self, batch, deadline, report):
+        """
+        Waits for a batch's deadline and injects it.
+        :param batch: The list of Action tuples.
+        :param deadline: The perf_counter_ns value the first action is due at.
+        :param report: The PlaybackReport to record the scheduling error of every step in.
+        :return: False if the playback was stopped while waiting, true otherwise.
+        """
+        if not self.__wait_until(deadline):
+            report.cancelled = True
+            return False
+
+        error = metrics.perf_counter_ns() - deadline
+        for _ in batch:
+            report.record(error)
+        if len(batch) == 1:
+            action = batch[0]
+            getattr(self.__injector, action[0])(*action[1:])
+        else:
+            self.__injector.inject(batch)
+        report.injections += 1
+        return True
+
+    def __wait_until(self, deadline):
+        """
+        Waits until the deadline, sleeping for most of the time and spinning for the rest.
+        :param deadline: The perf_counter_ns value to wait for.
+        :return: False if the playback was stopped while waiting, true otherwise.
+        """
+        remaining = deadline - metrics.perf_counter_ns() - self.__spin_ns
+        if remaining > 0 and self.__stopped.wait(remaining / 1000000000.0):
+            return False
+
+        while metrics.perf_counter_ns() < deadline:
+            pass
+        return not self.__stopped.is_set()
+
+    def stop(self):
+        """
+        Stops the playback. Thread-safe.
+        """
+        self.__stopped.set()
+
+
+def to_action(event, keys):
+    """
+    Converts a playback step to the input it injects.
+    :param event: The event to play.
+    :param keys: The SendKeys command of a keyboard step.
+    :return: The Action tuple.
+    """
+    if event.Type == EventType.MOUSE:
+        x, y = event.Position
+        if event.Is_Move:
+            return base.Action.MOUSE_MOVE, x, y
+        elif event.Wheel:
+            return base.Action.MOUSE_WHEEL, x, y, event.Wheel
+        return base.Action.MOUSE_CLICK, x, y, event.Is_Down, event.Is_Left
+    return base.Action.KEY_PRESS, keys
+
+
+def is_event_log(file):
+    """
+    Checks if a file is an event log rather than a playback script.
+    :param file: The string filename.
+    :return: True if the file starts with the event log's magic number, false otherwise.
+    """
+    with open(file, 'rb') as f:
+        return f.read(len(event_log.MAGIC)) == event_log.MAGIC
+
+
+def is_recording(file):
+    """
+    Checks if a file is a recording, either an event log or a recording archive, rather than a playback script.
+    :param file: The string filename.
+    :return: True if the file starts with the magic number of an event log or a recording archive, false otherwise.
+    """
+    with open(file, 'rb') as f:
+        return f.read(len(event_log.MAGIC)) in (event_log.MAGIC, archive.MAGIC)
+
+
+def open_recording(f):
+    """
+    Opens a recording for streaming, choosing the reader from the file's magic number.
+    :param f: The binary file object to read from, positioned at the start of the recording.
+    :return: The EventLogReader or ArchiveReader of the file.
+    """
+    magic = f.read(len(archive.MAGIC))
+    f.seek(-len(magic), 1)
+    if magic == archive.MAGIC:
+        return archive.ArchiveReader(f)
+    return event_log.EventLogReader(f)
+
+
+def play_file(file, injector, spin=PlaybackEngine.DEFAULT_SPIN, stop_event=None, timing=None, playback_range=None):
+    """
+    Plays an event log or recording archive file.
+    :param file: The string filename of the recording.
+    :param injector: The object that injects the input, see PlaybackEngine.
+    :param spin: The seconds before each deadline spent spin-waiting.
+    :param stop_event: The threading.Event that stops the playback when set, see PlaybackEngine.
+    :param timing: The PlaybackTiming that compresses the pauses, None to play them as recorded.
+    :param playback_range: The PlaybackRange to play, None to play the whole recording. The playback seeks to the
+                           start of the range through the recording's RecordingIndex and presses the mouse buttons
+                           held down there again first.
+    :return: The PlaybackReport of the playback.
+    """
+    playback_engine = PlaybackEngine(injector, spin, stop_event)
+    preprocessor = preprocessing.EventPreprocessor(timing=timing)
+    with open(file, 'rb') as f:
+        reader = open_recording(f)
+        if playback_range is None:
+            return playback_engine.play(reader, preprocessor)
+
+        recording_slice = recording_index.get_index(file, reader).read(reader, playback_range)
+        restore = recording_slice.start_state.restore_actions()
+        if restore:
+            injector.inject(restore)
+        report = playback_engine.play(recording_slice, preprocessor)
+
+        # Don't leave a button held down when the range ends in the middle of a drag
+        release = recording_slice.state.release_actions()
+        if release and not report.cancelled:
+            injector.inject(release)
+        return report
@@ -1,44 +1,66 @@
-import inspect
 import multiprocessing
-import os
 import threading
-import win32api
-
-import win32com.client
-import win32con
 
+import backends.selection as selection
+import playback.engine as engine
+import playback.preprocessing as preprocessing
+import playback.recording_index as recording_index
+import playback.script_writer as script_writer
 import python_executor
 import recording.constants as constants
-import utilities.converter as converter
+import recording.exceptions as exceptions
 import utilities.listeners as listeners
 
 
 class WindowsPlaybackManager:
     """
-    Manager class that plays back recorded files for Windows.
+    Manager class that plays back recorded files, injecting the input through the input backend.
     """
     # TODO: Thread-safe object
     DEFAULT_TIMEOUT = 30
 
-    def __init__(self, file, on_playback_started=None, on_playback_ended=None):
+    # F12, pressing it stops the playback
+    STOP_KEY = 123
+
+    # Set to stop the playback running in this process, the next sleep or injection raises a PlaybackCancelledError
+    cancel_event = threading.Event()
+
+    # The PlaybackTiming that compresses the pauses of the scripts played in this process, None to sleep as written
+    timing = None
+
+    def __init__(self, file, on_playback_started=None, on_playback_ended=None, worker=None, timing=None, start=None,
+                 end=None, start_time=None, end_time=None):
         """
         Initializes a new instance of the WindowsPlaybackManager class. This class only supports a single playback.
         If the playback ends, either because the user chose to or the file completed,
         :param file: The string filename to play.
         :param on_playback_started: The function to call when file playback starts. Should be a pickle-able iterable.
         :param on_playback_ended: The function to call when file playback ends. Should be a pickle-able iterable.
+        :param worker: The started PlaybackWorker to play the file on, or None to spawn a new process for it.
+        :param timing: The PlaybackTiming that compresses the pauses, None to play them as recorded.
+        :param start: The number of the first event of a recording to play, None to start at the first event or at
+                      start_time.
+        :param end: The number of the event of a recording to stop before, None to play to the end or to end_time.
+        :param start_time: The seconds into a recording of the first event to play, None to start at start.
+        :param end_time: The seconds into a recording to stop at, None to stop at end.
+        :exception ArgumentError: Thrown if the range to play is invalid, see PlaybackRange.
         """
+        self.playback_range = None  # The PlaybackRange of the recording to play, None to play all of it
+        if any(x is not None for x in (start, end, start_time, end_time)):
+            self.playback_range = recording_index.PlaybackRange(start, end, start_time, end_time)
 
         # Create the interprocess list that will record all our keystrokes and mouse clicks
         self.__key_logger = listeners.WindowsListener()
-        self.__key_logger.add_listener(self)
+        self.__key_logger.add_listener(self, constants.EventMask.KEYBOARD, key_ids=[WindowsPlaybackManager.STOP_KEY])
         self.__recorded_script_process = None
+        self.__worker = worker
+        self.__job = None
         self.__script_ended_thread = None
         self.__released = False
         self.__on_playback_started = on_playback_started
         self.__on_playback_ended = on_playback_ended
-        self.__shell = win32com.client.Dispatch("WScript.Shell")
         self.file = file
+        self.__timing = timing
 
     def start(self):
         """
@@ -50,12 +72,17 @@ class WindowsPlaybackManager:
             for func in self.__on_playback_started:
                 func()
 
-        # Process that plays back the file
-        self.__recorded_script_process = multiprocessing.Process(target=python_executor.execute_file,
-                                                                 args=(self.file,),
-                                                                 name='Executing Playback Process')
-        self.__recorded_script_process.daemon = True
-        self.__recorded_script_process.start()
+        if self.__worker is not None:
+            # The warm worker plays back the file
+            self.__job = self.__worker.submit(self.file, timing=self.__timing, playback_range=self.playback_range)
+        else:
+            # Process that plays back the file
+            self.__recorded_script_process = multiprocessing.Process(target=python_executor.execute_file,
+                                                                     args=(self.file, self.__timing,
+                                                                           self.playback_range),
+                                                                     name='Executing Playback Process')
+            self.__recorded_script_process.daemon = True
+            self.__recorded_script_process.start()
 
         # Thread to wait for the script to end
         self.__script_ended_thread = threading.Thread(target=self.script_ended_thread_worker,
@@ -63,28 +90,24 @@ class WindowsPlaybackManager:
         self.__script_ended_thread.daemon = True
         self.__script_ended_thread.start()
 
-    def on_mouse_event(self, event):
-        """
-        Handles recording mouse events.
-        :param event: The event that occurred.
-        """
-        # Do nothing
-        pass
-
     def on_keyboard_event(self, event):
         """
-        Routes keyboard events.
+        Handles the stop key, the only keyboard event subscribed to.
         :param event: The event to route.
         """
-        if event.Type == constants.EventType.KEYBOARD and not event.Injected and event.KeyID == 123:
+        if not event.Injected:
             self.release()
 
     def script_ended_thread_worker(self):
         """
         This function is launched in a separate 'Script Ended Thread' thread which polls to see if the
-        'Key Logger Worker Process' process has ended to clean up all of this classes resources.
+        'Key Logger Worker Process' process, or the worker's job, has ended to clean up all of this classes resources.
         """
-        self.__recorded_script_process.join()
+        job = self.__job
+        if job is not None:
+            job.wait()
+        else:
+            self.__recorded_script_process.join()
 
         # Terminate the terminator thread
         self.release()
@@ -95,25 +118,36 @@ class WindowsPlaybackManager:
         """
         self.release()
 
+    @staticmethod
+    def sleep(seconds):
+        """
+        Static method that waits between the steps of a playback script, ending early if the playback is cancelled.
+        The pause is compressed by the timing, if one is set.
+        :param seconds: The seconds to wait.
+        :exception PlaybackCancelledError: Thrown if the playback was cancelled.
+        """
+        if WindowsPlaybackManager.timing is not None:
+            seconds = WindowsPlaybackManager.timing.pause(seconds)
+        if WindowsPlaybackManager.cancel_event.wait(seconds):
+            raise exceptions.PlaybackCancelledError('the playback was cancelled')
+
+    @staticmethod
+    def __check_cancelled():
+        """
+        Static method that stops an injection once the playback is cancelled.
+        :exception PlaybackCancelledError: Thrown if the playback was cancelled.
+        """
+        if WindowsPlaybackManager.cancel_event.is_set():
+            raise exceptions.PlaybackCancelledError('the playback was cancelled')
+
     @staticmethod
     def key_press(key):
         """
         Static method that simulates a keyboard press.
         :param key: The key identifier to send to windows
         """
-        try:
-            shell = win32com.client.Dispatch("WScript.Shell")
-            shell.SendKeys(key)
-        except Exception as e:
-            e_msg = win32api.FormatMessage(e.excepinfo[5])
-            print("Failure replaying the '", key, "' key with the following exception: ", e_msg, end='', sep='')
-
-            # if is_down_only:
-            #     win32api.keybd_event(key_id, 0, win32con.KEYEVENTF_EXTENDEDKEY, 0)
-            # elif is_up_only:
-            #     win32api.keybd_event(key_id, 0, win32con.KEYEVENTF_EXTENDEDKEY | win32con.KEYEVENTF_KEYUP, 0)
-            # else:
-            #     win32api.keybd_event(key_id, 0, 0, 0)
+        WindowsPlaybackManager.__check_cancelled()
+        selection.get_backend().key_press(key)
 
     @staticmethod
     def mouse_click(x, y, down, left):
@@ -124,122 +158,71 @@ class WindowsPlaybackManager:
         :param down: Indicates if the click is a keypress down
         :param left: Indicates if the click is a left keypress
         """
-        win32api.SetCursorPos((x, y))
+        WindowsPlaybackManager.__check_cancelled()
+        selection.get_backend().mouse_click(x, y, down, left)
 
-        if down:
-            if left:
-                code = win32con.MOUSEEVENTF_LEFTDOWN
-            else:
-                code = win32con.MOUSEEVENTF_RIGHTDOWN
-        else:
-            if left:
-                code = win32con.MOUSEEVENTF_LEFTUP
-            else:
-                code = win32con.MOUSEEVENTF_RIGHTUP
+    @staticmethod
+    def mouse_move(x, y):
+        """
+        Static method that simulates a mouse move.
+        :param x: The x-coordinate to move to.
+        :param y: The y-coordinate to move to.
+        """
+        WindowsPlaybackManager.__check_cancelled()
+        selection.get_backend().mouse_move(x, y)
+
+    @staticmethod
+    def mouse_wheel(x, y, wheel):
+        """
+        Static method that simulates a wheel scroll.
+        :param x: The x-coordinate of the scroll.
+        :param y: The y-coordinate of the scroll.
+        :param wheel: The number of notches scrolled, positive to scroll away from the user.
+        """
+        WindowsPlaybackManager.__check_cancelled()
+        selection.get_backend().mouse_wheel(x, y, wheel)
 
-        win32api.mouse_event(code, x, y, 0, 0)
+    @staticmethod
+    def inject(actions):
+        """
+        Static method that simulates a batch of input due at the same time with as few calls as the backend allows.
+        :param actions: The list of Action tuples, in the order they're injected.
+        """
+        WindowsPlaybackManager.__check_cancelled()
+        selection.get_backend().inject(actions)
 
     @staticmethod
-    def create_executable_playback_file(file, events):
+    def create_executable_playback_file(file, events, timing=None):
         """
         Writes a list of events to an executable script for the user.
         :param file: The file to write to.
-        :param events: The list of events to create a script from.
+        :param events: The EventLog, or any iterable of recorded events, to create a script from, or the string filename
+                       of an event log or recording archive, which is streamed one chunk at a time.
+        :param timing: The PlaybackTiming that compresses the pauses written, None to write them as recorded.
+        :return: The PlaybackScriptWriter, with the recorded and compressed durations of the script.
         """
+        if isinstance(events, str):
+            with open(events, 'rb') as f:
+                return WindowsPlaybackManager.create_executable_playback_file(file, engine.open_recording(f), timing)
 
-        # Print header
-        print('# Mandatory imports', file=file)
-        print('import time', file=file)
-        print('import sys', file=file)
-        print('', file=file)
-        print('', file=file)
-        print("# Set Python's path", file=file)
-        print('sys.path.append(r"%s%s")' % (os.path.dirname(inspect.getfile(WindowsPlaybackManager)), r'\..'),
-              file=file)
-        print('from playback.playback import WindowsPlaybackManager', file=file)
-        print('', file=file)
-        print('', file=file)
-
-        # Find the longest string
-        max_length = 0
-
-        # Pre-process the events
-        events = WindowsPlaybackManager.pre_process_events(events)
-
-        # Gather events in script form
-        for x in range(0, len(events)):
-            event = curr = events[x]
-            if event.Type == constants.EventType.MOUSE:
-                event.Executable = 'WindowsPlaybackManager.mouse_click(%s, %s, %s, %s)' % (
-                    event.Position[0], event.Position[1], event.Is_Down, event.Is_Left)
-
-                length = len(event.Executable)
-                if length > max_length:
-                    max_length = length + 4
-            elif event.Type == constants.EventType.KEYBOARD:
-                converted_key = converter.to_send_key(event.Key, event.Is_Ctrl, event.Is_Alt, event.Is_Shift,
-                                                      event.Times)
-                event.Executable = 'WindowsPlaybackManager.key_press("%s")' % (converted_key or event.Key)
-
-                length = len(event.Executable)
-                if length > max_length:
-                    max_length = length + 4
-            events[x] = curr
-
-        # Print everything to the file
+        writer = script_writer.PlaybackScriptWriter(file, preprocessing.EventPreprocessor(timing=timing))
         for event in events:
-            print("time.sleep(%s)" % event.Time, file=file)
-            if event.Type == constants.EventType.MOUSE:
-                print('%-*s%s' % (max_length, event.Executable, "# Window: %s" % event.WindowName), file=file)
-            elif event.Type == constants.EventType.KEYBOARD:
-                message = ''
-                if event.Is_Shift:
-                    message += "Shift + "
-                if event.Is_Alt:
-                    message += "Alt + "
-                if event.Is_Ctrl:
-                    message += "Ctrl + "
-
-                print('%-*s%s' % (max_length, event.Executable, "# Key: %s%s " % (message, event.Key)), file=file)
+            writer.append(event)
+        writer.close()
+        return writer
 
     @staticmethod
     def pre_process_events(events):
         """
         Pre-processes the list of events.
-        :param events: The events that need to be pre-processed.
+        :param events: The EventLog, or any iterable of recorded events, that need to be pre-processed.
         :return: The new list of events.
         """
         results = []
-        previous_alt_tab = False
-
-        # Iterate over the collection combining events that need to be performed in a single operation.
-        for event in events:
+        for event, times, _, _ in preprocessing.preprocess(events, preprocessing.EventPreprocessor(max_run=1)):
             # Add attributes we'll use later.
-            event.Times = 1
-
-            if event.Type == constants.EventType.KEYBOARD:
-                # If we're ALT + TABing we need to combine the TAB sending into a single line. If we fail to
-                # do this the key playback will consider each individual TAB a single TAB through the currently active
-                # application's controls and not switch applications.
-                if event.Is_Alt and event.Key.upper() == "TAB":
-                    if not previous_alt_tab:
-                        previous_alt_tab = True
-                    else:
-                        previous.Times += 1
-                        continue
-                else:
-                    previous_alt_tab = False
-
-                # The event list will contain key up events for CTRL, ALT, and SHIFT. We want to filter these out.
-                if not event.Is_Down:
-                    previous = event
-                    continue
-            else:
-                previous_alt_tab = False
-
+            event.Times = times
             results.append(event)
-            previous = event
-
         return results
 
     def release(self):
@@ -251,6 +234,12 @@ class WindowsPlaybackManager:
 
         self.__released = True
 
+        # Stop the worker's job, the worker itself stays warm for the next playback
+        job = self.__job
+        if job is not None:
+            self.__worker.stop_job(job)
+            self.__worker = None
+
         # End the playback violently
         recorded_script_process = self.__recorded_script_process
         if recorded_script_process is not None:
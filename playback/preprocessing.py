@@ -0,0 +1,260 @@
+import recording.constants as constants
+import recording.exceptions as exceptions
+import utilities.converter as converter
+
+EventType = constants.EventType
+
+
+class PlaybackTiming:
+    """
+    Compresses the pauses between playback steps: every pause is divided by the speed, then clamped to max_pause so
+    long idle periods don't replay in full, then raised to min_pause so the target application is never flooded.
+    """
+
+    def __init__(self, speed=1.0, max_pause=None, min_pause=0.0):
+        """
+        Initializes a new instance of the PlaybackTiming class.
+        :param speed: The factor playback is sped up by, 2.0 plays twice as fast.
+        :param max_pause: The longest pause, in seconds, between two steps once sped up, None for no limit.
+        :param min_pause: The shortest pause, in seconds, between two steps.
+        :exception ArgumentError: Thrown if the speed isn't positive or the pauses contradict each other.
+        """
+        if speed <= 0:
+            raise exceptions.ArgumentError('the playback speed must be positive, not %s' % speed)
+        if max_pause is not None and max_pause < min_pause:
+            raise exceptions.ArgumentError('max_pause %s is shorter than min_pause %s' % (max_pause, min_pause))
+        self.speed = speed
+        self.max_pause = max_pause
+        self.min_pause = min_pause
+        self.__max_pause_ns = int(max_pause * 1000000000) if max_pause is not None else None
+        self.__min_pause_ns = int(min_pause * 1000000000)
+
+    def pause_ns(self, pause):
+        """
+        Compresses a pause.
+        :param pause: The recorded pause in nanoseconds.
+        :return: The pause to play in nanoseconds.
+        """
+        pause = int(pause / self.speed)
+        if self.__max_pause_ns is not None and pause > self.__max_pause_ns:
+            pause = self.__max_pause_ns
+        if pause < self.__min_pause_ns:
+            pause = self.__min_pause_ns
+        return pause
+
+    def pause(self, seconds):
+        """
+        Compresses a pause.
+        :param seconds: The recorded pause in seconds.
+        :return: The pause to play in seconds.
+        """
+        return self.pause_ns(seconds * 1000000000) / 1000000000.0
+
+
+class EventPreprocessor:
+    """
+    Turns recorded events into playback steps one event at a time. A step is a tuple of the event to play, the number
+    of times to play it, the nanoseconds between the first recorded event's timestamp and the event's timestamp and,
+    for keyboard steps, the SendKeys command to play.
+
+    Runs of printable keystrokes typed with the same modifiers into the same window are coalesced into a single
+    SendKeys command, as are repeats of the same special key, as long as no gap in the run is longer than max_gap. The
+    run is played at the time of its first keystroke. Only the run being built is held back.
+
+    The offsets of the finished steps are rescaled by the PlaybackTiming, if there is one. Coalescing is decided on the
+    recorded offsets, so compressing the playback doesn't change which keystrokes are coalesced.
+    """
+    # The longest pause, in seconds, between two keystrokes of the same run
+    DEFAULT_MAX_GAP = 0.3
+    # The most keystrokes coalesced into a single step, 1 to never coalesce
+    DEFAULT_MAX_RUN = 64
+
+    # The kinds of run a step can start
+    __TEXT = 1
+    __SPECIAL = 2
+
+    def __init__(self, max_gap=DEFAULT_MAX_GAP, max_run=DEFAULT_MAX_RUN, timing=None):
+        """
+        Initializes a new instance of the EventPreprocessor class.
+        :param max_gap: The longest pause, in seconds, between two keystrokes that are coalesced.
+        :param max_run: The most keystrokes coalesced into a single step, 1 to never coalesce.
+        :param timing: The PlaybackTiming that compresses the pauses between steps, None to keep them as recorded.
+        """
+        self.__max_gap = int(max_gap * 1000000000)
+        self.__max_run = max_run
+        self.__timing = timing
+        self.__pending = None
+        self.__pending_times = 1
+        self.__pending_offset = 0
+        self.__origin = None
+        self.__previous_alt_tab = False
+
+        # The run of steps being coalesced
+        self.__run = None
+        self.__run_kind = None
+        self.__run_times = 0
+        self.__run_offset = 0
+        self.__run_last_offset = 0
+        self.__run_commands = []
+
+        self.steps = 0  # The number of steps finished
+        self.saved_events = 0  # The number of keystrokes coalesced into an earlier step
+        self.recorded_offset = 0  # The recorded offset of the last step finished, in nanoseconds
+        self.offset = 0  # The offset the last step finished is played at, in nanoseconds
+
+    def append(self, event):
+        """
+        Adds the next recorded event.
+        :param event: The recorded event.
+        :return: The step that was finished by this event, or None if no step was finished.
+        """
+        if self.__origin is None:
+            self.__origin = event.Timestamp
+
+        if event.Type == EventType.KEYBOARD:
+            # If we're ALT + TABing we need to combine the TAB sending into a single line. If we fail to
+            # do this the key playback will consider each individual TAB a single TAB through the currently active
+            # application's controls and not switch applications.
+            if event.Is_Alt and event.Key.upper() == "TAB":
+                if self.__previous_alt_tab:
+                    self.__pending_times += 1
+                    return None
+                self.__previous_alt_tab = True
+            else:
+                self.__previous_alt_tab = False
+
+            # The events will contain key up events for CTRL, ALT, and SHIFT. We want to filter these out.
+            if not event.Is_Down:
+                return None
+        else:
+            self.__previous_alt_tab = False
+
+        pending = self.__pending
+        pending_times = self.__pending_times
+        pending_offset = self.__pending_offset
+        self.__pending = event
+        self.__pending_times = 1
+        self.__pending_offset = event.Timestamp - self.__origin
+        if pending is None:
+            return None
+        return self.__coalesce(pending, pending_times, pending_offset)
+
+    def __coalesce(self, event, times, offset):
+        """
+        Adds a step to the run being built.
+        :param event: The event to play.
+        :param times: The number of times to play the event.
+        :param offset: The nanoseconds from the start of the recording the event occurred at.
+        :return: The step that was finished, or None if the step was added to the run.
+        """
+        kind = None
+        if event.Type == EventType.KEYBOARD and self.__max_run > 1:
+            if times == 1 and is_printable(event):
+                kind = self.__TEXT
+            elif event.Key.upper() in converter.FROM_KEY_TO_SENDKEY:
+                kind = self.__SPECIAL
+
+        run = self.__run
+        if (kind is not None and kind == self.__run_kind and self.__run_times < self.__max_run and
+                offset - self.__run_last_offset <= self.__max_gap and event.WindowName == run.WindowName and
+                event.Is_Ctrl == run.Is_Ctrl and event.Is_Alt == run.Is_Alt and event.Is_Shift == run.Is_Shift and
+                (kind == self.__TEXT or event.Key == run.Key)):
+            if kind == self.__TEXT:
+                self.__run_commands.append(converter.to_send_key_code(event.KeyID) or event.Key.lower())
+            self.__run_times += times
+            self.__run_last_offset = offset
+            self.saved_events += 1
+            return None
+
+        step = self.__finish_run()
+        self.__run = event
+        self.__run_kind = kind
+        self.__run_times = times
+        self.__run_offset = offset
+        self.__run_last_offset = offset
+        if kind == self.__TEXT:
+            self.__run_commands = [converter.to_send_key_code(event.KeyID) or event.Key.lower()]
+        return step
+
+    def __finish_run(self):
+        """
+        Finishes the run being built.
+        :return: The finished step, or None if no run was being built.
+        """
+        event = self.__run
+        if event is None:
+            return None
+
+        self.__run = None
+        offset = self.__run_offset
+        if self.__timing is not None:
+            offset = self.offset + self.__timing.pause_ns(offset - self.recorded_offset)
+        self.steps += 1
+        self.recorded_offset = self.__run_offset
+        self.offset = offset
+        if event.Type != EventType.KEYBOARD:
+            return event, self.__run_times, offset, None
+        if self.__run_kind == self.__TEXT and self.__run_times > 1:
+            keys = converter.with_modifiers(''.join(self.__run_commands), event.Is_Ctrl, event.Is_Alt,
+                                            event.Is_Shift)
+        else:
+            keys = to_send_keys(event, self.__run_times)
+        return event, self.__run_times, offset, keys
+
+    def flush(self):
+        """
+        Finishes the event being held back and the run being built.
+        :return: The list of finished steps.
+        """
+        steps = []
+        if self.__pending is not None:
+            step = self.__coalesce(self.__pending, self.__pending_times, self.__pending_offset)
+            self.__pending = None
+            if step is not None:
+                steps.append(step)
+
+        step = self.__finish_run()
+        if step is not None:
+            steps.append(step)
+        return steps
+
+
+def preprocess(events, preprocessor=None):
+    """
+    Generator over the playback steps of a recording.
+    :param events: The EventLog, or any iterable of recorded events.
+    :param preprocessor: The EventPreprocessor to use, a new one with the default settings if None.
+    :return: The (event, times, offset, keys) steps.
+    """
+    if preprocessor is None:
+        preprocessor = EventPreprocessor()
+    for event in events:
+        step = preprocessor.append(event)
+        if step is not None:
+            yield step
+
+    for step in preprocessor.flush():
+        yield step
+
+
+def is_printable(event):
+    """
+    Checks if a keyboard event types a single character.
+    :param event: The keyboard event.
+    :return: True for letters, digits and space, false otherwise.
+    """
+    key = event.Key
+    return (len(key) == 1 and key.isalnum()) or key.upper() == 'SPACE'
+
+
+def to_send_keys(event, times):
+    """
+    Gets the SendKeys command that plays back a keyboard event.
+    :param event: The keyboard event.
+    :param times: The number of times the key is pressed.
+    :return: The SendKeys command.
+    """
+    command = converter.to_send_key_code(event.KeyID, converter.to_modifiers(event), times)
+    if command is None:
+        command = converter.to_send_key(event.Key, event.Is_Ctrl, event.Is_Alt, event.Is_Shift, times) or event.Key
+    return command
@@ -0,0 +1,310 @@
+import array
+import bisect
+import collections
+import itertools
+import os
+import threading
+
+import recording.archive as archive
+import recording.event_log as event_log
+import recording.exceptions as exceptions
+
+InputState = event_log.InputState
+
+# The timestamp is the last field of an event log record
+_TIMESTAMP = 9
+
+# The most indexes kept by get_index, the least recently used one is dropped first
+MAX_CACHED_INDEXES = 8
+
+_indexes = collections.OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+class PlaybackRange:
+    """
+    The part of a recording to play. Each end is either an event number, counting the recorded events from 0, or a
+    time in seconds from the recording's first event. The range includes its start and excludes its end.
+    """
+
+    def __init__(self, start=None, end=None, start_time=None, end_time=None):
+        """
+        Initializes a new instance of the PlaybackRange class.
+        :param start: The number of the first event to play, None to start at the first event or at start_time.
+        :param end: The number of the event to stop before, None to play to the end or to end_time.
+        :param start_time: The seconds into the recording of the first event to play, None to start at start.
+        :param end_time: The seconds into the recording to stop at, None to stop at end.
+        :exception ArgumentError: Thrown if an end is given both ways, is negative or comes before the start.
+        """
+        if start is not None and start_time is not None:
+            raise exceptions.ArgumentError('the range starts at event %s and at %s seconds' % (start, start_time))
+        if end is not None and end_time is not None:
+            raise exceptions.ArgumentError('the range ends at event %s and at %s seconds' % (end, end_time))
+        for value in (start, end, start_time, end_time):
+            if value is not None and value < 0:
+                raise exceptions.ArgumentError('the range can\'t start or end before the recording: %s' % value)
+        if start is not None and end is not None and end < start:
+            raise exceptions.ArgumentError('the range ends at event %s before it starts at %s' % (end, start))
+        if start_time is not None and end_time is not None and end_time < start_time:
+            raise exceptions.ArgumentError('the range ends at %ss before it starts at %ss' % (end_time, start_time))
+        self.start = start
+        self.end = end
+        self.start_time = start_time
+        self.end_time = end_time
+
+
+class Checkpoint:
+    """
+    A point of a recording playback can start reading from.
+    """
+    __slots__ = ('event', 'location', 'timestamp', 'state')
+
+    def __init__(self, event, location, timestamp, state):
+        """
+        Initializes a new instance of the Checkpoint class.
+        :param event: The number of the event at the checkpoint.
+        :param location: The byte offset reading resumes at: the position returned by the EventLogReader's tell, or
+                         the offset of the recording archive chunk the event starts.
+        :param timestamp: The timestamp of the event.
+        :param state: The InputState just before the event.
+        """
+        self.event = event
+        self.location = location
+        self.timestamp = timestamp
+        self.state = state
+
+
+class RecordingIndex:
+    """
+    Index over the events of a recording, so playback can start from any event number or time without replaying
+    everything before it. A Checkpoint with the input state is taken every interval events of an event log and at
+    the start of every chunk of a recording archive, since a chunk is decompressed whole anyway. Finding where to
+    start is a binary search over the checkpoints, reading then skips at most the events between two checkpoints.
+    The writers store the checkpoints at the end of the file, so a recording is only read through to take them if it
+    was written without them.
+    """
+    DEFAULT_INTERVAL = event_log.EventLogWriter.DEFAULT_CHECKPOINT_INTERVAL
+
+    def __init__(self, reader, interval=DEFAULT_INTERVAL, rebuild=False):
+        """
+        Initializes a new instance of the RecordingIndex class, from the checkpoints stored in the recording or by
+        reading the whole recording once.
+        :param reader: The EventLogReader or ArchiveReader of the recording, positioned at its first event.
+        :param interval: The events between two checkpoints of an event log read through, stored checkpoints keep the
+                         interval they were written with.
+        :param rebuild: True to read the whole recording even if it has stored checkpoints.
+        """
+        self.__checkpoints = []
+        self.__events = array.array('q')  # The event number of every checkpoint, for the binary search
+        self.__timestamps = array.array('q')  # The timestamp of every checkpoint, for the binary search
+        self.count = 0  # The number of events in the recording
+        self.first_timestamp = 0
+        self.last_timestamp = 0
+        self.window_names = ()  # The window names of an event log, indexed by id
+
+        if isinstance(reader, archive.ArchiveReader):
+            states = None if rebuild else reader.chunk_states
+            if states is not None:
+                for info, chunk_state in zip(reader.index or (), states):
+                    self.__add(self.count, info.offset, info.first_timestamp, chunk_state)
+                    self.count += info.count
+                    self.last_timestamp = info.last_timestamp
+            else:
+                self.__read_archive(reader)
+        else:
+            footer = None if rebuild else reader.read_footer()
+            if footer is not None:
+                for event, location, timestamp, checkpoint_state in footer.checkpoints:
+                    self.__add(event, location, timestamp, checkpoint_state)
+                self.count = footer.count
+                self.last_timestamp = footer.last_timestamp
+                self.window_names = footer.window_names
+            else:
+                self.__read_event_log(reader, interval)
+
+        if self.__checkpoints:
+            self.first_timestamp = self.__checkpoints[0].timestamp
+
+    def __read_archive(self, reader):
+        """
+        Takes a checkpoint at the start of every chunk of a recording archive, reading it through.
+        :param reader: The ArchiveReader of the recording, positioned at its first event.
+        """
+        state = InputState()
+        for info, records in reader.chunks():
+            self.__add(self.count, info.offset, records[0][0][_TIMESTAMP], state)
+            for record, _ in records:
+                state.update(record)
+            self.count += len(records)
+            self.last_timestamp = records[-1][0][_TIMESTAMP]
+
+    def __read_event_log(self, reader, interval):
+        """
+        Takes a checkpoint every interval events of an event log, reading it through.
+        :param reader: The EventLogReader of the recording, positioned at its first event.
+        :param interval: The events between two checkpoints.
+        """
+        state = InputState()
+        location = reader.tell()
+        for record, _ in reader.records():
+            if self.count % interval == 0:
+                self.__add(self.count, location, record[_TIMESTAMP], state)
+            state.update(record)
+            self.count += 1
+            self.last_timestamp = record[_TIMESTAMP]
+            location = reader.tell()
+        self.window_names = reader.window_names
+
+    def __add(self, event, location, timestamp, state):
+        """
+        Adds a checkpoint.
+        :param event: The number of the event at the checkpoint.
+        :param location: The byte offset reading resumes at.
+        :param timestamp: The timestamp of the event.
+        :param state: The InputState just before the event, copied.
+        """
+        self.__checkpoints.append(Checkpoint(event, location, timestamp, state.copy()))
+        self.__events.append(event)
+        self.__timestamps.append(timestamp)
+
+    def __len__(self):
+        """
+        The number of checkpoints.
+        """
+        return len(self.__checkpoints)
+
+    @property
+    def duration(self):
+        """
+        The seconds from the first to the last event.
+        """
+        return (self.last_timestamp - self.first_timestamp) / 1000000000.0
+
+    def to_timestamp(self, seconds):
+        """
+        Converts a time into the recording to a timestamp.
+        :param seconds: The seconds from the first event.
+        :return: The timestamp in nanoseconds.
+        """
+        return self.first_timestamp + int(round(seconds * 1000000000))
+
+    def find(self, event=None, seconds=None):
+        """
+        Finds the last checkpoint before an event.
+        :param event: The number of the event, used if seconds is None.
+        :param seconds: The seconds into the recording of the event.
+        :return: The Checkpoint, None if the recording is empty.
+        """
+        if not self.__checkpoints:
+            return None
+        if seconds is not None:
+            # Events with the same timestamp can straddle a checkpoint, start from one strictly before the time
+            position = bisect.bisect_left(self.__timestamps, self.to_timestamp(seconds)) - 1
+        else:
+            position = bisect.bisect_right(self.__events, event or 0) - 1
+        return self.__checkpoints[max(position, 0)]
+
+    def read(self, reader, playback_range):
+        """
+        Reads a range of the recording.
+        :param reader: The EventLogReader or ArchiveReader of the recording, which must be able to seek.
+        :param playback_range: The PlaybackRange to read.
+        :return: The RecordingSlice of the events in the range.
+        """
+        return RecordingSlice(self, reader, playback_range)
+
+
+class RecordingSlice:
+    """
+    The recorded events of a PlaybackRange. Reading starts at the last checkpoint before the range, the events up to
+    the range are skipped without being decoded, only applied to the input state, so start_state holds what was held
+    down when the range starts.
+    """
+
+    def __init__(self, index, reader, playback_range):
+        """
+        Initializes a new instance of the RecordingSlice class and moves the reader to the first event of the range.
+        :param index: The RecordingIndex of the recording.
+        :param reader: The EventLogReader or ArchiveReader of the recording, which must be able to seek.
+        :param playback_range: The PlaybackRange to read.
+        """
+        self.__end = playback_range.end
+        self.__end_timestamp = None
+        if playback_range.end_time is not None:
+            self.__end_timestamp = index.to_timestamp(playback_range.end_time)
+        self.__first = None
+        self.__records = iter(())
+        self.count = 0  # The number of events read so far
+        self.first_event = index.count  # The number of the first event in the range
+        self.state = InputState()  # The input state after the last event read
+
+        checkpoint = index.find(playback_range.start, playback_range.start_time)
+        if checkpoint is not None:
+            if isinstance(reader, archive.ArchiveReader):
+                reader.seek(checkpoint.location)
+            else:
+                reader.seek(checkpoint.location, index.window_names)
+            self.__records = reader.records()
+            self.state = checkpoint.state.copy()
+
+            # Skip to the start of the range
+            event = checkpoint.event
+            start = playback_range.start
+            start_timestamp = None
+            if playback_range.start_time is not None:
+                start_timestamp = index.to_timestamp(playback_range.start_time)
+            for record, window_name in self.__records:
+                if ((start is None or event >= start) and
+                        (start_timestamp is None or record[_TIMESTAMP] >= start_timestamp)):
+                    self.__first = record, window_name
+                    self.first_event = event
+                    break
+                self.state.update(record)
+                event += 1
+        self.start_state = self.state.copy()  # The input state when the range starts
+
+    def __iter__(self):
+        first = self.__first
+        if first is None:
+            return
+        self.__first = None
+
+        event = self.first_event
+        end = self.__end
+        end_timestamp = self.__end_timestamp
+        previous_timestamp = first[0][_TIMESTAMP]
+        state = self.state
+        for record, window_name in itertools.chain((first,), self.__records):
+            timestamp = record[_TIMESTAMP]
+            if (end is not None and event >= end) or (end_timestamp is not None and timestamp >= end_timestamp):
+                return
+            yield event_log.RecordedEvent(record, window_name, previous_timestamp)
+            state.update(record)
+            previous_timestamp = timestamp
+            event += 1
+            self.count += 1
+
+
+def get_index(file, reader):
+    """
+    Gets the index of a recording file, building it if the file isn't indexed or has changed since. The last
+    MAX_CACHED_INDEXES indexes are kept, so playing parts of the same recording again doesn't read its checkpoints, or
+    the whole recording if it was written without them, again.
+    :param file: The string filename of the recording.
+    :param reader: The EventLogReader or ArchiveReader of the file at its first event, used to build the index.
+    :return: The RecordingIndex.
+    """
+    status = os.stat(file)
+    key = (os.path.abspath(file), status.st_size, status.st_mtime_ns)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is not None:
+            _indexes.move_to_end(key)
+            return index
+
+    index = RecordingIndex(reader)
+    with _indexes_lock:
+        _indexes[key] = index
+        while len(_indexes) > MAX_CACHED_INDEXES:
+            _indexes.popitem(last=False)
+    return index
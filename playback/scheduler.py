@@ -0,0 +1,259 @@
+import collections
+import functools
+import itertools
+import threading
+import time
+
+import playback.worker as worker
+import recording.constants as constants
+import utilities.metrics as metrics
+
+JobStatus = constants.JobStatus
+
+
+class PlaybackScheduler:
+    """
+    Plays many files at once on a bounded pool of warm PlaybackWorker processes, one job per worker at a time. Jobs
+    wait in submission order for a free worker, can be cancelled whether they're waiting or playing and are stopped
+    once they run past their timeout. A job that ignores the stop for GRACE_PERIOD seconds has its worker killed, the
+    worker is restarted by its supervisor.
+    """
+    DEFAULT_WORKERS = 4
+
+    # Seconds a timed out job has to stop before its worker is killed
+    GRACE_PERIOD = 5.0
+
+    # The longest the scheduler thread sleeps between checks of the timeouts
+    POLL_INTERVAL = 0.25
+
+    def __init__(self, workers=DEFAULT_WORKERS, backend=None, on_playback_started=None, on_playback_ended=None,
+                 on_job_started=None, on_job_ended=None):
+        """
+        Initializes a new instance of the PlaybackScheduler class.
+        :param workers: The number of playbacks run at once, each on its own process.
+        :param backend: The Backend the workers inject into, the default backend if None.
+        :param on_playback_started: The functions to call when the scheduler goes from idle to playing.
+        :param on_playback_ended: The functions to call when every submitted job has finished.
+        :param on_job_started: The functions to call with every job as it starts playing.
+        :param on_job_ended: The functions to call with every job as it finishes, whatever its status.
+        """
+        self.__workers = [worker.PlaybackWorker(backend) for _ in range(workers)]
+        self.__idle = list(reversed(self.__workers))
+        self.__queue = collections.deque()
+        self.__running = {}  # Job to [worker, worker's job, deadline, time the job was stopped at]
+        self.__job_ids = itertools.count(1)
+        self.__changed = threading.Condition()
+        self.__scheduler_thread = None
+        self.__released = False
+        self.__busy = False
+        self.__unfinished = 0  # The jobs submitted that haven't finished
+        self.__on_playback_started = list(on_playback_started or [])
+        self.__on_playback_ended = list(on_playback_ended or [])
+        self.__on_job_started = list(on_job_started or [])
+        self.__on_job_ended = list(on_job_ended or [])
+        self.__first_started = None
+        self.__last_finished = None
+        self.__statuses = collections.Counter()
+        self.__wall_times = metrics.Histogram()  # Nanoseconds every finished job played for
+
+    def start(self, wait=True):
+        """
+        Starts the worker processes and the 'Playback Scheduler Thread'.
+        :param wait: True to block until every worker has warmed up.
+        """
+        with self.__changed:
+            if self.__released:
+                raise RuntimeError('the playback scheduler was released')
+            if self.__scheduler_thread is None:
+                self.__scheduler_thread = threading.Thread(target=self.__schedule, name='Playback Scheduler Thread')
+                self.__scheduler_thread.daemon = True
+                self.__scheduler_thread.start()
+
+        for x in self.__workers:
+            x.start(wait=False)
+        if wait:
+            for x in self.__workers:
+                x.start()
+
+    def submit(self, file, timeout=None, timing=None, playback_range=None):
+        """
+        Queues a file to be played on the next free worker, starting the scheduler if needed.
+        :param file: The string filename of the playback script or event log.
+        :param timeout: The seconds the job may play for before it's stopped, None for no limit.
+        :param timing: The PlaybackTiming that compresses the pauses, None to play them as recorded.
+        :param playback_range: The PlaybackRange of a recording to play, None to play all of it.
+        :return: The PlaybackJob.
+        """
+        job = worker.PlaybackJob(next(self.__job_ids), file, timeout=timeout, timing=timing,
+                                 playback_range=playback_range)
+        self.start(wait=False)
+        with self.__changed:
+            self.__queue.append(job)
+            self.__unfinished += 1
+            self.__changed.notify()
+        return job
+
+    def cancel(self, job):
+        """
+        Cancels a job. A waiting job never plays, a playing job is stopped at its next sleep or injection.
+        :param job: The PlaybackJob to cancel.
+        """
+        with self.__changed:
+            if job in self.__queue:
+                self.__queue.remove(job)
+            else:
+                running = self.__running.get(job)
+                if running is not None:
+                    running[0].stop_job(running[1])
+                return
+        self.__finish(job, JobStatus.CANCELLED)
+
+    def wait(self, timeout=None):
+        """
+        Waits for every submitted job to finish.
+        :param timeout: The seconds to wait, None to wait forever.
+        :return: True if every job finished, false if the timeout expired.
+        """
+        with self.__changed:
+            return self.__changed.wait_for(lambda: self.__unfinished == 0, timeout)
+
+    def __schedule(self):
+        """
+        This function is launched in a separate 'Playback Scheduler Thread' thread which hands waiting jobs to free
+        workers and stops the jobs that run past their timeout.
+        """
+        while True:
+            with self.__changed:
+                if self.__released:
+                    return
+
+                started = False
+                while self.__queue and self.__idle:
+                    job = self.__queue.popleft()
+                    playback_worker = self.__idle.pop()
+                    job.status = JobStatus.RUNNING
+                    job.started = time.perf_counter()
+                    if self.__first_started is None:
+                        self.__first_started = job.started
+                    started = True
+
+                    # Notify while holding the lock, so a job that finishes at once can't be reported first
+                    if not self.__busy:
+                        self.__busy = True
+                        for func in self.__on_playback_started:
+                            func()
+                    for func in self.__on_job_started:
+                        func(job)
+
+                    deadline = job.started + job.timeout if job.timeout is not None else None
+                    running = [playback_worker, None, deadline, None]
+                    self.__running[job] = running
+                    running[1] = playback_worker.submit(
+                        job.file, functools.partial(self.__on_worker_job_finished, job, playback_worker), job.timing,
+                        job.playback_range)
+
+                now = time.perf_counter()
+                wait = PlaybackScheduler.POLL_INTERVAL
+                for running in self.__running.values():
+                    playback_worker, worker_job, deadline, stopped = running
+                    if deadline is None:
+                        continue
+                    if stopped is None:
+                        if now >= deadline:
+                            running[3] = now
+                            playback_worker.stop_job(worker_job)
+                        else:
+                            wait = min(wait, deadline - now)
+                    elif now - stopped >= PlaybackScheduler.GRACE_PERIOD:
+                        # Never kill it twice
+                        running[3] = float('inf')
+                        playback_worker.kill()
+
+                if not started:
+                    self.__changed.wait(wait)
+
+    def __on_worker_job_finished(self, job, playback_worker, worker_job):
+        """
+        Frees the worker that played a job and finishes the job with the worker's status.
+        :param job: The scheduler's PlaybackJob.
+        :param playback_worker: The PlaybackWorker that played it.
+        :param worker_job: The worker's PlaybackJob.
+        """
+        status = worker_job.status
+        with self.__changed:
+            running = self.__running.pop(job, None)
+            if running is None:
+                return
+            self.__idle.append(playback_worker)
+            self.__changed.notify_all()
+            if running[3] is not None and status in (JobStatus.CANCELLED, JobStatus.CRASHED):
+                status = JobStatus.TIMED_OUT
+        self.__finish(job, status, worker_job.detail)
+
+    def __finish(self, job, status, detail=None):
+        """
+        Finishes a job, records its wall time and notifies the callbacks.
+        :param job: The PlaybackJob.
+        :param status: The JobStatus it finished with.
+        :param detail: The summary or traceback of the job.
+        """
+        job._finish(status, detail)
+        with self.__changed:
+            self.__statuses[status] += 1
+            self.__last_finished = job.finished
+            if job.wall_time is not None:
+                self.__wall_times.record(int(job.wall_time * 1000000000))
+            self.__unfinished -= 1
+            ended = self.__busy and self.__unfinished == 0
+            if ended:
+                self.__busy = False
+            self.__changed.notify_all()
+
+        for func in self.__on_job_ended:
+            func(job)
+        if ended:
+            for func in self.__on_playback_ended:
+                func()
+
+    def report(self):
+        """
+        Summarizes the jobs finished so far.
+        :return: Dictionary with the number of jobs finished with every JobStatus, the seconds from the first job
+                 starting to the last finishing, the jobs completed per minute and the wall time percentiles of the
+                 jobs in seconds.
+        """
+        with self.__changed:
+            summary = {'jobs': sum(self.__statuses.values())}
+            summary.update(self.__statuses)
+            elapsed = 0.0
+            if self.__first_started is not None and self.__last_finished is not None:
+                elapsed = self.__last_finished - self.__first_started
+            summary['elapsed'] = elapsed
+            summary['scripts_per_minute'] = self.__statuses[JobStatus.COMPLETED] * 60.0 / elapsed if elapsed else 0.0
+            for name, value in self.__wall_times.summary().items():
+                if name != 'count':
+                    summary['wall_time_%s' % name] = value / 1000000000.0
+        return summary
+
+    def release(self):
+        """
+        Releases the managed and un-managed resources associated with the instance. Waiting jobs are cancelled,
+        playing jobs are stopped and the worker processes exit.
+        """
+        with self.__changed:
+            if self.__released:
+                return
+            self.__released = True
+            waiting = list(self.__queue)
+            self.__queue.clear()
+            self.__changed.notify_all()
+
+        for job in waiting:
+            self.__finish(job, JobStatus.CANCELLED)
+        for x in self.__workers:
+            x.release()
+
+        scheduler_thread = self.__scheduler_thread
+        if scheduler_thread is not None and scheduler_thread is not threading.current_thread():
+            scheduler_thread.join(worker.PlaybackWorker.DEFAULT_TIMEOUT)
+        self.__scheduler_thread = None
@@ -0,0 +1,323 @@
+import collections
+import hashlib
+import hmac
+import locale
+import marshal
+import os
+import stat
+import sys
+import threading
+
+# The environment variable that overrides the directory compiled scripts are cached in
+ENVIRONMENT_VARIABLE = 'KEY_FERRY_CACHE'
+
+# The extension of a cached, compiled script
+EXTENSION = '.kfc'
+
+# The name of the file in the cache directory holding the key entries are signed with
+KEY_FILE = 'key'
+
+# Written before the marshalled code so entries from another interpreter version are never loaded
+_MAGIC = b'KFC2' + sys.implementation.cache_tag.encode('ascii') + b'\0'
+
+# The bytes of the key and of the signature written after the magic
+_KEY_SIZE = 32
+_SIGNATURE_SIZE = hashlib.sha256().digest_size
+
+_cache = None
+
+
+def default_directory():
+    """
+    Gets the directory compiled scripts are cached in when none was given: the environment variable if present,
+    otherwise a directory in the user's own cache directory, %LOCALAPPDATA% on Windows and ~/.cache elsewhere.
+    :return: The directory path.
+    """
+    directory = os.environ.get(ENVIRONMENT_VARIABLE)
+    if directory:
+        return directory
+    if os.name == 'nt' and os.environ.get('LOCALAPPDATA'):
+        return os.path.join(os.environ['LOCALAPPDATA'], 'key_ferry', 'cache')
+    return os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.expanduser(os.path.join('~', '.cache')),
+                        'key_ferry')
+
+
+def _is_private(path):
+    """
+    Checks that a file or directory can only be changed by the current user: it is owned by the user and not writable
+    by the group or others. Windows has no owner or mode bits to check, the user's %LOCALAPPDATA% is private to them.
+    :param path: The path to check, symbolic links aren't followed.
+    :return: True if the path is private to the user, False if it isn't or can't be checked.
+    """
+    try:
+        status = os.lstat(path)
+    except OSError:
+        return False
+    if stat.S_ISLNK(status.st_mode):
+        return False
+    if not hasattr(os, 'getuid'):
+        return True
+    return status.st_uid == os.getuid() and not status.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+
+
+class ScriptCache:
+    """
+    Caches playback scripts compiled to bytecode, so a large script played again isn't parsed and compiled again. Code
+    is cached in memory, keyed by the script's path, size and modification time, and on disk, keyed by a hash of the
+    script's path and contents, so the GUI, the command line and the playback workers share it. Both are trimmed to
+    their byte budgets by evicting the least recently used scripts. Entries on disk are signed with a key kept in the
+    cache directory and are only used if the directory and the key are private to the user, so code another user
+    planted is never loaded.
+    """
+    # The bytes of compiled code kept on disk
+    DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+    # The bytes of compiled code kept in memory
+    DEFAULT_MAX_MEMORY_BYTES = 64 * 1024 * 1024
+
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_BYTES, max_memory_bytes=DEFAULT_MAX_MEMORY_BYTES):
+        """
+        Initializes a new instance of the ScriptCache class.
+        :param directory: The directory compiled scripts are cached in, default_directory() if None.
+        :param max_bytes: The bytes of compiled code kept on disk, 0 to not cache on disk.
+        :param max_memory_bytes: The bytes of compiled code kept in memory, 0 to not cache in memory.
+        """
+        self.directory = directory or default_directory()
+        self.__max_bytes = max_bytes
+        self.__max_memory_bytes = max_memory_bytes
+        self.__memory = collections.OrderedDict()  # (path, size, mtime) to (code, bytes), least recently used first
+        self.__memory_bytes = 0
+        self.__lock = threading.Lock()
+        self.__signing_key = None  # The key entries on disk are signed with, read the first time the disk is used
+        self.memory_hits = 0  # Scripts found compiled in memory
+        self.disk_hits = 0  # Scripts found compiled on disk
+        self.misses = 0  # Scripts that had to be compiled
+
+    @property
+    def hits(self):
+        """
+        The number of scripts that didn't have to be compiled.
+        """
+        return self.memory_hits + self.disk_hits
+
+    def stats(self):
+        """
+        Gets the cache's counters.
+        :return: Dictionary of the hits, memory hits, disk hits and misses.
+        """
+        return {
+            'hits': self.hits,
+            'memory_hits': self.memory_hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+        }
+
+    def load(self, file):
+        """
+        Gets the compiled code of a script, compiling and caching it if it isn't cached.
+        :param file: The string filename of the script.
+        :return: The code object to exec.
+        """
+        path = os.path.abspath(file)
+        status = os.stat(path)
+        key = (path, status.st_size, status.st_mtime_ns)
+        with self.__lock:
+            entry = self.__memory.get(key)
+            if entry is not None:
+                self.__memory.move_to_end(key)
+                self.memory_hits += 1
+                return entry[0]
+
+        with open(path, 'rb') as f:
+            contents = f.read()
+        digest = hashlib.sha256(path.encode('utf-8') + b'\0' + contents).digest()
+        entry_path = os.path.join(self.directory, digest.hex() + EXTENSION)
+
+        code = None
+        signing_key = self.__get_signing_key() if self.__max_bytes > 0 else None
+        data = self.__read_entry(entry_path, signing_key, digest) if signing_key is not None else None
+        if data is not None:
+            try:
+                code = marshal.loads(data)
+            except (EOFError, ValueError, TypeError):
+                pass  # A damaged entry is compiled again and overwritten
+
+        if code is not None:
+            with self.__lock:
+                self.disk_hits += 1
+        else:
+            # Decode the way open(file).read() did, scripts are written with the locale's encoding
+            code = compile(contents.decode(locale.getpreferredencoding(False)), path, 'exec', dont_inherit=True)
+            data = marshal.dumps(code)
+            with self.__lock:
+                self.misses += 1
+            if signing_key is not None:
+                self.__write_entry(entry_path, signing_key, digest, data)
+
+        self.__remember(key, code, len(data))
+        return code
+
+    def __get_signing_key(self):
+        """
+        Gets the key entries on disk are signed with, creating the cache directory and the key the first time.
+        :return: The key, or None if the directory or the key isn't private to the user and the disk can't be used.
+        """
+        try:
+            os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        except OSError:
+            return None
+        if not _is_private(self.directory):
+            return None
+        if self.__signing_key is not None:
+            return self.__signing_key
+
+        key_path = os.path.join(self.directory, KEY_FILE)
+        try:
+            try:
+                descriptor = os.open(key_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_BINARY', 0), 0o600)
+            except FileExistsError:
+                pass
+            else:
+                with os.fdopen(descriptor, 'wb') as f:
+                    f.write(os.urandom(_KEY_SIZE))
+            if not _is_private(key_path):
+                return None
+            with open(key_path, 'rb') as f:
+                key = f.read()
+        except OSError:
+            return None
+
+        # Another process may still be writing the key, the disk is used once it has
+        if len(key) != _KEY_SIZE:
+            return None
+        self.__signing_key = key
+        return key
+
+    @staticmethod
+    def __sign(key, digest, data):
+        """
+        Signs a compiled script.
+        :param key: The cache's key.
+        :param digest: The hash of the script's path and contents.
+        :param data: The marshalled code.
+        :return: The signature.
+        """
+        return hmac.new(key, digest + data, hashlib.sha256).digest()
+
+    def __read_entry(self, entry_path, key, digest):
+        """
+        Reads a compiled script from disk, checks its signature and marks it as recently used.
+        :param entry_path: The path of the cache entry.
+        :param key: The cache's key.
+        :param digest: The hash of the script's path and contents.
+        :return: The marshalled code, or None if the entry is missing, unusable or wasn't signed with the key.
+        """
+        try:
+            with open(entry_path, 'rb') as f:
+                data = f.read()
+            os.utime(entry_path)
+        except OSError:
+            return None
+
+        if not data.startswith(_MAGIC):
+            return None
+        signature = data[len(_MAGIC):len(_MAGIC) + _SIGNATURE_SIZE]
+        data = data[len(_MAGIC) + _SIGNATURE_SIZE:]
+        if not hmac.compare_digest(signature, self.__sign(key, digest, data)):
+            return None
+        return data
+
+    def __write_entry(self, entry_path, key, digest, data):
+        """
+        Writes a signed compiled script to disk, then evicts the least recently used entries over the byte budget. The
+        entry is written to a temporary file and renamed, so other processes never read half an entry.
+        :param entry_path: The path of the cache entry.
+        :param key: The cache's key.
+        :param digest: The hash of the script's path and contents.
+        :param data: The marshalled code.
+        """
+        try:
+            temporary_path = '%s.%s.tmp' % (entry_path, os.getpid())
+            with open(temporary_path, 'wb') as f:
+                f.write(_MAGIC)
+                f.write(self.__sign(key, digest, data))
+                f.write(data)
+            os.replace(temporary_path, entry_path)
+        except OSError:
+            # Caching is an optimization, a read-only or full disk only costs a compile the next time
+            return
+        self.trim()
+
+    def trim(self, max_bytes=None):
+        """
+        Evicts the least recently used entries on disk until they fit in the byte budget.
+        :param max_bytes: The bytes to trim to, the cache's budget if None.
+        """
+        if max_bytes is None:
+            max_bytes = self.__max_bytes
+        entries = []
+        total = 0
+        if not _is_private(self.directory):
+            return
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return
+
+        for name in names:
+            if name.endswith(EXTENSION):
+                try:
+                    status = os.stat(os.path.join(self.directory, name))
+                except OSError:
+                    continue
+                entries.append((status.st_mtime_ns, status.st_size, name))
+                total += status.st_size
+
+        entries.sort()
+        for _, size, name in entries:
+            if total <= max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+            total -= size
+
+    def __remember(self, key, code, size):
+        """
+        Keeps a compiled script in memory, evicting the least recently used scripts over the byte budget.
+        :param key: The (path, size, mtime) key.
+        :param code: The code object.
+        :param size: The size of the marshalled code.
+        """
+        if size > self.__max_memory_bytes:
+            return
+
+        with self.__lock:
+            previous = self.__memory.pop(key, None)
+            if previous is not None:
+                self.__memory_bytes -= previous[1]
+            self.__memory[key] = (code, size)
+            self.__memory_bytes += size
+            while self.__memory_bytes > self.__max_memory_bytes:
+                _, (_, evicted) = self.__memory.popitem(last=False)
+                self.__memory_bytes -= evicted
+
+    def clear(self):
+        """
+        Removes every compiled script from memory and from disk.
+        """
+        with self.__lock:
+            self.__memory.clear()
+            self.__memory_bytes = 0
+        self.trim(0)
+
+
+def get_cache():
+    """
+    Gets the script cache shared by the playbacks of this process, creating it the first time it's called.
+    :return: The shared ScriptCache.
+    """
+    global _cache
+    if _cache is None:
+        _cache = ScriptCache()
+    return _cache
@@ -0,0 +1,145 @@
+import os
+
+import playback.preprocessing as preprocessing
+import recording.constants as constants
+import utilities.string_table as string_table
+
+EventType = constants.EventType
+
+
+class PlaybackScriptWriter:
+    """
+    Writes recorded events to an executable playback script as they arrive. Only the run of keystrokes being coalesced
+    is held back by the EventPreprocessor, everything else is written to the file immediately.
+    """
+    # The column the trailing comments are aligned to. Longer commands push their comment further right.
+    COMMENT_COLUMN = 60
+
+    def __init__(self, file, preprocessor=None, intern_windows=True):
+        """
+        Initializes a new instance of the PlaybackScriptWriter class and writes the script's header.
+        :param file: The text file to write to.
+        :param preprocessor: The EventPreprocessor that turns the events into playback steps, a new one with the
+                             default settings if None.
+        :param intern_windows: True to write each window name once, in a comment line before its first use, and refer
+                               to it by id in the comments of the mouse lines. False to repeat the name on every line.
+        """
+        self.__file = file
+        self.__preprocessor = preprocessor if preprocessor is not None else preprocessing.EventPreprocessor()
+        self.__window_names = string_table.StringTable() if intern_windows else None
+        self.__previous_offset = 0
+        self.__write_header()
+
+    def __write_header(self):
+        """
+        Writes the imports required by the script.
+        """
+        file = self.__file
+        print('# Mandatory imports', file=file)
+        print('import time', file=file)
+        print('import sys', file=file)
+        print('', file=file)
+        print('', file=file)
+        print("# Set Python's path", file=file)
+        print('sys.path.append(r"%s%s")' % (os.path.dirname(os.path.abspath(__file__)), r'\..'), file=file)
+        print('from playback.playback import WindowsPlaybackManager', file=file)
+        print('', file=file)
+        print('', file=file)
+
+    def append(self, event):
+        """
+        Adds a recorded event to the script. Named to match a list so the writer can be used as an events collection.
+        :param event: The recorded event.
+        """
+        step = self.__preprocessor.append(event)
+        if step is not None:
+            self.__write_step(*step)
+
+    @property
+    def recorded_duration(self):
+        """
+        The seconds from the start of the recording to the last line written, as recorded.
+        """
+        return self.__preprocessor.recorded_offset / 1000000000.0
+
+    @property
+    def duration(self):
+        """
+        The seconds from the start of the script to the last line written, once the pauses were compressed.
+        """
+        return self.__preprocessor.offset / 1000000000.0
+
+    @property
+    def saved_events(self):
+        """
+        The number of keystrokes coalesced into an earlier line of the script.
+        """
+        return self.__preprocessor.saved_events
+
+    def __write_step(self, event, times, offset, keys):
+        """
+        Writes a playback step to the file.
+        :param event: The event to play.
+        :param times: The number of times to play the event.
+        :param offset: The nanoseconds from the start of the recording the event occurred at.
+        :param keys: The SendKeys command of a keyboard step.
+        """
+        if event.Type == EventType.MOUSE:
+            x, y = event.Position
+            if event.Is_Move:
+                executable = 'WindowsPlaybackManager.mouse_move(%s, %s)' % (x, y)
+            elif event.Wheel:
+                executable = 'WindowsPlaybackManager.mouse_wheel(%s, %s, %s)' % (x, y, event.Wheel)
+            else:
+                executable = 'WindowsPlaybackManager.mouse_click(%s, %s, %s, %s)' % (x, y, event.Is_Down, event.Is_Left)
+            comment = self.__window_comment(event.WindowName)
+        else:
+            executable = 'WindowsPlaybackManager.key_press("%s")' % keys
+
+            if times > 1:
+                comment = "# Keys: %s " % keys
+            else:
+                message = ''
+                if event.Is_Shift:
+                    message += "Shift + "
+                if event.Is_Alt:
+                    message += "Alt + "
+                if event.Is_Ctrl:
+                    message += "Ctrl + "
+                comment = "# Key: %s%s " % (message, event.Key)
+
+        width = max(PlaybackScriptWriter.COMMENT_COLUMN, len(executable) + 4)
+        print("WindowsPlaybackManager.sleep(%s)" % round((offset - self.__previous_offset) / 1000000000.0, 6),
+              file=self.__file)
+        print('%-*s%s' % (width, executable, comment), file=self.__file)
+        self.__previous_offset = offset
+
+    def __window_comment(self, window_name):
+        """
+        Gets the trailing comment naming a mouse line's window, writing the window's definition first if it's the
+        first time the window is used.
+        :param window_name: The window name.
+        :return: The comment.
+        """
+        if self.__window_names is None:
+            return "# Window: %s" % window_name
+
+        window_id = self.__window_names.get_id(window_name)
+        if window_id is None:
+            window_id = self.__window_names.add(window_name)
+            print("# Window %s: %s" % (window_id, window_name), file=self.__file)
+        return "# Window %s" % window_id
+
+    def flush(self):
+        """
+        Flushes the lines written so far to the underlying file. The last event is still held back.
+        """
+        self.__file.flush()
+
+    def close(self):
+        """
+        Writes the event being held back. The underlying file is not closed.
+        """
+        for step in self.__preprocessor.flush():
+            self.__write_step(*step)
+        self.__file.flush()
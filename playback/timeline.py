@@ -0,0 +1,486 @@
+import array
+import bisect
+import heapq
+
+import playback.engine as engine
+import recording.archive as archive
+import recording.event_log as event_log
+import recording.exceptions as exceptions
+import utilities.collections as collections
+
+# The field of an event log record holding the timestamp
+_TIMESTAMP = 9
+
+
+class _Source:
+    """
+    The records of a recording, shared by every segment cut from it. Never changed once created.
+    """
+    __slots__ = ('records', 'timestamps')
+
+    def __init__(self, records):
+        """
+        Initializes a new instance of the _Source class.
+        :param records: The list of (record, window name) tuples.
+        """
+        self.records = records
+        self.timestamps = array.array('q', (x[0][_TIMESTAMP] for x in records))
+
+
+class Segment:
+    """
+    A run of consecutive events of a source recording, played with its pauses scaled and after a pause of its own.
+    """
+    __slots__ = ('source', 'start', 'end', 'scale', 'gap')
+
+    def __init__(self, source, start, end, scale=1.0, gap=0):
+        """
+        Initializes a new instance of the Segment class.
+        :param source: The _Source the events come from.
+        :param start: The index in the source of the segment's first event.
+        :param end: The index in the source after the segment's last event.
+        :param scale: The factor the pauses between the segment's events are multiplied by.
+        :param gap: The nanoseconds between the previous segment's last event and this segment's first event.
+        """
+        self.source = source
+        self.start = start
+        self.end = end
+        self.scale = scale
+        self.gap = gap
+
+    def __len__(self):
+        return self.end - self.start
+
+    def copy(self):
+        """
+        Copies the segment, the events themselves are shared.
+        :return: The new Segment.
+        """
+        return Segment(self.source, self.start, self.end, self.scale, self.gap)
+
+    def offset(self, index):
+        """
+        Gets the time of one of the segment's events.
+        :param index: The index in the source of the event.
+        :return: The nanoseconds from the segment's first event.
+        """
+        elapsed = self.source.timestamps[index] - self.source.timestamps[self.start]
+        return elapsed if self.scale == 1.0 else int(round(elapsed * self.scale))
+
+    @property
+    def duration(self):
+        """
+        The nanoseconds from the segment's first event to its last event.
+        """
+        return self.offset(self.end - 1)
+
+    def find(self, offset):
+        """
+        Finds the first of the segment's events at or after a time.
+        :param offset: The nanoseconds from the segment's first event.
+        :return: The index in the source of the event, end if every event is earlier.
+        """
+        timestamps = self.source.timestamps
+        target = timestamps[self.start] + (offset if self.scale == 1.0 else offset / self.scale)
+        return bisect.bisect_left(timestamps, target, self.start, self.end)
+
+
+class Timeline:
+    """
+    An editable recording. The events are kept in segments, runs of consecutive events of a source recording that
+    share its records, linked together in a LinkedList, so cutting, inserting and retiming only split and relink the
+    segments around the edit and cost time proportional to the edit rather than to the recording. Merging two
+    recordings rewrites only the events where they overlap.
+
+    Events are addressed by their number, counting from 0, or found by time with event_at. Iterating the timeline
+    yields RecordedEvents with the edited timestamps, so it can be handed to the PlaybackEngine or to
+    WindowsPlaybackManager.create_executable_playback_file like any other recording, or saved with save.
+    """
+
+    def __init__(self, events=None):
+        """
+        Initializes a new instance of the Timeline class.
+        :param events: The EventLog, or any iterable of recorded events, to edit, None for an empty timeline.
+        """
+        self.__segments = collections.LinkedList()
+        self.__length = 0
+        self.origin = 0  # The timestamp of the first event, the edited timestamps are counted from it
+        if events is not None:
+            encode = event_log.encode_event
+            unpack = event_log.RECORD.unpack
+            self.__append_source([(unpack(encode(x, 0)), x.WindowName) for x in events])
+
+    @staticmethod
+    def from_records(records):
+        """
+        Creates a timeline from raw records, such as the ones of an EventLogReader or ArchiveReader.
+        :param records: The iterable of (record, window name) tuples.
+        :return: The Timeline.
+        """
+        timeline = Timeline()
+        timeline.__append_source(list(records))
+        return timeline
+
+    @staticmethod
+    def load(file):
+        """
+        Reads a recording file into a timeline.
+        :param file: The string filename of the event log or recording archive.
+        :return: The Timeline.
+        """
+        with open(file, 'rb') as f:
+            return Timeline.from_records(engine.open_recording(f).records())
+
+    def __append_source(self, records):
+        """
+        Adds the records of a new source recording as the timeline's only segment.
+        :param records: The list of (record, window name) tuples.
+        """
+        if records:
+            self.__segments.add_data(Segment(_Source(records), 0, len(records)))
+            self.__length = len(records)
+            self.origin = records[0][0][_TIMESTAMP]
+
+    def __len__(self):
+        """
+        The number of events in the timeline.
+        """
+        return self.__length
+
+    @property
+    def segments(self):
+        """
+        The number of segments the events are kept in.
+        """
+        return len(self.__segments)
+
+    @property
+    def duration(self):
+        """
+        The seconds from the first to the last event.
+        """
+        return self.__elapsed() / 1000000000.0
+
+    def __elapsed(self):
+        """
+        Gets the time of the last event.
+        :return: The nanoseconds from the first event to the last event.
+        """
+        elapsed = 0
+        for number, segment in enumerate(self.__segments):
+            elapsed += (segment.gap if number else 0) + segment.duration
+        return elapsed
+
+    def __check_range(self, start, end):
+        """
+        Validates a range of events.
+        :param start: The number of the first event.
+        :param end: The number of the event after the last event.
+        :exception ArgumentError: Thrown if the range isn't within the timeline.
+        """
+        if not 0 <= start <= end <= self.__length:
+            raise exceptions.ArgumentError('events %s to %s are not within the %s events of the timeline' %
+                                           (start, end, self.__length))
+
+    def __split(self, position):
+        """
+        Makes sure a segment starts at an event, splitting the segment the event is in.
+        :param position: The number of the event.
+        :return: The node of the segment starting at the event, None if the position is the end of the timeline.
+        """
+        segments = self.__segments
+        seen = 0
+        for node in segments.nodes():
+            segment = node.value
+            count = segment.end - segment.start
+            if position < seen + count:
+                index = segment.start + position - seen
+                if index == segment.start:
+                    return node
+
+                tail = collections.Node(Segment(segment.source, index, segment.end, segment.scale,
+                                                segment.offset(index) - segment.offset(index - 1)))
+                segment.end = index
+                if node.next is None:
+                    segments.add_node(tail)
+                else:
+                    segments.insert_node(tail, node.next)
+                return tail
+            seen += count
+        return None
+
+    def __nodes(self, first, last):
+        """
+        Gets the nodes from one node up to another.
+        :param first: The node of the first segment, None for none.
+        :param last: The node after the last segment, None to go to the end.
+        :return: The list of nodes.
+        """
+        nodes = []
+        node = first
+        while node is not None and node is not last:
+            nodes.append(node)
+            node = node.next
+        return nodes
+
+    def __time_of(self, position):
+        """
+        Gets the time of an event.
+        :param position: The number of the event.
+        :return: The nanoseconds from the first event.
+        """
+        elapsed = 0
+        seen = 0
+        for number, segment in enumerate(self.__segments):
+            elapsed += segment.gap if number else 0
+            count = segment.end - segment.start
+            if position < seen + count:
+                return elapsed + segment.offset(segment.start + position - seen)
+            elapsed += segment.duration
+            seen += count
+        raise exceptions.ArgumentError('event %s is not within the %s events of the timeline' %
+                                       (position, self.__length))
+
+    def event_at(self, seconds):
+        """
+        Finds the first event at or after a time.
+        :param seconds: The seconds from the first event.
+        :return: The number of the event, the number of events if every event is earlier.
+        """
+        return self.__event_at(int(round(seconds * 1000000000)))
+
+    def __event_at(self, target):
+        """
+        Finds the first event at or after a time.
+        :param target: The nanoseconds from the first event.
+        :return: The number of the event, the number of events if every event is earlier.
+        """
+        elapsed = 0
+        seen = 0
+        for number, segment in enumerate(self.__segments):
+            elapsed += segment.gap if number else 0
+            if target <= elapsed + segment.duration:
+                return seen + segment.find(target - elapsed) - segment.start
+            elapsed += segment.duration
+            seen += segment.end - segment.start
+        return self.__length
+
+    def time_of(self, position):
+        """
+        Gets the time of an event.
+        :param position: The number of the event.
+        :return: The seconds from the first event.
+        :exception ArgumentError: Thrown if there's no such event.
+        """
+        return self.__time_of(position) / 1000000000.0
+
+    def cut(self, start, end):
+        """
+        Removes a range of events. The events after the range follow the events before it after the pause that was
+        before the range, so the cut doesn't leave a hole.
+        :param start: The number of the first event to remove.
+        :param end: The number of the event after the last event to remove.
+        :return: The Timeline of the removed events.
+        :exception ArgumentError: Thrown if the range isn't within the timeline.
+        """
+        self.__check_range(start, end)
+        removed = Timeline()
+        removed.origin = self.origin
+        if start == end:
+            return removed
+
+        after = self.__split(end)
+        first = self.__split(start)
+        gap = first.value.gap
+        for node in self.__nodes(first, after):
+            self.__segments.remove_node(node)
+            removed.__segments.add_node(node)
+        removed.__length = end - start
+        self.__length -= end - start
+        if after is not None:
+            after.value.gap = gap
+        return removed
+
+    def copy(self, start=0, end=None):
+        """
+        Copies a range of events, the copy shares the events themselves with the timeline.
+        :param start: The number of the first event to copy.
+        :param end: The number of the event after the last event to copy, None to copy to the end.
+        :return: The new Timeline.
+        :exception ArgumentError: Thrown if the range isn't within the timeline.
+        """
+        end = self.__length if end is None else end
+        self.__check_range(start, end)
+        copied = Timeline()
+        copied.origin = self.origin
+        if start == end:
+            return copied
+
+        after = self.__split(end)
+        for node in self.__nodes(self.__split(start), after):
+            copied.__segments.add_data(node.value.copy())
+        copied.__length = end - start
+        return copied
+
+    def insert(self, position, other, pause=None):
+        """
+        Inserts the events of another timeline before an event. The other timeline isn't changed, its events are shared.
+        :param position: The number of the event to insert before, the number of events to append to the end.
+        :param other: The Timeline to insert.
+        :param pause: The seconds between the inserted events and the events around them, None to keep the pause
+                      before the event at the position on both sides, or no pause when inserting at either end.
+        :exception ArgumentError: Thrown if the position isn't within the timeline.
+        """
+        self.__check_range(position, position)
+        if not len(other):
+            return
+
+        node = self.__split(position)
+        if pause is not None:
+            gap = int(round(pause * 1000000000))
+        else:
+            gap = node.value.gap if node is not None and position else 0
+
+        inserted = collections.LinkedList(x.copy() for x in other.__segments)
+        inserted.head.value.gap = gap
+        if not self.__length:
+            self.origin = other.origin
+        if node is not None:
+            node.value.gap = gap
+        self.__segments.splice(inserted, node)
+        self.__length += len(other)
+
+    def retime(self, start, end, speed):
+        """
+        Speeds up or slows down a range of events. The pauses before and after the range are kept.
+        :param start: The number of the first event to retime.
+        :param end: The number of the event after the last event to retime.
+        :param speed: The factor the range is sped up by, 2.0 plays it twice as fast.
+        :exception ArgumentError: Thrown if the range isn't within the timeline or the speed isn't positive.
+        """
+        self.__check_range(start, end)
+        if speed <= 0:
+            raise exceptions.ArgumentError('the speed must be positive, not %s' % speed)
+        if start == end:
+            return
+
+        after = self.__split(end)
+        first = self.__split(start)
+        for node in self.__nodes(first, after):
+            segment = node.value
+            segment.scale /= speed
+            if node is not first:
+                segment.gap = int(round(segment.gap / speed))
+
+    def set_pause(self, position, seconds):
+        """
+        Changes the pause before an event.
+        :param position: The number of the event, other than the first one.
+        :param seconds: The seconds between the previous event and the event.
+        :exception ArgumentError: Thrown if the event isn't within the timeline or is the first one.
+        """
+        if not 0 < position < self.__length:
+            raise exceptions.ArgumentError('event %s has no pause before it in the %s events of the timeline' %
+                                           (position, self.__length))
+        self.__split(position).value.gap = int(round(seconds * 1000000000))
+
+    def merge(self, other, offset=0.0):
+        """
+        Merges the events of another timeline into this one by time, as if both had been recorded at once. Only the
+        events played while the other timeline plays are rewritten, the rest are kept in their segments. The other
+        timeline isn't changed.
+        :param other: The Timeline to merge.
+        :param offset: The seconds after this timeline's first event that the other timeline's first event plays at.
+        :exception ArgumentError: Thrown if the offset is negative.
+        """
+        if offset < 0:
+            raise exceptions.ArgumentError('the merged timeline can\'t start before the timeline, not at %s' % offset)
+        if not len(other):
+            return
+        if not self.__length:
+            self.insert(0, other)
+            return
+
+        # The events of this timeline played from the other timeline's first event to its last event
+        begin = int(round(offset * 1000000000))
+        finish = begin + other.__elapsed()
+        start = self.__event_at(begin)
+        end = self.__event_at(finish + 1)
+        before = self.__time_of(start - 1) if start else 0
+        following = self.__time_of(end) if end < self.__length else None
+
+        # Interleave both in order of time, this timeline's events first when they're at the same time
+        ours = ((time, 0, number, record) for number, (time, record) in enumerate(self.__timed(start, end)))
+        theirs = ((begin + time, 1, number, record) for number, (time, record) in enumerate(other.__timed()))
+        records = [(record[:_TIMESTAMP] + (time,) + record[_TIMESTAMP + 1:], window_name)
+                   for time, _, _, (record, window_name) in heapq.merge(ours, theirs)]
+
+        after = self.__split(end)
+        for node in self.__nodes(self.__split(start), after):
+            self.__segments.remove_node(node)
+        merged = collections.Node(Segment(_Source(records), 0, len(records), gap=records[0][0][_TIMESTAMP] - before))
+        if after is None:
+            self.__segments.add_node(merged)
+        else:
+            self.__segments.insert_node(merged, after)
+            after.value.gap = following - records[-1][0][_TIMESTAMP]
+        self.__length += len(other)
+
+    def __timed(self, start=0, end=None):
+        """
+        Generator over a range of events with their edited times.
+        :param start: The number of the first event.
+        :param end: The number of the event after the last event, None to go to the end.
+        :return: Tuples of the nanoseconds from the first event and the (record, window name) tuple.
+        """
+        end = self.__length if end is None else end
+        elapsed = 0
+        seen = 0
+        for number, segment in enumerate(self.__segments):
+            elapsed += segment.gap if number else 0
+            count = segment.end - segment.start
+            if seen >= end:
+                return
+            if seen + count > start:
+                records = segment.source.records
+                timestamps = segment.source.timestamps
+                first = timestamps[segment.start]
+                scale = segment.scale
+                for index in range(segment.start + max(start - seen, 0), segment.start + min(end - seen, count)):
+                    elapsed_in = timestamps[index] - first
+                    yield elapsed + (elapsed_in if scale == 1.0 else int(round(elapsed_in * scale))), records[index]
+            elapsed += segment.duration
+            seen += count
+
+    def records(self):
+        """
+        Generator over the raw records with their edited timestamps.
+        :return: Tuples of the event log RECORD tuple and the record's window name.
+        """
+        origin = self.origin
+        for time, (record, window_name) in self.__timed():
+            yield record[:_TIMESTAMP] + (origin + time,) + record[_TIMESTAMP + 1:], window_name
+
+    def __iter__(self):
+        origin = self.origin
+        previous_timestamp = None
+        for time, (record, window_name) in self.__timed():
+            timestamp = origin + time
+            if previous_timestamp is None:
+                previous_timestamp = timestamp
+            event = event_log.RecordedEvent(record, window_name, previous_timestamp)
+            event.Timestamp = timestamp
+            event.Time = (timestamp - previous_timestamp) / 1000000000.0
+            previous_timestamp = timestamp
+            yield event
+
+    def save(self, file, codec=archive.ArchiveCodec.ZLIB):
+        """
+        Writes the edited recording to a recording archive.
+        :param file: The binary file object to write to.
+        :param codec: The ArchiveCodec the chunks are compressed with.
+        """
+        writer = archive.ArchiveWriter(file, codec)
+        for record, window_name in self.records():
+            writer.append_record(record, window_name)
+        writer.close()
@@ -0,0 +1,429 @@
+import itertools
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import traceback
+
+import recording.constants as constants
+import recording.exceptions as exceptions
+
+JobStatus = constants.JobStatus
+
+# The messages sent over the worker's pipe, the first item of every message tuple
+_PLAY = 'play'  # Parent to worker: (_PLAY, job id, file, PlaybackTiming, PlaybackRange)
+_STOP = 'stop'  # Parent to worker: (_STOP, job id)
+_EXIT = 'exit'  # Parent to worker: (_EXIT,)
+_READY = 'ready'  # Worker to parent: (_READY, process id)
+_STARTED = 'started'  # Worker to parent: (_STARTED, job id)
+_FINISHED = 'finished'  # Worker to parent: (_FINISHED, job id, JobStatus, detail)
+
+
+class PlaybackJob:
+    """
+    A file queued on, or being played by, a PlaybackWorker.
+    """
+
+    def __init__(self, job_id, file, on_finished=None, timeout=None, timing=None, playback_range=None):
+        """
+        Initializes a new instance of the PlaybackJob class.
+        :param job_id: The integer identifier of the job, unique to its worker or scheduler.
+        :param file: The string filename to play.
+        :param on_finished: The function called with the job once it finishes, on the thread that finished it.
+        :param timeout: The seconds the job may play for before it's stopped, None for no limit. Only enforced by the
+                        PlaybackScheduler.
+        :param timing: The PlaybackTiming that compresses the pauses, None to play them as recorded.
+        :param playback_range: The PlaybackRange of a recording to play, None to play all of it.
+        """
+        self.id = job_id
+        self.file = file
+        self.timeout = timeout
+        self.timing = timing
+        self.playback_range = playback_range
+        self.status = JobStatus.PENDING
+        self.detail = None  # The PlaybackReport summary of an event log, or the traceback of a failed job
+        self.submitted = time.perf_counter()
+        self.started = None  # The perf_counter value the worker started playing the job at
+        self.finished = None  # The perf_counter value the job finished at
+        self.__on_finished = on_finished
+        self.__done = threading.Event()
+
+    @property
+    def done(self):
+        """
+        Indicates if the job has finished, whatever its status.
+        """
+        return self.__done.is_set()
+
+    @property
+    def wall_time(self):
+        """
+        The seconds from the job starting to play to it finishing, None if it hasn't finished or never started.
+        """
+        if self.started is None or self.finished is None:
+            return None
+        return self.finished - self.started
+
+    def wait(self, timeout=None):
+        """
+        Waits for the job to finish.
+        :param timeout: The seconds to wait, None to wait forever.
+        :return: True if the job finished, false if the timeout expired.
+        """
+        return self.__done.wait(timeout)
+
+    def _finish(self, status, detail=None):
+        """
+        Marks the job as finished and notifies the callback.
+        :param status: The JobStatus the job finished with.
+        :param detail: The summary or traceback of the job.
+        """
+        if self.__done.is_set():
+            return
+
+        self.status = status
+        self.detail = detail
+        self.finished = time.perf_counter()
+        self.__done.set()
+        if self.__on_finished is not None:
+            self.__on_finished(self)
+
+
+def _run_worker(connection, backend=None):
+    """
+    The entry point of the 'Playback Worker Process'. Imports the playback modules and creates the input backend up
+    front, then plays the jobs it's sent one after another until it's told to exit. A 'Playback Control Thread'
+    receives the messages, so a stop reaches the job while it plays.
+    :param connection: The worker's end of the pipe.
+    :param backend: The Backend to inject into, the default backend if None.
+    """
+    # Warm up everything the first playback would otherwise pay for
+    import backends.selection as selection
+    import playback.playback as playback
+    import python_executor
+
+    if backend is not None:
+        selection.set_backend(selection.create_backend(backend))
+    selection.get_backend()
+    manager = playback.WindowsPlaybackManager
+
+    jobs = queue.Queue()
+    lock = threading.Lock()
+    cancelled = set()  # The pending jobs stopped before they started
+    current = [None]  # The job being played
+
+    def receive():
+        while True:
+            try:
+                message = connection.recv()
+            except (EOFError, OSError):
+                message = (_EXIT,)
+
+            if message[0] == _STOP:
+                with lock:
+                    if current[0] == message[1]:
+                        manager.cancel_event.set()
+                    else:
+                        cancelled.add(message[1])
+            else:
+                jobs.put(message)
+                if message[0] == _EXIT:
+                    return
+
+    control_thread = threading.Thread(target=receive, name='Playback Control Thread')
+    control_thread.daemon = True
+    control_thread.start()
+    connection.send((_READY, os.getpid()))
+
+    while True:
+        message = jobs.get()
+        if message[0] == _EXIT:
+            break
+
+        _, job_id, file, timing, playback_range = message
+        with lock:
+            if job_id in cancelled:
+                cancelled.discard(job_id)
+                connection.send((_FINISHED, job_id, JobStatus.CANCELLED, None))
+                continue
+            current[0] = job_id
+            manager.cancel_event.clear()
+
+        connection.send((_STARTED, job_id))
+        detail = None
+        try:
+            report = python_executor.execute_file(file, timing, playback_range)
+            if report is not None:
+                detail = report.summary()
+            status = JobStatus.CANCELLED if manager.cancel_event.is_set() else JobStatus.COMPLETED
+        except exceptions.PlaybackCancelledError:
+            status = JobStatus.CANCELLED
+        except SystemExit:
+            # A script that exits ends its job, not the worker
+            status = JobStatus.COMPLETED
+        except Exception:
+            status = JobStatus.FAILED
+            detail = traceback.format_exc()
+
+        with lock:
+            current[0] = None
+        connection.send((_FINISHED, job_id, status, detail))
+
+    connection.close()
+
+
+class PlaybackWorker:
+    """
+    A long-lived process that stays warm and plays files sent to it over a pipe, so a playback doesn't pay for a new
+    process and its imports. Jobs play one at a time in the order they were submitted. Stopping a job cancels it at
+    its next sleep or injection without killing the worker. A supervisor thread restarts the worker if it dies, the job
+    it was playing finishes as CRASHED and the pending jobs are sent to the new worker.
+    """
+    DEFAULT_TIMEOUT = 30
+
+    # Consecutive crashes after which the worker is no longer restarted until the next job is submitted
+    MAX_RESTARTS = 5
+
+    # Seconds between the supervisor's checks that the worker is still alive
+    POLL_INTERVAL = 0.25
+
+    def __init__(self, backend=None):
+        """
+        Initializes a new instance of the PlaybackWorker class. The worker process isn't started until start or
+        submit is called.
+        :param backend: The Backend the worker injects into, the default backend if None.
+        """
+        self.__backend = backend
+        self.__lock = threading.RLock()
+        self.__process = None
+        self.__connection = None
+        self.__supervisor_thread = None
+        self.__ready = threading.Event()
+        self.__jobs = {}  # The jobs that haven't finished, by id
+        self.__job_ids = itertools.count(1)
+        self.__crashes = 0
+        self.__released = False
+        self.process_id = None  # The process identifier of the running worker
+        self.restarts = 0  # The number of times the worker was restarted after a crash
+
+    def start(self, wait=True):
+        """
+        Starts the worker process if it isn't running.
+        :param wait: True to block until the worker has warmed up and is ready for jobs.
+        :return: True if the worker is ready, false if it's still warming up or didn't start within DEFAULT_TIMEOUT.
+        """
+        with self.__lock:
+            if self.__released:
+                raise RuntimeError('the playback worker was released')
+            if self.__process is None:
+                self.__crashes = 0
+                self.__spawn()
+            if self.__supervisor_thread is None:
+                self.__supervisor_thread = threading.Thread(target=self.__supervise,
+                                                            name='Playback Supervisor Thread')
+                self.__supervisor_thread.daemon = True
+                self.__supervisor_thread.start()
+        if wait:
+            return self.__ready.wait(PlaybackWorker.DEFAULT_TIMEOUT)
+        return self.__ready.is_set()
+
+    def __spawn(self):
+        """
+        Spawns a new worker process and sends it the pending jobs. Must be called with the lock held.
+        """
+        self.__ready.clear()
+        connection, child_connection = multiprocessing.Pipe()
+        process = multiprocessing.Process(target=_run_worker, args=(child_connection, self.__backend),
+                                          name='Playback Worker Process')
+        process.daemon = True
+        process.start()
+
+        # Only the worker holds its end, so the pipe reports the end of file if the worker dies
+        child_connection.close()
+        self.__process = process
+        self.__connection = connection
+        for job in sorted(self.__jobs.values(), key=lambda x: x.id):
+            job.status = JobStatus.PENDING
+            connection.send((_PLAY, job.id, job.file, job.timing, job.playback_range))
+
+    def submit(self, file, on_finished=None, timing=None, playback_range=None):
+        """
+        Queues a file to be played by the worker, starting the worker if needed.
+        :param file: The string filename of the playback script or event log.
+        :param on_finished: The function called with the job once it finishes, on the supervisor thread.
+        :param timing: The PlaybackTiming that compresses the pauses, None to play them as recorded.
+        :param playback_range: The PlaybackRange of a recording to play, None to play all of it.
+        :return: The PlaybackJob.
+        """
+        job = PlaybackJob(next(self.__job_ids), file, on_finished, timing=timing, playback_range=playback_range)
+        with self.__lock:
+            self.start(wait=False)
+            self.__jobs[job.id] = job
+            self.__send((_PLAY, job.id, file, timing, playback_range))
+        return job
+
+    def stop_job(self, job=None):
+        """
+        Stops a job without stopping the worker. The job is cancelled at its next sleep or injection, or before it
+        starts if it's still pending.
+        :param job: The PlaybackJob to stop, None to stop every job that hasn't finished.
+        """
+        with self.__lock:
+            jobs = list(self.__jobs.values()) if job is None else [job]
+            for x in jobs:
+                if not x.done:
+                    self.__send((_STOP, x.id))
+
+    def kill(self):
+        """
+        Kills the worker process, for a job that didn't stop when asked. The supervisor restarts the worker and the job
+        it was playing finishes as CRASHED.
+        """
+        with self.__lock:
+            process = self.__process
+        if process is not None:
+            process.terminate()
+
+    def __send(self, message):
+        """
+        Sends a message to the worker. Messages to a worker that just died are dropped, the supervisor resends the
+        pending jobs once it restarts the worker.
+        :param message: The message tuple.
+        """
+        try:
+            self.__connection.send(message)
+        except (OSError, ValueError):
+            pass
+
+    def __supervise(self):
+        """
+        This function is launched in a separate 'Playback Supervisor Thread' thread which receives the worker's messages
+        and restarts the worker when it dies.
+        """
+        while True:
+            with self.__lock:
+                if self.__released:
+                    return
+                connection = self.__connection
+                process = self.__process
+
+            if connection is None:
+                # Gave up restarting, wait for the next submit to start the worker again
+                time.sleep(PlaybackWorker.POLL_INTERVAL)
+                continue
+
+            try:
+                if connection.poll(PlaybackWorker.POLL_INTERVAL):
+                    self.__on_message(connection.recv())
+                    continue
+                if process.is_alive():
+                    continue
+            except (EOFError, OSError):
+                pass
+
+            self.__on_crash(process)
+
+    def __on_message(self, message):
+        """
+        Handles a message from the worker.
+        :param message: The message tuple.
+        """
+        kind = message[0]
+        if kind == _READY:
+            self.process_id = message[1]
+            self.__ready.set()
+            return
+
+        with self.__lock:
+            job = self.__jobs.get(message[1])
+            if job is None:
+                return
+            if kind == _STARTED:
+                job.status = JobStatus.RUNNING
+                job.started = time.perf_counter()
+                return
+            del self.__jobs[job.id]
+            self.__crashes = 0
+        job._finish(message[2], message[3])
+
+    def __on_crash(self, process):
+        """
+        Finishes the job the dead worker was playing and restarts the worker.
+        :param process: The worker process that died.
+        """
+        crashed = []
+        with self.__lock:
+            if self.__released or process is not self.__process:
+                return
+
+            self.__connection.close()
+            self.__connection = None
+            self.__process = None
+            self.process_id = None
+            self.__ready.clear()
+            for job in list(self.__jobs.values()):
+                if job.status == JobStatus.RUNNING:
+                    del self.__jobs[job.id]
+                    crashed.append(job)
+
+            self.__crashes += 1
+            if self.__crashes <= PlaybackWorker.MAX_RESTARTS:
+                self.restarts += 1
+                self.__spawn()
+            else:
+                print('[Error] Playback worker crashed %s times in a row, it will restart with the next job' %
+                      self.__crashes)
+                # Don't leave the pending jobs waiting on a worker that won't come back
+                crashed.extend(self.__jobs.values())
+                self.__jobs.clear()
+
+        for job in crashed:
+            job._finish(JobStatus.CRASHED, 'the playback worker exited with code %s' % process.exitcode)
+
+    def release(self):
+        """
+        Releases the managed and un-managed resources associated with the instance. Jobs that haven't finished are
+        cancelled and the worker process exits.
+        """
+        with self.__lock:
+            if self.__released:
+                return
+            self.__released = True
+            process = self.__process
+            connection = self.__connection
+            jobs = list(self.__jobs.values())
+            self.__jobs.clear()
+            self.__process = None
+            self.__connection = None
+
+        if process is not None:
+            for job in jobs:
+                self.__send_to(connection, (_STOP, job.id))
+            self.__send_to(connection, (_EXIT,))
+            process.join(PlaybackWorker.DEFAULT_TIMEOUT)
+            if process.is_alive():
+                print("[Error] Playback Worker Process didn't end during timeout of: " +
+                      str(PlaybackWorker.DEFAULT_TIMEOUT))
+                process.terminate()
+            connection.close()
+
+        supervisor_thread = self.__supervisor_thread
+        if supervisor_thread is not None and supervisor_thread is not threading.current_thread():
+            supervisor_thread.join(PlaybackWorker.DEFAULT_TIMEOUT)
+        self.__supervisor_thread = None
+
+        for job in jobs:
+            job._finish(JobStatus.CANCELLED)
+
+    @staticmethod
+    def __send_to(connection, message):
+        """
+        Sends a message over a connection, ignoring a worker that already died.
+        :param connection: The parent's end of the pipe.
+        :param message: The message tuple.
+        """
+        try:
+            connection.send(message)
+        except (OSError, ValueError):
+            pass
@@ -1,13 +1,57 @@
-import sys
+import argparse
 
+import playback.engine as engine
+import playback.preprocessing as preprocessing
+import playback.recording_index as recording_index
+import playback.script_cache as script_cache
+import recording.exceptions as exceptions
 
-def execute_file(file):
+
+def execute_file(file, timing=None, playback_range=None):
     """
-    Executes the passed in file in the current python interpreter.
+    Executes the passed in file in the current python interpreter. Event logs and recording archives are played by the
+    PlaybackEngine, any other file is treated as a playback script, compiled through the shared ScriptCache.
     :param file: The string filename.
+    :param timing: The PlaybackTiming that compresses the pauses, None to play them as recorded.
+    :param playback_range: The PlaybackRange of a recording to play, None to play all of it.
+    :return: The PlaybackReport of a recording, None for a playback script.
+    :exception ArgumentError: Thrown if a range is given for a playback script.
     """
-    exec(open(file).read())
+    import playback.playback as playback
+
+    manager = playback.WindowsPlaybackManager
+    if engine.is_recording(file):
+        report = engine.play_file(file, manager, stop_event=manager.cancel_event, timing=timing,
+                                  playback_range=playback_range)
+        return report
+    if playback_range is not None:
+        raise exceptions.ArgumentError('only recordings can be played from a position, not playback scripts')
+
+    previous_timing = manager.timing
+    if timing is not None:
+        manager.timing = timing
+    try:
+        exec(script_cache.get_cache().load(file), {'__name__': '__main__', '__file__': file})
+    finally:
+        manager.timing = previous_timing
 
 
 if __name__ == '__main__':
-    execute_file(sys.argv[1])
+    parser = argparse.ArgumentParser(description='Plays a recording or playback script.')
+    parser.add_argument('file', help='the event log, recording archive or playback script to play')
+    parser.add_argument('--speed', type=float, default=1.0, help='the factor playback is sped up by')
+    parser.add_argument('--max-pause', type=float, default=None, help='the longest pause, in seconds, to play')
+    parser.add_argument('--min-pause', type=float, default=0.0, help='the shortest pause, in seconds, to play')
+    parser.add_argument('--start', type=int, default=None, help='the number of the first event of a recording to play')
+    parser.add_argument('--end', type=int, default=None, help='the number of the event of a recording to stop before')
+    parser.add_argument('--start-time', type=float, default=None, help='the seconds into a recording to play from')
+    parser.add_argument('--end-time', type=float, default=None, help='the seconds into a recording to stop at')
+    arguments = parser.parse_args()
+    playback_range = None
+    if any(x is not None for x in (arguments.start, arguments.end, arguments.start_time, arguments.end_time)):
+        playback_range = recording_index.PlaybackRange(arguments.start, arguments.end, arguments.start_time,
+                                                       arguments.end_time)
+    report = execute_file(arguments.file, preprocessing.PlaybackTiming(arguments.speed, arguments.max_pause,
+                                                                       arguments.min_pause), playback_range)
+    if report is not None:
+        print("Playback scheduling error (ns):", report.summary())
@@ -0,0 +1,413 @@
+import io
+import lzma
+import struct
+import zlib
+
+import recording.constants as constants
+import recording.event_log as event_log
+import recording.exceptions as exceptions
+
+ArchiveCodec = constants.ArchiveCodec
+ArchiveError = exceptions.ArchiveError
+
+# File header: magic number, format version and the codec the chunks are compressed with.
+HEADER = struct.Struct('<4sHB')
+MAGIC = b'KFAR'
+VERSION = 1
+
+# Every chunk starts with its magic number, compressed and uncompressed sizes, number of events, first and last
+# timestamps and the CRC-32 of the uncompressed payload. The payload is a self-contained event log, window names
+# included, so every chunk can be decompressed on its own.
+CHUNK = struct.Struct('<4sIIIqqI')
+CHUNK_MAGIC = b'KFCK'
+
+# The chunk index follows the last chunk: its magic number and number of entries, an entry per chunk with the chunk's
+# offset followed by the fields of its header, and a trailer pointing back at the index.
+INDEX = struct.Struct('<4sI')
+INDEX_MAGIC = b'KFIX'
+INDEX_ENTRY = struct.Struct('<QIIIqqI')
+
+# The entries are followed by the checkpoints: their magic number and number, then the packed event log InputState
+# just before the first event of every chunk, so playback can start at any chunk without reading the ones before it.
+# Archives written without them are still read.
+CHECKPOINTS = struct.Struct('<4sI')
+CHECKPOINTS_MAGIC = b'KFCP'
+TRAILER = struct.Struct('<Q4s')
+TRAILER_MAGIC = b'KFAE'
+
+# The extension of recording archives
+EXTENSION = '.kfa'
+
+# The timestamp is the last field of an event log record
+_TIMESTAMP = -1
+
+_CODEC_IDS = {ArchiveCodec.ZLIB: 0, ArchiveCodec.LZMA: 1}
+_CODECS = {value: key for key, value in _CODEC_IDS.items()}
+
+
+def _compress(codec, data, level):
+    """
+    Compresses a chunk's payload.
+    :param codec: The ArchiveCodec.
+    :param data: The payload bytes.
+    :param level: The compression level, or None for the codec's default.
+    :return: The compressed bytes.
+    """
+    if codec == ArchiveCodec.LZMA:
+        return lzma.compress(data, preset=level)
+    return zlib.compress(data, zlib.Z_DEFAULT_COMPRESSION if level is None else level)
+
+
+def _decompress(codec, data):
+    """
+    Decompresses a chunk's payload.
+    :param codec: The ArchiveCodec.
+    :param data: The compressed bytes.
+    :return: The payload bytes.
+    """
+    if codec == ArchiveCodec.LZMA:
+        return lzma.decompress(data)
+    return zlib.decompress(data)
+
+
+def is_archive(file):
+    """
+    Checks if a file is a recording archive.
+    :param file: The string filename.
+    :return: True if the file starts with the archive's magic number, false otherwise.
+    """
+    with open(file, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+class ChunkInfo:
+    """
+    The header of a chunk of a recording archive.
+    """
+    __slots__ = ('offset', 'compressed_size', 'size', 'count', 'first_timestamp', 'last_timestamp', 'checksum')
+
+    def __init__(self, offset, compressed_size, size, count, first_timestamp, last_timestamp, checksum):
+        """
+        Initializes a new instance of the ChunkInfo class.
+        :param offset: The position of the chunk's header in the file.
+        :param compressed_size: The bytes of the compressed payload.
+        :param size: The bytes of the uncompressed payload.
+        :param count: The number of events in the chunk.
+        :param first_timestamp: The timestamp of the chunk's first event.
+        :param last_timestamp: The timestamp of the chunk's last event.
+        :param checksum: The CRC-32 of the uncompressed payload.
+        """
+        self.offset = offset
+        self.compressed_size = compressed_size
+        self.size = size
+        self.count = count
+        self.first_timestamp = first_timestamp
+        self.last_timestamp = last_timestamp
+        self.checksum = checksum
+
+
+class ArchiveWriter:
+    """
+    Streams recorded events into a recording archive. Events are buffered into chunks of up to chunk_events events,
+    each chunk is compressed and written on its own once it's full, so only one chunk is ever held in memory. The
+    chunk index is written by close.
+    """
+    DEFAULT_CHUNK_EVENTS = 4096
+
+    def __init__(self, file, codec=ArchiveCodec.ZLIB, chunk_events=DEFAULT_CHUNK_EVENTS, level=None):
+        """
+        Initializes a new instance of the ArchiveWriter class and writes the file header.
+        :param file: The binary file object to write to.
+        :param codec: The ArchiveCodec the chunks are compressed with.
+        :param chunk_events: The number of events per chunk.
+        :param level: The compression level, or None for the codec's default.
+        :exception ArgumentError: Thrown if the codec is unknown.
+        """
+        if codec not in _CODEC_IDS:
+            raise exceptions.ArgumentError("unknown archive codec: %s" % codec)
+
+        self.__file = file
+        self.__codec = codec
+        self.__chunk_events = chunk_events
+        self.__level = level
+        self.__offset = HEADER.size
+        self.__index = []
+        self.__states = []  # The packed InputState before the first event of every chunk written
+        self.__state = event_log.InputState()  # The input state after the last event added
+        self.__closed = False
+        self.__start_chunk()
+        self.events = 0  # The events written, including the ones in the chunk being built
+        self.size = 0  # The bytes of the event records before compression
+        self.__file.write(HEADER.pack(MAGIC, VERSION, _CODEC_IDS[codec]))
+
+    def __start_chunk(self):
+        """
+        Starts a new chunk, with its own table of window names.
+        """
+        self.__buffer = io.BytesIO()
+        self.__chunk_state = self.__state.pack()
+        self.__writer = event_log.EventLogWriter(self.__buffer, checkpoint_interval=0, state=self.__state)
+        self.__count = 0
+        self.__first_timestamp = 0
+        self.__last_timestamp = 0
+
+    @property
+    def chunks(self):
+        """
+        The ChunkInfos of the chunks written so far.
+        """
+        return tuple(self.__index)
+
+    def append(self, event):
+        """
+        Adds a recorded event to the archive. Named to match a list so the writer can be used as an events collection.
+        :param event: The pyHook event decorated by the WindowsListener and WindowsRecorder.
+        :exception ValueError: Thrown if the archive is closed.
+        """
+        if self.__closed:
+            raise ValueError("Event added to a closed recording archive")
+        self.__writer.append(event)
+        self.__added(event.Timestamp)
+
+    def append_record(self, record, window_name):
+        """
+        Adds an already packed event log record to the archive.
+        :param record: The unpacked event log RECORD tuple.
+        :param window_name: The window name of the record.
+        :exception ValueError: Thrown if the archive is closed.
+        """
+        if self.__closed:
+            raise ValueError("Event added to a closed recording archive")
+        self.__writer.append_record(record, window_name)
+        self.__added(record[_TIMESTAMP])
+
+    def __added(self, timestamp):
+        """
+        Counts an event added to the chunk being built, writing the chunk once it's full.
+        :param timestamp: The event's timestamp.
+        """
+        if self.__count == 0:
+            self.__first_timestamp = timestamp
+        self.__last_timestamp = timestamp
+        self.__count += 1
+        self.events += 1
+        if self.__count >= self.__chunk_events:
+            self.flush()
+
+    def flush(self):
+        """
+        Compresses and writes the chunk being built, even if it isn't full, and flushes the underlying file.
+        """
+        if self.__count:
+            payload = self.__buffer.getvalue()
+            compressed = _compress(self.__codec, payload, self.__level)
+            info = ChunkInfo(self.__offset, len(compressed), len(payload), self.__count, self.__first_timestamp,
+                             self.__last_timestamp, zlib.crc32(payload))
+            self.__file.write(CHUNK.pack(CHUNK_MAGIC, info.compressed_size, info.size, info.count,
+                                         info.first_timestamp, info.last_timestamp, info.checksum))
+            self.__file.write(compressed)
+            self.__offset += CHUNK.size + len(compressed)
+            self.__index.append(info)
+            self.__states.append(self.__chunk_state)
+            self.size += len(payload)
+            self.__start_chunk()
+        self.__file.flush()
+
+    def close(self):
+        """
+        Writes the chunk being built, the chunk index and the checkpoints. The underlying file is not closed. Nothing
+        can be added afterwards, a chunk after the index would corrupt the archive.
+        """
+        if self.__closed:
+            return
+        self.__closed = True
+        self.flush()
+
+        index_offset = self.__offset
+        self.__file.write(INDEX.pack(INDEX_MAGIC, len(self.__index)))
+        for info in self.__index:
+            self.__file.write(INDEX_ENTRY.pack(info.offset, info.compressed_size, info.size, info.count,
+                                               info.first_timestamp, info.last_timestamp, info.checksum))
+        self.__file.write(CHECKPOINTS.pack(CHECKPOINTS_MAGIC, len(self.__states)))
+        for state in self.__states:
+            self.__file.write(state)
+        self.__file.write(TRAILER.pack(index_offset, TRAILER_MAGIC))
+        self.__file.flush()
+
+
+class ArchiveReader:
+    """
+    Streams events out of a recording archive one chunk at a time, without decompressing the whole file. Files that
+    can seek also give random access to the chunks through the index. An archive whose writer never finished, such as
+    after a crash, is read up to its last complete chunk.
+    """
+
+    def __init__(self, file):
+        """
+        Initializes a new instance of the ArchiveReader class and validates the file header.
+        :param file: The binary file object to read from.
+        :exception ArchiveError: Thrown if the file is not a recording archive.
+        """
+        self.__file = file
+        header = file.read(HEADER.size)
+        if len(header) != HEADER.size:
+            raise ArchiveError("File is too short to be a recording archive")
+
+        magic, version, codec = HEADER.unpack(header)
+        if magic != MAGIC:
+            raise ArchiveError("File is not a recording archive")
+        if version != VERSION:
+            raise ArchiveError("Unsupported recording archive version: " + str(version))
+        if codec not in _CODECS:
+            raise ArchiveError("Unsupported recording archive codec: " + str(codec))
+        self.codec = _CODECS[codec]
+        self.__index = None
+        self.__chunk_states = None
+        self.__offset = HEADER.size  # The position of the next chunk read sequentially
+
+    @property
+    def index(self):
+        """
+        The ChunkInfos of every chunk, read from the index at the end of the file, or None if the file can't seek or
+        has no index.
+        """
+        if self.__index is None:
+            self.__index, self.__chunk_states = self.__read_index()
+        return self.__index or None
+
+    @property
+    def chunk_states(self):
+        """
+        The event log InputState just before the first event of every chunk, read from the end of the file, or None
+        if the file can't seek, has no index or was written without them.
+        """
+        if self.__index is None:
+            self.__index, self.__chunk_states = self.__read_index()
+        return self.__chunk_states
+
+    def __read_index(self):
+        """
+        Reads the chunk index and the checkpoints.
+        :return: Tuple of the list of ChunkInfos, empty if there's no index, and the list of InputStates, None if there
+                 are no checkpoints.
+        """
+        file = self.__file
+        try:
+            position = file.tell()
+            end = file.seek(0, io.SEEK_END)
+        except (AttributeError, OSError, io.UnsupportedOperation):
+            return [], None
+
+        try:
+            if end < HEADER.size + INDEX.size + TRAILER.size:
+                return [], None
+            file.seek(end - TRAILER.size)
+            index_offset, magic = TRAILER.unpack(file.read(TRAILER.size))
+            if magic != TRAILER_MAGIC:
+                return [], None
+            file.seek(index_offset)
+            magic, count = INDEX.unpack(file.read(INDEX.size))
+            if magic != INDEX_MAGIC:
+                raise ArchiveError("Recording archive index is corrupt")
+            data = file.read(INDEX_ENTRY.size * count)
+            if len(data) != INDEX_ENTRY.size * count:
+                raise ArchiveError("Recording archive index is truncated")
+            index = [ChunkInfo(*x) for x in INDEX_ENTRY.iter_unpack(data)]
+
+            data = file.read(end - TRAILER.size - file.tell())
+            if not data.startswith(CHECKPOINTS_MAGIC):
+                return index, None
+            try:
+                magic, count = CHECKPOINTS.unpack_from(data)
+                states = []
+                offset = CHECKPOINTS.size
+                for _ in range(count):
+                    state, offset = event_log.InputState.unpack_from(data, offset)
+                    states.append(state)
+            except struct.error:
+                raise ArchiveError("Recording archive checkpoints are truncated")
+            if len(states) != len(index):
+                raise ArchiveError("Recording archive checkpoints don't match its index")
+            return index, states
+        finally:
+            file.seek(position)
+
+    def read_chunk(self, info):
+        """
+        Decompresses a single chunk. The file must be able to seek.
+        :param info: The ChunkInfo of the chunk, from the index.
+        :return: The list of (record, window name) tuples of the chunk's events.
+        """
+        self.__file.seek(info.offset)
+        header = self.__file.read(CHUNK.size)
+        if len(header) != CHUNK.size or CHUNK.unpack(header)[0] != CHUNK_MAGIC:
+            raise ArchiveError("Recording archive chunk at %s is corrupt" % info.offset)
+        return self.__decode(info, self.__file.read(info.compressed_size))
+
+    def __decode(self, info, compressed):
+        """
+        Decompresses a chunk's payload and checks it against its checksum.
+        :param info: The ChunkInfo of the chunk.
+        :param compressed: The compressed payload.
+        :return: The list of (record, window name) tuples of the chunk's events.
+        """
+        if len(compressed) != info.compressed_size:
+            raise ArchiveError("Recording archive ends in the middle of a chunk")
+        try:
+            payload = _decompress(self.codec, compressed)
+        except (lzma.LZMAError, zlib.error) as e:
+            raise ArchiveError("Recording archive chunk at %s can't be decompressed: %s" % (info.offset, e))
+        if len(payload) != info.size or zlib.crc32(payload) != info.checksum:
+            raise ArchiveError("Recording archive chunk at %s fails its checksum" % info.offset)
+        return list(event_log.EventLogReader(io.BytesIO(payload)).records())
+
+    def seek(self, offset):
+        """
+        Moves the reader to the start of a chunk, so chunks and records carry on from there. The file must be able to
+        seek.
+        :param offset: The position of the chunk, from its ChunkInfo.
+        """
+        self.__file.seek(offset)
+        self.__offset = offset
+
+    def chunks(self):
+        """
+        Generator over the chunks in file order, reading the file sequentially so it doesn't have to seek.
+        :return: Tuples of the ChunkInfo and the list of (record, window name) tuples of the chunk's events.
+        """
+        while True:
+            offset = self.__offset
+            header = self.__file.read(CHUNK.size)
+            if len(header) < len(CHUNK_MAGIC) or header.startswith(INDEX_MAGIC):
+                return
+            if len(header) != CHUNK.size:
+                # The writer stopped in the middle of a chunk header
+                return
+            magic, compressed_size, size, count, first_timestamp, last_timestamp, checksum = CHUNK.unpack(header)
+            if magic != CHUNK_MAGIC:
+                raise ArchiveError("Recording archive chunk at %s is corrupt" % offset)
+
+            info = ChunkInfo(offset, compressed_size, size, count, first_timestamp, last_timestamp, checksum)
+            compressed = self.__file.read(compressed_size)
+            if len(compressed) != compressed_size:
+                # The writer stopped in the middle of a chunk
+                return
+            self.__offset = offset + CHUNK.size + compressed_size
+            yield info, self.__decode(info, compressed)
+
+    def records(self):
+        """
+        Generator over the raw records in the file.
+        :return: Tuples of the unpacked event log RECORD tuple and the record's window name.
+        """
+        for _, records in self.chunks():
+            for record in records:
+                yield record
+
+    def __iter__(self):
+        previous_timestamp = None
+        for record, window_name in self.records():
+            if previous_timestamp is None:
+                previous_timestamp = record[_TIMESTAMP]
+            yield event_log.RecordedEvent(record, window_name, previous_timestamp)
+            previous_timestamp = record[_TIMESTAMP]
@@ -8,3 +8,101 @@ class EventType:
     """
     MOUSE = 0
     KEYBOARD = 1
+
+
+class Modifier:
+    """
+    The modifier enumeration contains the bit flags identifying which modifier keys were held during an event.
+
+    Attributes:
+        SHIFT: Either shift key was held.
+        CTRL: Either control key was held.
+        ALT: Either alt key was held.
+    """
+    SHIFT = 1
+    CTRL = 2
+    ALT = 4
+
+
+class EventMask:
+    """
+    The event mask enumeration contains the bit flags a listener subscribes to event types with. The flag for an
+    EventType is 1 << EventType.
+
+    Attributes:
+        MOUSE: Mouse events.
+        KEYBOARD: Keyboard events.
+        ALL: Every event.
+    """
+    MOUSE = 1 << EventType.MOUSE
+    KEYBOARD = 1 << EventType.KEYBOARD
+    ALL = MOUSE | KEYBOARD
+
+
+class JobStatus:
+    """
+    The job status enumeration contains the states of a playback job run by the PlaybackWorker.
+
+    Attributes:
+        PENDING: The job is waiting for the worker.
+        RUNNING: The worker is playing the job.
+        COMPLETED: The job played to the end.
+        CANCELLED: The job was stopped before it finished.
+        FAILED: The job raised an exception.
+        CRASHED: The worker process died while playing the job.
+        TIMED_OUT: The job was stopped because it ran past its timeout.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    COMPLETED = 'completed'
+    CANCELLED = 'cancelled'
+    FAILED = 'failed'
+    CRASHED = 'crashed'
+    TIMED_OUT = 'timed out'
+
+
+class PipelineStage:
+    """
+    The pipeline stage enumeration contains the points of the capture pipeline an input event's latency is measured
+    at, always from the capture timestamp stamped when the hook callback is entered.
+
+    Attributes:
+        HOOK: The hook callback buffered the event.
+        ENQUEUE: The hook manager's sender thread put the event on the transport.
+        DEQUEUE: The input listener thread took the event off the transport.
+        DISPATCH: The input listener thread called a listener with the event.
+        RECORD: The WindowsRecorder passed the event to its recording callbacks.
+        ALL: Every stage, in pipeline order.
+    """
+    HOOK = 'hook'
+    ENQUEUE = 'enqueue'
+    DEQUEUE = 'dequeue'
+    DISPATCH = 'dispatch'
+    RECORD = 'record'
+    ALL = (HOOK, ENQUEUE, DEQUEUE, DISPATCH, RECORD)
+
+
+class PipelineGauge:
+    """
+    The pipeline gauge enumeration contains the queue depths sampled along the capture pipeline.
+
+    Attributes:
+        PENDING_EVENTS: The events buffered by the hook callbacks that the sender thread hasn't sent yet.
+        TRANSPORT_BACKLOG: The events on the transport that the input listener thread hasn't taken off yet.
+        ALL: Every gauge, in pipeline order.
+    """
+    PENDING_EVENTS = 'pending_events'
+    TRANSPORT_BACKLOG = 'transport_backlog'
+    ALL = (PENDING_EVENTS, TRANSPORT_BACKLOG)
+
+
+class ArchiveCodec:
+    """
+    The archive codec enumeration contains the compressors the chunks of a recording archive can be written with.
+
+    Attributes:
+        ZLIB: zlib, fast enough to compress while recording.
+        LZMA: lzma, slower but smaller, for recordings kept for a long time.
+    """
+    ZLIB = 'zlib'
+    LZMA = 'lzma'
@@ -0,0 +1,643 @@
+import io
+import struct
+
+import backends.base as base
+import recording.constants as constants
+import recording.exceptions as exceptions
+import utilities.converter as converter
+import utilities.string_table as string_table
+
+EventType = constants.EventType
+Modifier = constants.Modifier
+EventLogError = exceptions.EventLogError
+
+# File header: magic number and format version. Version 2 logs, which have no footer, are still read.
+HEADER = struct.Struct('<4sH')
+MAGIC = b'KFEL'
+VERSION = 3
+_READABLE_VERSIONS = (2, 3)
+
+# A single event: type, flags, modifiers, key id or mouse wheel delta, scan code, ascii, window id, x, y and the
+# monotonic nanosecond timestamp the hook captured the event at. Padded out to 32 bytes.
+RECORD = struct.Struct('<BBBxHHHxxIiiq')
+_KEY_ID = 3
+_X = 7
+_Y = 8
+_TIMESTAMP = 9
+
+# Record type used inside of a log file to define an interned string. The window id field holds the string's id, the
+# x field holds its encoded length and the string's bytes follow the record padded to a multiple of the record size.
+STRING_RECORD = 0xFF
+
+# Record type starting the footer written when a log is closed, reading the events stops at it. The footer record holds
+# the number of events, window names and checkpoints and the first and last timestamps. Every window name follows,
+# prefixed with its encoded length, then every checkpoint: the event's number, the byte offset reading resumes at and
+# the event's timestamp, followed by the packed InputState just before the event. A trailer pointing back at the
+# footer record ends the file.
+FOOTER_RECORD = 0xFE
+FOOTER = struct.Struct('<BxxxIIIqq')
+NAME_LENGTH = struct.Struct('<I')
+CHECKPOINT = struct.Struct('<qqq')
+TRAILER = struct.Struct('<Q4s')
+TRAILER_MAGIC = b'KFLE'
+
+# A packed InputState: the modifiers, which of the positions are set, the left and right button press positions, the
+# mouse position and the number of held keys, followed by the key id of every held key.
+STATE = struct.Struct('<BBiiiiiiH')
+HELD_KEY = struct.Struct('<H')
+_LEFT_HELD = 0x01
+_RIGHT_HELD = 0x02
+_POSITION_KNOWN = 0x04
+
+# Event flags
+FLAG_DOWN = 0x01
+FLAG_LEFT = 0x02
+FLAG_RIGHT = 0x04
+FLAG_INJECTED = 0x08
+FLAG_EXTENDED = 0x10
+FLAG_MOVE = 0x20
+
+
+class RecordedEvent:
+    """
+    A single event decoded from an event log. Exposes the same attributes as the pyHook events decorated by the
+    WindowsListener and WindowsRecorder so it can be used anywhere a recorded pyHook event was.
+    """
+    __slots__ = ('Type', 'KeyID', 'ScanCode', 'Ascii', 'Position', 'Is_Down', 'Is_Left', 'Is_Right', 'Is_Move',
+                 'Wheel', 'Injected', 'Extended', 'Is_Shift', 'Is_Ctrl', 'Is_Alt', 'Timestamp', 'Time', 'WindowName',
+                 'Times', 'Executable')
+
+    def __init__(self, record, window_name, previous_timestamp):
+        """
+        Initializes a new instance of the RecordedEvent class.
+        :param record: The unpacked RECORD tuple.
+        :param window_name: The window name the record's window id refers to.
+        :param previous_timestamp: The timestamp of the previous record, used to work out the event's Time.
+        """
+        event_type, flags, modifiers, key_id, scan_code, ascii_code, _, x, y, timestamp = record
+        self.Type = event_type
+        self.KeyID = key_id
+        self.ScanCode = scan_code
+        self.Ascii = ascii_code
+        self.Position = (x, y)
+        self.Is_Down = bool(flags & FLAG_DOWN)
+        self.Is_Left = bool(flags & FLAG_LEFT)
+        self.Is_Right = bool(flags & FLAG_RIGHT)
+        self.Is_Move = bool(flags & FLAG_MOVE)
+        self.Wheel = 0
+        if event_type == EventType.MOUSE:
+            # Mouse records carry the signed wheel delta in the key id
+            self.KeyID = 0
+            self.Wheel = key_id - 0x10000 if key_id & 0x8000 else key_id
+        self.Injected = bool(flags & FLAG_INJECTED)
+        self.Extended = bool(flags & FLAG_EXTENDED)
+        self.Is_Shift = bool(modifiers & Modifier.SHIFT)
+        self.Is_Ctrl = bool(modifiers & Modifier.CTRL)
+        self.Is_Alt = bool(modifiers & Modifier.ALT)
+        self.Timestamp = timestamp
+        self.Time = (timestamp - previous_timestamp) / 1000000000.0
+        self.WindowName = window_name
+        self.Times = 1
+        self.Executable = None
+
+    @property
+    def Key(self):
+        """
+        The name of the key, as pyHook would have reported it.
+        """
+        return converter.to_key_name(self.KeyID)
+
+    @property
+    def Is_Up(self):
+        """
+        Indicates if the key or button was released.
+        """
+        return not self.Is_Down
+
+
+def encode_event(event, window_id):
+    """
+    Packs a recorded event into a fixed width record.
+    :param event: The pyHook event decorated by the WindowsListener and WindowsRecorder.
+    :param window_id: The interned id of the event's window name.
+    :return: The packed bytes.
+    """
+    modifiers = 0
+    if event.Is_Shift:
+        modifiers |= Modifier.SHIFT
+    if event.Is_Ctrl:
+        modifiers |= Modifier.CTRL
+    if event.Is_Alt:
+        modifiers |= Modifier.ALT
+
+    flags = FLAG_DOWN if event.Is_Down else 0
+    if event.Injected:
+        flags |= FLAG_INJECTED
+
+    if event.Type == EventType.KEYBOARD:
+        if event.Extended:
+            flags |= FLAG_EXTENDED
+        return RECORD.pack(event.Type, flags, modifiers, event.KeyID, event.ScanCode, event.Ascii, window_id, 0, 0,
+                           event.Timestamp)
+
+    if event.Is_Left:
+        flags |= FLAG_LEFT
+    if event.Is_Right:
+        flags |= FLAG_RIGHT
+    if event.Is_Move:
+        flags |= FLAG_MOVE
+    x, y = event.Position
+    return RECORD.pack(event.Type, flags, modifiers, event.Wheel & 0xFFFF, 0, 0, window_id, x, y, event.Timestamp)
+
+
+class InputState:
+    """
+    The keys and mouse buttons held down at a point in a recording, along with the modifiers and the mouse position.
+    Keyboard steps carry their modifiers in their SendKeys command, so only the mouse buttons have to be pressed again
+    to play from the middle of a recording, such as during a drag.
+    """
+    __slots__ = ('modifiers', 'held_keys', 'left', 'right', 'position')
+
+    def __init__(self):
+        """
+        Initializes a new instance of the InputState class, with nothing held.
+        """
+        self.modifiers = 0  # The Modifier flags
+        self.held_keys = set()  # The key ids pressed and not released yet
+        self.left = None  # The position the left button was pressed at, None if it isn't held
+        self.right = None  # The position the right button was pressed at, None if it isn't held
+        self.position = None  # The last mouse position, None before the first mouse event
+
+    def copy(self):
+        """
+        Copies the state.
+        :return: The new InputState.
+        """
+        state = InputState()
+        state.modifiers = self.modifiers
+        state.held_keys = set(self.held_keys)
+        state.left = self.left
+        state.right = self.right
+        state.position = self.position
+        return state
+
+    def update(self, record):
+        """
+        Applies a recorded event to the state.
+        :param record: The unpacked RECORD tuple of the event.
+        """
+        flags = record[1]
+        self.modifiers = record[2]
+        if record[0] == EventType.KEYBOARD:
+            if flags & FLAG_DOWN:
+                self.held_keys.add(record[_KEY_ID])
+            else:
+                self.held_keys.discard(record[_KEY_ID])
+            return
+
+        position = self.position = (record[_X], record[_Y])
+        if flags & FLAG_MOVE:
+            return
+        pressed = position if flags & FLAG_DOWN else None
+        if flags & FLAG_LEFT:
+            self.left = pressed
+        if flags & FLAG_RIGHT:
+            self.right = pressed
+
+    def pack(self):
+        """
+        Packs the state, so it can be stored in a recording next to the event it was taken before.
+        :return: The packed bytes.
+        """
+        positions = ((_LEFT_HELD if self.left is not None else 0) | (_RIGHT_HELD if self.right is not None else 0) |
+                     (_POSITION_KNOWN if self.position is not None else 0))
+        left = self.left or (0, 0)
+        right = self.right or (0, 0)
+        position = self.position or (0, 0)
+        held_keys = sorted(self.held_keys)
+        return (STATE.pack(self.modifiers, positions, left[0], left[1], right[0], right[1], position[0], position[1],
+                           len(held_keys)) + b''.join(HELD_KEY.pack(x) for x in held_keys))
+
+    @staticmethod
+    def unpack_from(buffer, offset=0):
+        """
+        Unpacks a state packed by pack.
+        :param buffer: The bytes the state is in.
+        :param offset: The position of the state in the buffer.
+        :return: Tuple of the InputState and the position after it.
+        :exception struct.error: Thrown if the buffer ends before the state does.
+        """
+        modifiers, positions, left_x, left_y, right_x, right_y, x, y, count = STATE.unpack_from(buffer, offset)
+        offset += STATE.size
+        state = InputState()
+        state.modifiers = modifiers
+        state.held_keys = {HELD_KEY.unpack_from(buffer, offset + i * HELD_KEY.size)[0] for i in range(count)}
+        state.left = (left_x, left_y) if positions & _LEFT_HELD else None
+        state.right = (right_x, right_y) if positions & _RIGHT_HELD else None
+        state.position = (x, y) if positions & _POSITION_KNOWN else None
+        return state, offset + count * HELD_KEY.size
+
+    def restore_actions(self):
+        """
+        Gets the input that presses the held mouse buttons again where they were pressed and moves the mouse back to
+        its position.
+        :return: The list of Action tuples, empty if no button is held.
+        """
+        actions = [(base.Action.MOUSE_CLICK, pressed[0], pressed[1], True, is_left)
+                   for is_left, pressed in ((True, self.left), (False, self.right)) if pressed is not None]
+        if actions and self.position is not None:
+            actions.append((base.Action.MOUSE_MOVE,) + self.position)
+        return actions
+
+    def release_actions(self):
+        """
+        Gets the input that releases the held mouse buttons, so a range that ends in the middle of a drag doesn't leave
+        a button stuck down.
+        :return: The list of Action tuples, empty if no button is held.
+        """
+        if self.position is None:
+            return []
+        x, y = self.position
+        return [(base.Action.MOUSE_CLICK, x, y, False, is_left)
+                for is_left, pressed in ((True, self.left), (False, self.right)) if pressed is not None]
+
+
+class EventLogFooter:
+    """
+    The summary of an event log written when it was closed, so the log can be indexed without reading its events.
+    """
+
+    def __init__(self, data):
+        """
+        Initializes a new instance of the EventLogFooter class.
+        :param data: The bytes from the footer record to the trailer.
+        :exception EventLogError: Thrown if the footer is corrupt or truncated.
+        """
+        try:
+            record_type, self.count, names, checkpoints, self.first_timestamp, self.last_timestamp = \
+                FOOTER.unpack_from(data)
+            if record_type != FOOTER_RECORD:
+                raise EventLogError("Event log footer is corrupt")
+
+            offset = FOOTER.size
+            window_names = []
+            for _ in range(names):
+                length, = NAME_LENGTH.unpack_from(data, offset)
+                offset += NAME_LENGTH.size
+                if offset + length > len(data):
+                    raise EventLogError("Event log footer is truncated")
+                window_names.append(bytes(data[offset:offset + length]).decode('utf-8'))
+                offset += length
+            self.window_names = tuple(window_names)  # The window names, indexed by id
+
+            # The (event number, byte offset, timestamp, InputState before the event) of every checkpoint
+            self.checkpoints = []
+            for _ in range(checkpoints):
+                event, location, timestamp = CHECKPOINT.unpack_from(data, offset)
+                state, offset = InputState.unpack_from(data, offset + CHECKPOINT.size)
+                self.checkpoints.append((event, location, timestamp, state))
+        except struct.error:
+            raise EventLogError("Event log footer is truncated")
+
+
+class EventLog:
+    """
+    A compact, in-memory log of recorded events. Every event is stored as a fixed width binary record and window names
+    are interned into the log's StringTable, so a recording costs 32 bytes per event instead of a full Python object.
+    """
+
+    def __init__(self):
+        """
+        Initializes a new instance of the EventLog class.
+        """
+        self.__records = bytearray()
+        self.__window_names = string_table.StringTable()
+
+    def append(self, event):
+        """
+        Appends a recorded event to the end of the log.
+        :param event: The pyHook event decorated by the WindowsListener and WindowsRecorder.
+        """
+        self.__records += encode_event(event, self.__window_names.add(event.WindowName))
+
+    def append_record(self, record, window_name):
+        """
+        Appends an already packed record to the end of the log.
+        :param record: The unpacked RECORD tuple, its window id is ignored.
+        :param window_name: The window name of the record.
+        """
+        record = list(record)
+        record[6] = self.__window_names.add(window_name)
+        self.__records += RECORD.pack(*record)
+
+    def clear(self):
+        """
+        Removes all of the events from the log.
+        """
+        self.__records = bytearray()
+        self.__window_names.clear()
+
+    @property
+    def window_names(self):
+        """
+        The interned window names, indexed by window id.
+        """
+        return self.__window_names.strings
+
+    @property
+    def strings(self):
+        """
+        The StringTable the window names are interned in.
+        """
+        return self.__window_names
+
+    @property
+    def nbytes(self):
+        """
+        The number of bytes used by the event records.
+        """
+        return len(self.__records)
+
+    def __len__(self):
+        return len(self.__records) // RECORD.size
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("event log index out of range")
+        record = RECORD.unpack_from(self.__records, index * RECORD.size)
+        previous_timestamp = record[_TIMESTAMP]
+        if index > 0:
+            previous_timestamp = RECORD.unpack_from(self.__records, (index - 1) * RECORD.size)[_TIMESTAMP]
+        return RecordedEvent(record, self.__window_names[record[6]], previous_timestamp)
+
+    def __iter__(self):
+        previous_timestamp = None
+        for record in self.records():
+            if previous_timestamp is None:
+                previous_timestamp = record[_TIMESTAMP]
+            yield RecordedEvent(record, self.__window_names[record[6]], previous_timestamp)
+            previous_timestamp = record[_TIMESTAMP]
+
+    def records(self):
+        """
+        Generator over the raw records in the log. Records are unpacked one at a time so the log can be iterated
+        without copying it.
+        :return: The unpacked RECORD tuples.
+        """
+        records = self.__records
+        for offset in range(0, len(records), RECORD.size):
+            yield RECORD.unpack_from(records, offset)
+
+    def save(self, file):
+        """
+        Writes the log to a binary file.
+        :param file: The binary file object to write to.
+        """
+        writer = EventLogWriter(file)
+        window_names = self.__window_names
+        for record in self.records():
+            writer.append_record(record, window_names[record[6]])
+        writer.close()
+
+    @staticmethod
+    def load(file):
+        """
+        Reads a log from a binary file.
+        :param file: The binary file object to read from.
+        :return: The EventLog read from the file.
+        """
+        log = EventLog()
+        reader = EventLogReader(file)
+        for record, window_name in reader.records():
+            log.append_record(record, window_name)
+        return log
+
+
+class EventLogWriter:
+    """
+    Streams events to a binary event log file as they are recorded. The input state is followed as events are written
+    and a checkpoint of it taken every checkpoint_interval events, close writes them in the footer so playback can
+    start from the middle of the log without reading it from the start.
+    """
+    DEFAULT_CHECKPOINT_INTERVAL = 1024
+
+    def __init__(self, file, checkpoint_interval=DEFAULT_CHECKPOINT_INTERVAL, state=None):
+        """
+        Initializes a new instance of the EventLogWriter class and writes the file header.
+        :param file: The binary file object to write to.
+        :param checkpoint_interval: The events between two checkpoints, 0 to take none.
+        :param state: The InputState the written events are applied to, carried over from the events written before
+                      them elsewhere, or None to start with nothing held.
+        """
+        self.__file = file
+        self.__window_names = string_table.StringTable()
+        self.__checkpoint_interval = checkpoint_interval
+        self.__checkpoints = []  # The (event number, byte offset, timestamp, packed InputState) of every checkpoint
+        self.__offset = HEADER.size  # The bytes written so far
+        self.__closed = False
+        self.state = state if state is not None else InputState()  # The input state after the last event written
+        self.count = 0  # The number of events written
+        self.first_timestamp = 0
+        self.last_timestamp = 0
+        self.__file.write(HEADER.pack(MAGIC, VERSION))
+
+    def append(self, event):
+        """
+        Writes a recorded event to the file. Named to match a list so the writer can be used as an events collection.
+        :param event: The pyHook event decorated by the WindowsListener and WindowsRecorder.
+        :exception ValueError: Thrown if the log is closed.
+        """
+        if self.__closed:
+            raise ValueError("Event added to a closed event log")
+        location = self.__offset
+        data = encode_event(event, self.__intern(event.WindowName))
+        self.__file.write(data)
+        self.__added(location, RECORD.unpack(data))
+
+    def append_record(self, record, window_name):
+        """
+        Writes an already packed record to the file.
+        :param record: The unpacked RECORD tuple, its window id is ignored.
+        :param window_name: The window name of the record.
+        :exception ValueError: Thrown if the log is closed.
+        """
+        if self.__closed:
+            raise ValueError("Event added to a closed event log")
+        location = self.__offset
+        packed = list(record)
+        packed[6] = self.__intern(window_name)
+        self.__file.write(RECORD.pack(*packed))
+        self.__added(location, record)
+
+    def __added(self, location, record):
+        """
+        Counts a written event, taking a checkpoint before it if one is due, and applies it to the input state.
+        :param location: The byte offset the event was written at, including any window name it defined.
+        :param record: The unpacked RECORD tuple of the event.
+        """
+        timestamp = record[_TIMESTAMP]
+        if self.count == 0:
+            self.first_timestamp = timestamp
+        self.last_timestamp = timestamp
+        if self.__checkpoint_interval and self.count % self.__checkpoint_interval == 0:
+            self.__checkpoints.append((self.count, location, timestamp, self.state.pack()))
+        self.state.update(record)
+        self.count += 1
+        self.__offset += RECORD.size
+
+    def __intern(self, window_name):
+        """
+        Gets the id of a window name, writing its definition to the file if it hasn't been seen before.
+        :param window_name: The window name.
+        :return: The integer id of the window name.
+        """
+        window_id = self.__window_names.get_id(window_name)
+        if window_id is None:
+            window_id = self.__window_names.add(window_name)
+            encoded = (window_name or '').encode('utf-8')
+            padding = -len(encoded) % RECORD.size
+            self.__file.write(RECORD.pack(STRING_RECORD, 0, 0, 0, 0, 0, window_id, len(encoded), 0, 0))
+            self.__file.write(encoded + b'\0' * padding)
+            self.__offset += RECORD.size + len(encoded) + padding
+        return window_id
+
+    def flush(self):
+        """
+        Flushes the underlying file.
+        """
+        self.__file.flush()
+
+    def close(self):
+        """
+        Writes the footer with the window names and checkpoints. The underlying file is not closed. Nothing can be
+        added afterwards, reading stops at the footer.
+        """
+        if self.__closed:
+            return
+        self.__closed = True
+
+        footer_offset = self.__offset
+        window_names = self.__window_names.strings
+        file = self.__file
+        file.write(FOOTER.pack(FOOTER_RECORD, self.count, len(window_names), len(self.__checkpoints),
+                               self.first_timestamp, self.last_timestamp))
+        for window_name in window_names:
+            encoded = (window_name or '').encode('utf-8')
+            file.write(NAME_LENGTH.pack(len(encoded)))
+            file.write(encoded)
+        for event, location, timestamp, state in self.__checkpoints:
+            file.write(CHECKPOINT.pack(event, location, timestamp))
+            file.write(state)
+        file.write(TRAILER.pack(footer_offset, TRAILER_MAGIC))
+        file.flush()
+
+
+class EventLogReader:
+    """
+    Streams events out of a binary event log file without loading the whole file.
+    """
+
+    def __init__(self, file):
+        """
+        Initializes a new instance of the EventLogReader class and validates the file header.
+        :param file: The binary file object to read from.
+        :exception EventLogError: Thrown if the file is not an event log.
+        """
+        self.__file = file
+        header = file.read(HEADER.size)
+        if len(header) != HEADER.size:
+            raise EventLogError("File is too short to be an event log")
+
+        magic, version = HEADER.unpack(header)
+        if magic != MAGIC:
+            raise EventLogError("File is not an event log")
+        if version not in _READABLE_VERSIONS:
+            raise EventLogError("Unsupported event log version: " + str(version))
+        self.__version = version
+        self.__window_names = {}
+
+    def tell(self):
+        """
+        Gets the position of the file after the last record read, which is where reading resumes after a seek to it.
+        :return: The byte offset.
+        """
+        return self.__file.tell()
+
+    def seek(self, offset, window_names=()):
+        """
+        Moves the reader to a position returned by tell. The window names defined before that position aren't read
+        again, so they have to be passed in.
+        :param offset: The byte offset.
+        :param window_names: The window names defined before the offset, indexed by id.
+        """
+        self.__file.seek(offset)
+        self.__window_names = dict(enumerate(window_names))
+
+    @property
+    def window_names(self):
+        """
+        The window names defined by the records read so far, indexed by id.
+        """
+        return tuple(self.__window_names[x] for x in range(len(self.__window_names)))
+
+    def records(self):
+        """
+        Generator over the raw records in the file.
+        :return: Tuples of the unpacked RECORD tuple and the record's window name.
+        """
+        window_names = self.__window_names
+        while True:
+            data = self.__file.read(RECORD.size)
+            if not data:
+                return
+            if len(data) != RECORD.size:
+                raise EventLogError("Event log ends in the middle of a record")
+
+            record = RECORD.unpack(data)
+            if record[0] == FOOTER_RECORD:
+                return
+            if record[0] == STRING_RECORD:
+                length = record[7]
+                encoded = self.__file.read(length + (-length % RECORD.size))
+                window_names[record[6]] = encoded[:length].decode('utf-8')
+                continue
+
+            yield record, window_names[record[6]]
+
+    def read_footer(self):
+        """
+        Reads the footer written when the log was closed, without reading the events. The reader stays where it was.
+        :return: The EventLogFooter, or None if the file can't seek or has no footer, such as a log whose writer never
+                 finished.
+        :exception EventLogError: Thrown if the footer is corrupt or truncated.
+        """
+        if self.__version < 3:
+            return None
+        file = self.__file
+        try:
+            position = file.tell()
+            end = file.seek(0, io.SEEK_END)
+        except (AttributeError, OSError, io.UnsupportedOperation):
+            return None
+
+        try:
+            if end < HEADER.size + FOOTER.size + TRAILER.size:
+                return None
+            file.seek(end - TRAILER.size)
+            footer_offset, magic = TRAILER.unpack(file.read(TRAILER.size))
+            if magic != TRAILER_MAGIC or not HEADER.size <= footer_offset <= end - TRAILER.size - FOOTER.size:
+                return None
+            file.seek(footer_offset)
+            return EventLogFooter(file.read(end - TRAILER.size - footer_offset))
+        finally:
+            file.seek(position)
+
+    def __iter__(self):
+        previous_timestamp = None
+        for record, window_name in self.records():
+            if previous_timestamp is None:
+                previous_timestamp = record[_TIMESTAMP]
+            yield RecordedEvent(record, window_name, previous_timestamp)
+            previous_timestamp = record[_TIMESTAMP]
@@ -10,3 +10,24 @@ class ArgumentError(RuntimeError):
     Exception to indicate that the incorrect arguments were passed in.
     """
     pass
+
+
+class EventLogError(RuntimeError):
+    """
+    Exception to indicate that an event log could not be read.
+    """
+    pass
+
+
+class PlaybackCancelledError(RuntimeError):
+    """
+    Exception to indicate that a playback was stopped before it finished.
+    """
+    pass
+
+
+class ArchiveError(RuntimeError):
+    """
+    Exception to indicate that a recording archive could not be read.
+    """
+    pass
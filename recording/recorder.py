@@ -1,55 +1,76 @@
 from __future__ import print_function
 
-import datetime
-import os
-import win32process
-
+import recording.constants as constants
 import recording.exceptions as exceptions
+import utilities.decimation as decimation
+import utilities.instrumentation as instrumentation
 import utilities.listeners as listeners
+import utilities.window_cache as window_cache
 
 ArgumentError = exceptions.ArgumentError
+Modifier = constants.Modifier
+PipelineStage = constants.PipelineStage
+
+# Left Shift, Right Shift, Left Control, Right Control, Left Alt, Right Alt. Each gets a bit in the held key mask, in
+# this order.
+_HOLDABLE_KEYS = (160, 161, 162, 163, 164, 165)
+_SHIFT_BITS = 0b000011
+_CTRL_BITS = 0b001100
+_ALT_BITS = 0b110000
+
+# The held key mask bit of every virtual key code, 0 for keys that aren't holdable
+_HELD_KEY_BITS = tuple(1 << _HOLDABLE_KEYS.index(x) if x in _HOLDABLE_KEYS else 0 for x in range(256))
+
+# The Modifier flags of every held key mask
+_HELD_MODIFIERS = tuple((Modifier.SHIFT if held & _SHIFT_BITS else 0) |
+                        (Modifier.CTRL if held & _CTRL_BITS else 0) |
+                        (Modifier.ALT if held & _ALT_BITS else 0) for held in range(1 << len(_HOLDABLE_KEYS)))
+
+# The (Is_Shift, Is_Ctrl, Is_Alt) attributes of every combination of Modifier flags
+_MODIFIER_ATTRIBUTES = tuple((bool(x & Modifier.SHIFT), bool(x & Modifier.CTRL), bool(x & Modifier.ALT))
+                             for x in range((Modifier.SHIFT | Modifier.CTRL | Modifier.ALT) + 1))
 
 
 class WindowsRecorder:
     """
-    Hooks onto Windows keyboard and mouse events, storing a list of recorded events.
+    Hooks onto keyboard and mouse events through the input backend, storing a list of recorded events. The held
+    modifier keys are tracked as a bitmask, so key presses are handled in constant time without allocating.
     """
-    # Left Shift, Right Shift, Left Control, Right Control, Left Alt, Right Alt
-    __HOLDABLE_KEYS = [160, 161, 162, 163, 164, 165]
-    __CTRL_KEYS = [162, 163]
-    __ALT_KEYS = [164, 165]
-    __SHIFT_KEYS = [160, 161]
     __DEL = 46
 
-    def __init__(self, events_collection, process_to_ignore):
+    def __init__(self, events_collection, process_to_ignore, record_moves=False,
+                 move_tolerance=decimation.PathDecimator.DEFAULT_TOLERANCE, windows=None):
         """
         Initializes a new instance of the WindowsRecorder class.
-        :param events_collection: The list of events that have been recorded.
+        :param events_collection: The collection that recorded events are appended to, typically an EventLog.
         :param process_to_ignore: If not set to None, the process that should be ignored when recording.
+        :param record_moves: True to record mouse moves and wheel scrolls as well as clicks.
+        :param move_tolerance: The largest distance, in pixels, a dropped mouse move may be from the recorded path.
+        :param windows: The WindowCache the owners of clicked windows are looked up in, the shared one if None.
         """
         self.__listener = listeners.WindowsListener()
-        self.__keys_held_down = []
+        self.__windows = windows if windows is not None else window_cache.get_window_cache()
+        self.__held_keys = 0
         self.__recording_callbacks = []
         self.__process_to_ignore = process_to_ignore
-        self.__shift_is_held = False
-        self.__ctrl_is_held = False
-        self.__alt_is_held = False
+        self.__modifiers = 0
+        self.__record_moves = record_moves
+        self.__path_decimator = decimation.PathDecimator(move_tolerance) if record_moves else None
+        self.__pipeline = instrumentation.get_instrumentation()
 
         if events_collection is not None:
             self.events_collection = events_collection
             self.__recording_callbacks.append(lambda event: self.events_collection.append(event))
 
-        self.__time_since_last_command = datetime.datetime.now()
-
     def on_mouse_event(self, event):
         """
         Handles recording mouse events.
         :param event: The event that occurred.
         """
-        # If this message is about something happening in our process, skip it
+        # If this message is about something happening in the ignored process, skip it. Clicks tend to land in the
+        # same few windows, so the owner is almost always cached.
         if self.__process_to_ignore is not None:
-            _, events_pid = win32process.GetWindowThreadProcessId(event.Window)
-            if events_pid == os.getpid():
+            if self.__windows.get_process_id(event.Window, event.WindowName) == self.__process_to_ignore:
                 return
 
         # Record the event
@@ -70,11 +91,10 @@ class WindowsRecorder:
         Handles recording key up events. Only a subset of key up events are recorded.
         :param event: The event that occurred.
         """
-        current_held_key = [key for key in self.__keys_held_down if key.KeyID == event.KeyID]
-
-        if len(current_held_key) != 0:
-            self.__keys_held_down.remove(current_held_key[0])
-            self.__set_held_keys()
+        key_bit = _HELD_KEY_BITS[event.KeyID]
+        if self.__held_keys & key_bit:
+            self.__held_keys &= ~key_bit
+            self.__modifiers = _HELD_MODIFIERS[self.__held_keys]
             self.__record_event(event)
 
     def on_key_down_event(self, event):
@@ -83,65 +103,83 @@ class WindowsRecorder:
         :param event: The event that occurred.
         """
         # If it's a holdable key then wait for the key up
-        if event.KeyID in WindowsRecorder.__HOLDABLE_KEYS:
-            # If we already recorded this key, don't re-add it to the collection
-            if any(key.KeyID == event.KeyID for key in self.__keys_held_down):
-                return
-            self.__keys_held_down.append(event)
-            self.__set_held_keys()
+        key_bit = _HELD_KEY_BITS[event.KeyID]
+        if key_bit:
+            # If we already recorded this key, the press is just the key repeating
+            if not self.__held_keys & key_bit:
+                self.__held_keys |= key_bit
+                self.__modifiers = _HELD_MODIFIERS[self.__held_keys]
             return
 
         # If this is delete, make sure they aren't holding CTRL + ALT. If they are then windows already stole focus
         # and choked our release keys. We need to record them ourselves so we don't get into a state.
         if event.KeyID == self.__DEL:
-            ctrl_intersection = [event for event in self.__keys_held_down if event.KeyID in self.__CTRL_KEYS]
-            alt_intersection = [event for event in self.__keys_held_down if event.KeyID in self.__ALT_KEYS]
-            if len(ctrl_intersection) > 0 and len(alt_intersection) > 0:
-                self.__ctrl_is_held = False
-                self.__alt_is_held = False
+            if self.__held_keys & _CTRL_BITS and self.__held_keys & _ALT_BITS:
+                self.__modifiers &= ~(Modifier.CTRL | Modifier.ALT)
             return
 
         # Record the event
         self.__record_event(event)
 
-    def __set_held_keys(self):
-        """
-        Sets variables indicating if a modifier key is being held down.
-        """
-        keys_held = {key.KeyID for key in self.__keys_held_down}
-        self.__alt_is_held = len(set(self.__ALT_KEYS) & keys_held) > 0
-        self.__ctrl_is_held = len(set(self.__CTRL_KEYS) & keys_held) > 0
-        self.__shift_is_held = len(set(self.__SHIFT_KEYS) & keys_held) > 0
-
     def __record_event(self, event):
         """
         Record the passed in event.
         :param event: The event to record.
         """
-        # Set the time, must be done first since we're using the ill advised datetime.now call.
-        # TODO: Learn more about the time since epoch. When exactly is epoch relative to?
-        curr_time = datetime.datetime.now()
-        event.Time = (curr_time - self.__time_since_last_command).total_seconds()
-        self.__time_since_last_command = curr_time
-        event.Is_Shift = self.__shift_is_held
-        event.Is_Ctrl = self.__ctrl_is_held
-        event.Is_Alt = self.__alt_is_held
+        # The event was timestamped by the hook callback, the time between events is worked out when it's played back
+        event.Is_Shift, event.Is_Ctrl, event.Is_Alt = _MODIFIER_ATTRIBUTES[self.__modifiers]
+
+        # Mouse moves are collected into paths and only the points needed to retrace each path are recorded. The
+        # path being collected is recorded before any other event.
+        if self.__path_decimator is not None:
+            if event.Type == constants.EventType.MOUSE and event.Is_Move:
+                self.__emit_events(self.__path_decimator.append(event))
+                return
+            self.__emit_events(self.__path_decimator.flush())
 
         # Add to the events lists
+        if self.__pipeline.enabled:
+            self.__pipeline.record_stage(PipelineStage.RECORD, event.Timestamp)
         for func in self.__recording_callbacks:
             func(event)
 
+    def __emit_events(self, events):
+        """
+        Passes already decorated events to the recording callbacks.
+        :param events: The events to record.
+        """
+        for event in events:
+            if self.__pipeline.enabled:
+                self.__pipeline.record_stage(PipelineStage.RECORD, event.Timestamp)
+            for func in self.__recording_callbacks:
+                func(event)
+
+    def add_recording_callback(self, callback):
+        """
+        Adds a function that is called with every recorded event, in addition to appending to the events collection.
+        :param callback: The function to call, taking the recorded event.
+        """
+        self.__recording_callbacks.append(callback)
+
     def start(self):
         """
         Starts recording keyboard and mouse events.
         """
+        if self.__record_moves:
+            self.__listener.set_move_capture(True)
         self.__listener.add_listener(self)
 
     def stop(self):
         """
         Stops recording keyboard and mouse events.
         """
+        # Removing the listener waits for the event being recorded, so the path being collected can be flushed from
+        # this thread without racing on_mouse_event
         self.__listener.remove_listener(self)
+        if self.__record_moves:
+            self.__listener.set_move_capture(False)
+        if self.__path_decimator is not None:
+            self.__emit_events(self.__path_decimator.flush())
 
     def release(self):
         """
@@ -151,9 +189,5 @@ class WindowsRecorder:
             self.stop()
             self.__listener = None
 
-        if self.__time_since_last_command is not None:
-            self.__time_since_last_command = None
-
-        if self.__keys_held_down is not None:
-            self.__keys_held_down.clear()
-            self.__keys_held_down = None
+        self.__held_keys = 0
+        self.__modifiers = 0
@@ -2,6 +2,7 @@ class Node:
     """
     Class presenting a single node in a doubly linked list.
     """
+    __slots__ = ('value', 'next', 'prev')
 
     def __init__(self, value):
         """
@@ -16,19 +17,74 @@ class Node:
 class LinkedList:
     """
     Class presenting a doubly linked list.
+
+    An indexed list also keeps a dictionary from the key of every value to its node, so finding, removing and inserting
+    before data take constant time instead of a scan of the list. The keys of an indexed list must be unique.
     """
 
-    def __init__(self, copy=None):
+    def __init__(self, copy=None, indexed=False, key=None):
         """
         Initializes a new instance of the LinkedList class.
         :param copy: The collection to copy.
+        :param indexed: True to index the nodes by the key of their value.
+        :param key: The function that gets the key a value is indexed by, None to index the values themselves.
         """
         self.head = None
         self.tail = None
+        self.__length = 0
+        self.__index = {} if indexed else None
+        self.__key = key
 
         # Copy the collection
         if copy is not None:
-            [self.add_data(x) for x in copy]
+            self.extend(copy)
+
+    def __len__(self):
+        """
+        The number of nodes in the collection.
+        """
+        return self.__length
+
+    def __iter__(self):
+        """
+        Iterates over the values from the head to the tail. The node being visited can be removed while iterating.
+        """
+        node = self.head
+        while node is not None:
+            next_node = node.next
+            yield node.value
+            node = next_node
+
+    def __reversed__(self):
+        """
+        Iterates over the values from the tail to the head. The node being visited can be removed while iterating.
+        """
+        node = self.tail
+        while node is not None:
+            prev_node = node.prev
+            yield node.value
+            node = prev_node
+
+    def __contains__(self, data):
+        return self.find(data) is not None
+
+    @property
+    def indexed(self):
+        """
+        Indicates if the nodes are indexed by the key of their value.
+        """
+        return self.__index is not None
+
+    def nodes(self):
+        """
+        Generator over the nodes from the head to the tail. The node being visited can be removed while iterating.
+        :return: The nodes.
+        """
+        node = self.head
+        while node is not None:
+            next_node = node.next
+            yield node
+            node = next_node
 
     def add_data(self, data):
         """
@@ -37,6 +93,32 @@ class LinkedList:
         """
         self.add_node(Node(data))
 
+    def extend(self, values):
+        """
+        Creates a new node for every value and appends them to the end of the list.
+        :param values: The iterable of data to store in the Node objects.
+        """
+        if self.__index is not None:
+            add_node = self.add_node
+            for value in values:
+                add_node(Node(value))
+            return
+
+        # Link the nodes directly, there's nothing to index
+        tail = self.tail
+        added = 0
+        for value in values:
+            node = Node(value)
+            if tail is None:
+                self.head = node
+            else:
+                tail.next = node
+                node.prev = tail
+            tail = node
+            added += 1
+        self.tail = tail
+        self.__length += added
+
     def remove_data(self, data):
         """
         Removes the node with the passed in data from the list. If multiple nodes contain the same data, only the first
@@ -59,11 +141,27 @@ class LinkedList:
             raise RuntimeError("Attempt to insert before nonexistent data from the collection: " + str(data))
         self.insert_node(Node(data), node)
 
+    def __add_to_index(self, node):
+        """
+        Indexes a node by the key of its value.
+        :param node: The node to index.
+        :exception ValueError: Thrown if another node already has the same key.
+        """
+        index = self.__index
+        if index is not None:
+            key = node.value if self.__key is None else self.__key(node.value)
+            if key in index:
+                raise ValueError("The key is already in the indexed collection: " + str(key))
+            index[key] = node
+
     def add_node(self, node):
         """
         Appends a node to the end of the collection.
         :param node: The node to append to the collection.
+        :exception ValueError: Thrown if the list is indexed and already has a node with the same key.
         """
+        self.__add_to_index(node)
+        self.__length += 1
         if self.head is None:
             self.head = node
             self.tail = node
@@ -85,7 +183,11 @@ class LinkedList:
             if self.head != node:
                 raise RuntimeError("Node contained no previous node and was not the head of the list.")
             self.head = next_node
-            next_node.prev = None
+            if next_node is None:
+                # The node was the only one in the list
+                self.tail = None
+            else:
+                next_node.prev = None
 
         elif next_node is None:
             if self.tail != node:
@@ -99,18 +201,25 @@ class LinkedList:
 
         node.prev = None
         node.next = None
+        self.__length -= 1
+        if self.__index is not None:
+            del self.__index[node.value if self.__key is None else self.__key(node.value)]
 
     def insert_node(self, node, before):
         """
         Inserts a node before another node in the collection.
         :param node: The node to insert.
         :param before: The node it should be inserted before.
+        :exception ValueError: Thrown if the list is indexed and already has a node with the same key.
         """
         prev_node = before.prev
 
+        if prev_node is None and self.head != before:
+            raise RuntimeError("Before contained no previous node and was not the head of the list.")
+        self.__add_to_index(node)
+        self.__length += 1
+
         if prev_node is None:
-            if self.head != before:
-                raise RuntimeError("Before contained no previous node and was not the head of the list.")
             self.head.prev = node
             self.head = node
             node.prev = None
@@ -121,12 +230,73 @@ class LinkedList:
             before.prev = node
             node.next = before
 
+    def splice(self, other, before=None):
+        """
+        Moves every node of another list into this one, keeping their order, leaving the other list empty. The nodes
+        are relinked rather than copied, so splicing takes constant time unless this list is indexed, in which case
+        the moved nodes are indexed one by one.
+        :param other: The LinkedList to move the nodes from.
+        :param before: The node the nodes are inserted before, None to append them to the end.
+        :exception ValueError: Thrown if the list is indexed and a moved node has the same key as a node already in
+                                  it. Neither list is changed.
+        """
+        if other is self:
+            raise ValueError("Attempt to splice a collection into itself")
+        first = other.head
+        if first is None:
+            return
+        last = other.tail
+
+        if before is not None and before.prev is None and self.head != before:
+            raise RuntimeError("Before contained no previous node and was not the head of the list.")
+        index = self.__index
+        if index is not None:
+            key = self.__key
+            keys = [x.value if key is None else key(x.value) for x in other.nodes()]
+            if len(set(keys)) != len(keys) or any(x in index for x in keys):
+                raise ValueError("A spliced key is already in the indexed collection")
+            index.update(zip(keys, other.nodes()))
+        self.__length += len(other)
+        other.clear()
+
+        if before is None:
+            if self.tail is None:
+                self.head = first
+            else:
+                self.tail.next = first
+                first.prev = self.tail
+            self.tail = last
+        else:
+            prev_node = before.prev
+            if prev_node is None:
+                self.head = first
+            else:
+                prev_node.next = first
+            first.prev = prev_node
+            last.next = before
+            before.prev = last
+
+    def clear(self):
+        """
+        Removes every node from the collection. The nodes themselves are left linked to each other.
+        """
+        self.head = None
+        self.tail = None
+        self.__length = 0
+        if self.__index is not None:
+            self.__index.clear()
+
     def find(self, data):
         """
         Finds the node with a given piece of data in the collection. If multiple nodes contains the same data only the
-        first node will be returned.
+        first node will be returned. Takes constant time if the list is indexed, where the node whose value has the
+        same key as the data is returned.
         :param data: The data to search for in the collection.
+        :return: The node, None if no node holds the data.
         """
+        if self.__index is not None:
+            return self.__index.get(data if self.__key is None else self.__key(data))
+
         node = self.head
         while node is not None:
             if node.value == data:
@@ -268,3 +438,57 @@ if __name__ == "__main__":
 
     verify_forward(linked_list, [1, 2, 3, 4, 5, 6, 7, 8, 8.5, 9])
     verify_backwards(linked_list, [9, 8.5, 8, 7, 6, 5, 4, 3, 2, 1])
+
+    print('-' * 20 + 'Remove Only Node' + '-' * 20)
+    linked_list = LinkedList([1])
+    linked_list.remove_data(1)
+    if linked_list.head is not None or linked_list.tail is not None or len(linked_list) != 0:
+        raise RuntimeError("Expected an empty list after removing its only node")
+    linked_list.add_data(2)
+
+    verify_forward(linked_list, [2])
+    verify_backwards(linked_list, [2])
+
+    print('-' * 20 + 'Iteration and Length' + '-' * 20)
+    linked_list = LinkedList(range(1, 6))
+    if list(linked_list) != [1, 2, 3, 4, 5] or list(reversed(linked_list)) != [5, 4, 3, 2, 1]:
+        raise RuntimeError("Expected iteration in both directions")
+    if len(linked_list) != 5 or 3 not in linked_list or 6 in linked_list:
+        raise RuntimeError("Expected 5 nodes containing 3 but not 6")
+    print('Successfully verified: iteration and length')
+
+    for indexed in (False, True):
+        print('-' * 20 + ('Indexed ' if indexed else '') + 'Splice' + '-' * 20)
+        linked_list = LinkedList([1, 2, 6], indexed)
+        linked_list.splice(LinkedList([3, 4, 5], indexed), linked_list.find(6))
+        linked_list.splice(LinkedList([7, 8], indexed))
+        linked_list.splice(LinkedList([0], indexed), linked_list.head)
+        linked_list.splice(LinkedList())
+
+        verify_forward(linked_list, [0, 1, 2, 3, 4, 5, 6, 7, 8])
+        verify_backwards(linked_list, [8, 7, 6, 5, 4, 3, 2, 1, 0])
+        if len(linked_list) != 9 or linked_list.find(4).value != 4:
+            raise RuntimeError("Expected 9 nodes with 4 found")
+
+    print('-' * 20 + 'Indexed Data Methods' + '-' * 20)
+    linked_list = LinkedList(range(1, 11), indexed=True)
+    linked_list.remove_data(5)
+    linked_list.remove_data(1)
+    linked_list.remove_data(10)
+    linked_list.insert_data(5, 6)
+    linked_list.insert_data(1, 2)
+
+    verify_forward(linked_list, [1, 2, 3, 4, 5, 6, 7, 8, 9])
+    verify_backwards(linked_list, [9, 8, 7, 6, 5, 4, 3, 2, 1])
+    try:
+        linked_list.add_data(3)
+        raise RuntimeError("Expected a duplicate key to be rejected")
+    except ValueError:
+        print('Successfully verified: duplicate key rejected')
+
+    print('-' * 20 + 'Keyed Index' + '-' * 20)
+    linked_list = LinkedList([('a', 1), ('b', 2), ('c', 3)], indexed=True, key=lambda x: x[0])
+    linked_list.remove_data(('b', None))
+
+    verify_forward(linked_list, [('a', 1), ('c', 3)])
+    verify_backwards(linked_list, [('c', 3), ('a', 1)])
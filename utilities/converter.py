@@ -1,3 +1,7 @@
+import recording.constants as constants
+
+Modifier = constants.Modifier
+
 FROM_KEY_TO_SENDKEY = {
     'BACKSPACE': '{BACKSPACE}',
     'BACK': '{BACKSPACE}',
@@ -75,6 +79,153 @@ FROM_KEY_TO_SENDKEY = {
     'DIVIDE': '/'
 }
 
+# Virtual key codes to the key names reported by pyHook's KeyboardEvent.Key. Digits and letters are not listed since
+# their names are the ASCII character of the code.
+VIRTUAL_KEY_NAMES = {
+    0x01: 'Lbutton',
+    0x02: 'Rbutton',
+    0x03: 'Cancel',
+    0x04: 'Mbutton',
+    0x08: 'Back',
+    0x09: 'Tab',
+    0x0C: 'Clear',
+    0x0D: 'Return',
+    0x10: 'Shift',
+    0x11: 'Control',
+    0x12: 'Menu',
+    0x13: 'Pause',
+    0x14: 'Capital',
+    0x15: 'Hangul',
+    0x17: 'Junja',
+    0x18: 'Final',
+    0x19: 'Kanji',
+    0x1B: 'Escape',
+    0x1C: 'Convert',
+    0x1D: 'Nonconvert',
+    0x1E: 'Accept',
+    0x1F: 'Modechange',
+    0x20: 'Space',
+    0x21: 'Prior',
+    0x22: 'Next',
+    0x23: 'End',
+    0x24: 'Home',
+    0x25: 'Left',
+    0x26: 'Up',
+    0x27: 'Right',
+    0x28: 'Down',
+    0x29: 'Select',
+    0x2A: 'Print',
+    0x2B: 'Execute',
+    0x2C: 'Snapshot',
+    0x2D: 'Insert',
+    0x2E: 'Delete',
+    0x2F: 'Help',
+    0x5B: 'Lwin',
+    0x5C: 'Rwin',
+    0x5D: 'Apps',
+    0x60: 'Numpad0',
+    0x61: 'Numpad1',
+    0x62: 'Numpad2',
+    0x63: 'Numpad3',
+    0x64: 'Numpad4',
+    0x65: 'Numpad5',
+    0x66: 'Numpad6',
+    0x67: 'Numpad7',
+    0x68: 'Numpad8',
+    0x69: 'Numpad9',
+    0x6A: 'Multiply',
+    0x6B: 'Add',
+    0x6C: 'Separator',
+    0x6D: 'Subtract',
+    0x6E: 'Decimal',
+    0x6F: 'Divide',
+    0x70: 'F1',
+    0x71: 'F2',
+    0x72: 'F3',
+    0x73: 'F4',
+    0x74: 'F5',
+    0x75: 'F6',
+    0x76: 'F7',
+    0x77: 'F8',
+    0x78: 'F9',
+    0x79: 'F10',
+    0x7A: 'F11',
+    0x7B: 'F12',
+    0x7C: 'F13',
+    0x7D: 'F14',
+    0x7E: 'F15',
+    0x7F: 'F16',
+    0x80: 'F17',
+    0x81: 'F18',
+    0x82: 'F19',
+    0x83: 'F20',
+    0x84: 'F21',
+    0x85: 'F22',
+    0x86: 'F23',
+    0x87: 'F24',
+    0x90: 'Numlock',
+    0x91: 'Scroll',
+    0xA0: 'Lshift',
+    0xA1: 'Rshift',
+    0xA2: 'Lcontrol',
+    0xA3: 'Rcontrol',
+    0xA4: 'Lmenu',
+    0xA5: 'Rmenu',
+    0xA6: 'Browser_Back',
+    0xA7: 'Browser_Forward',
+    0xA8: 'Browser_Refresh',
+    0xA9: 'Browser_Stop',
+    0xAA: 'Browser_Search',
+    0xAB: 'Browser_Favorites',
+    0xAC: 'Browser_Home',
+    0xAD: 'Volume_Mute',
+    0xAE: 'Volume_Down',
+    0xAF: 'Volume_Up',
+    0xB0: 'Media_Next_Track',
+    0xB1: 'Media_Prev_Track',
+    0xB2: 'Media_Stop',
+    0xB3: 'Media_Play_Pause',
+    0xB4: 'Launch_Mail',
+    0xB5: 'Launch_Media_Select',
+    0xB6: 'Launch_App1',
+    0xB7: 'Launch_App2',
+    0xBA: 'Oem_1',
+    0xBB: 'Oem_Plus',
+    0xBC: 'Oem_Comma',
+    0xBD: 'Oem_Minus',
+    0xBE: 'Oem_Period',
+    0xBF: 'Oem_2',
+    0xC0: 'Oem_3',
+    0xDB: 'Oem_4',
+    0xDC: 'Oem_5',
+    0xDD: 'Oem_6',
+    0xDE: 'Oem_7',
+    0xDF: 'Oem_8',
+    0xE2: 'Oem_102',
+    0xE5: 'Processkey',
+    0xE7: 'Packet',
+    0xF6: 'Attn',
+    0xF7: 'Crsel',
+    0xF8: 'Exsel',
+    0xF9: 'Ereof',
+    0xFA: 'Play',
+    0xFB: 'Zoom',
+    0xFC: 'Noname',
+    0xFD: 'Pa1',
+    0xFE: 'Oem_Clear'
+}
+
+
+def to_key_name(key_id):
+    """
+    Translates a virtual key code to the key name pyHook would have reported for it.
+    :param key_id: The virtual key code.
+    :return: The name of the key or None if the key code is unknown.
+    """
+    if 0x30 <= key_id <= 0x39 or 0x41 <= key_id <= 0x5A:
+        return chr(key_id)
+    return VIRTUAL_KEY_NAMES.get(key_id, None)
+
 
 def to_send_key(key, ctrl, alt, shift, times):
     """
@@ -84,13 +235,25 @@ def to_send_key(key, ctrl, alt, shift, times):
     :param alt: True if alt was held down while the key was pressed, false otherwise.
     :param shift: True if shift was held down while the key was pressed, false otherwise.
     :param times: The number of times the key was pressed.
-    :return: The correct key command or None if not found.
+    :return: The correct key command, the lowercased key if SendKeys has no name for it.
     """
-    command = FROM_KEY_TO_SENDKEY.get(key.upper(), None)
+    command = FROM_KEY_TO_SENDKEY.get(key.upper(), None) or key.lower()
 
     if times and times > 1:
         command *= times
 
+    return with_modifiers(command, ctrl, alt, shift)
+
+
+def with_modifiers(command, ctrl, alt, shift):
+    """
+    Wraps a SendKeys command so it's sent while holding modifier keys.
+    :param command: The SendKeys command.
+    :param ctrl: True if ctrl is held down while the command is sent, false otherwise.
+    :param alt: True if alt is held down while the command is sent, false otherwise.
+    :param shift: True if shift is held down while the command is sent, false otherwise.
+    :return: The wrapped command.
+    """
     result = ''
     if ctrl:
         result = '^' + result
@@ -99,14 +262,89 @@ def to_send_key(key, ctrl, alt, shift, times):
     if shift:
         result = '+' + result
 
-    need_close = False
-    if result != '':
-        result += '('
-        need_close = True
+    if result == '':
+        return command
+    return result + '(' + command + ')'
+
+
+def _build_send_key_table():
+    """
+    Translates every virtual key code pressed once while holding every combination of modifier keys.
+    :return: The tuple of SendKeys commands indexed by key_id << _MODIFIER_BITS | modifiers, None for unknown keys.
+    """
+    table = []
+    for key_id in range(_KEY_IDS):
+        key = to_key_name(key_id)
+        for modifiers in range(1 << _MODIFIER_BITS):
+            table.append(None if key is None else to_send_key(key, bool(modifiers & Modifier.CTRL),
+                                                              bool(modifiers & Modifier.ALT),
+                                                              bool(modifiers & Modifier.SHIFT), 1))
+    return tuple(table)
+
+
+# The number of virtual key codes and of bits in a combination of Modifier flags
+_KEY_IDS = 256
+_MODIFIER_BITS = 3
+
+# The SendKeys command of every key pressed once, see _build_send_key_table
+_SEND_KEY_TABLE = _build_send_key_table()
+
+# The SendKeys commands of keys pressed more than once, keyed by (key_id, modifiers, times) as they're needed
+_repeated_send_keys = {}
+_MAX_REPEATED_SEND_KEYS = 4096
+
+
+def to_send_key_code(key_id, modifiers=0, times=1):
+    """
+    Translates a key stroke to the command required by SendKeys from a precomputed table, giving the same command as
+    to_send_key with the key's name.
+    :param key_id: The virtual key code.
+    :param modifiers: The Modifier flags of the keys held down while the key was pressed.
+    :param times: The number of times the key was pressed.
+    :return: The key command or None if the key code is unknown.
+    """
+    if not times or times == 1:
+        if 0 <= key_id < _KEY_IDS:
+            return _SEND_KEY_TABLE[key_id << _MODIFIER_BITS | modifiers]
+        return None
+
+    entry = (key_id, modifiers, times)
+    command = _repeated_send_keys.get(entry)
+    if command is None:
+        key = to_key_name(key_id)
+        if key is None:
+            return None
+        command = to_send_key(key, bool(modifiers & Modifier.CTRL), bool(modifiers & Modifier.ALT),
+                              bool(modifiers & Modifier.SHIFT), times)
+        if len(_repeated_send_keys) < _MAX_REPEATED_SEND_KEYS:
+            _repeated_send_keys[entry] = command
+    return command
+
+
+def to_modifiers(event):
+    """
+    Gets the Modifier flags of the keys held down while a keyboard event's key was pressed.
+    :param event: The keyboard event, decorated with Is_Shift, Is_Ctrl and Is_Alt by the recorder.
+    :return: The Modifier flags.
+    """
+    return (Modifier.SHIFT if event.Is_Shift else 0) | (Modifier.CTRL if event.Is_Ctrl else 0) | \
+        (Modifier.ALT if event.Is_Alt else 0)
 
-    result += (command or key.lower())
 
-    if need_close:
-        result += ')'
+def events_to_send_keys(events, times=None):
+    """
+    Translates a batch of keyboard events to the commands required by SendKeys.
+    :param events: The iterable of keyboard events, decorated with Is_Shift, Is_Ctrl and Is_Alt by the recorder.
+    :param times: The iterable of the number of times each event's key was pressed, None if every key was pressed
+                  once.
+    :return: The list of key commands, None for events with an unknown key code.
+    """
+    # The table and the Modifier flags are inlined, SHIFT, CTRL and ALT are the first three bits
+    table = _SEND_KEY_TABLE
+    if times is None:
+        return [table[event.KeyID << _MODIFIER_BITS | event.Is_Shift | event.Is_Ctrl << 1 | event.Is_Alt << 2]
+                if 0 <= event.KeyID < _KEY_IDS else None for event in events]
 
-    return result
+    return [table[event.KeyID << _MODIFIER_BITS | event.Is_Shift | event.Is_Ctrl << 1 | event.Is_Alt << 2]
+            if count == 1 and 0 <= event.KeyID < _KEY_IDS else to_send_key_code(event.KeyID, to_modifiers(event), count)
+            for event, count in zip(events, times)]
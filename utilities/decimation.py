@@ -0,0 +1,219 @@
+import math
+
+try:
+    import numpy
+except ImportError:  # NumPy is optional, the pure Python simplification is used without it
+    numpy = None
+
+# Paths shorter than this are simplified in pure Python even when NumPy is installed, the array overhead costs more
+# than it saves on a handful of points
+NUMPY_MIN_POINTS = 64
+
+
+def _simplify_numpy(xs, ys, tolerance):
+    """
+    Ramer-Douglas-Peucker simplification with the distances of every segment computed as NumPy arrays.
+    :param xs: The x-coordinates of the path.
+    :param ys: The y-coordinates of the path.
+    :param tolerance: The largest distance, in pixels, a dropped point may be from the simplified path.
+    :return: The sorted indices of the points kept.
+    """
+    xs = numpy.asarray(xs, dtype=numpy.float64)
+    ys = numpy.asarray(ys, dtype=numpy.float64)
+    keep = numpy.zeros(len(xs), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(xs) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+
+        dx = xs[last] - xs[first]
+        dy = ys[last] - ys[first]
+        px = xs[first + 1:last] - xs[first]
+        py = ys[first + 1:last] - ys[first]
+        length = math.hypot(dx, dy)
+        if length == 0:
+            distances = numpy.hypot(px, py)
+        else:
+            distances = numpy.abs(px * dy - py * dx) / length
+
+        index = int(numpy.argmax(distances))
+        if distances[index] > tolerance:
+            index += first + 1
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+    return numpy.flatnonzero(keep).tolist()
+
+
+def _simplify_python(xs, ys, tolerance):
+    """
+    Ramer-Douglas-Peucker simplification in pure Python.
+    :param xs: The x-coordinates of the path.
+    :param ys: The y-coordinates of the path.
+    :param tolerance: The largest distance, in pixels, a dropped point may be from the simplified path.
+    :return: The sorted indices of the points kept.
+    """
+    keep = [False] * len(xs)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(xs) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+
+        x0, y0 = xs[first], ys[first]
+        dx = xs[last] - x0
+        dy = ys[last] - y0
+        length = math.hypot(dx, dy)
+        furthest, furthest_index = -1.0, first
+        for index in range(first + 1, last):
+            px = xs[index] - x0
+            py = ys[index] - y0
+            distance = abs(px * dy - py * dx) / length if length else math.hypot(px, py)
+            if distance > furthest:
+                furthest, furthest_index = distance, index
+
+        if furthest > tolerance:
+            keep[furthest_index] = True
+            stack.append((first, furthest_index))
+            stack.append((furthest_index, last))
+    return [index for index, kept in enumerate(keep) if kept]
+
+
+def simplify(xs, ys, tolerance, use_numpy=None):
+    """
+    Simplifies a path with the Ramer-Douglas-Peucker algorithm, keeping its first and last points.
+    :param xs: The x-coordinates of the path.
+    :param ys: The y-coordinates of the path.
+    :param tolerance: The largest distance, in pixels, a dropped point may be from the simplified path.
+    :param use_numpy: True to use NumPy, false for pure Python or None to use NumPy when it's installed and the path
+                      has at least NUMPY_MIN_POINTS points.
+    :return: The sorted indices of the points kept.
+    """
+    if len(xs) < 3:
+        return list(range(len(xs)))
+    if use_numpy is None:
+        use_numpy = numpy is not None and len(xs) >= NUMPY_MIN_POINTS
+    if use_numpy:
+        return _simplify_numpy(xs, ys, tolerance)
+    return _simplify_python(xs, ys, tolerance)
+
+
+class MoveFilter:
+    """
+    Drops mouse moves that are too close in distance or time to the last move that was kept, so a high rate stream of
+    moves doesn't swamp the transport. The latest dropped move is held back, so the end of a path can be sent before
+    the next event that isn't a move.
+    """
+    # Moves closer than this many pixels to the last kept move are dropped
+    DEFAULT_MIN_DISTANCE = 3
+    # Moves sooner than this many seconds after the last kept move are dropped
+    DEFAULT_MIN_INTERVAL = 0.008
+
+    def __init__(self, min_distance=DEFAULT_MIN_DISTANCE, min_interval=DEFAULT_MIN_INTERVAL):
+        """
+        Initializes a new instance of the MoveFilter class.
+        :param min_distance: The pixels a move must be from the last kept move to be kept.
+        :param min_interval: The seconds a move must be after the last kept move to be kept.
+        """
+        self.__min_distance_squared = min_distance * min_distance
+        self.__min_interval = int(min_interval * 1000000000)
+        self.__last_x = None
+        self.__last_y = None
+        self.__last_timestamp = 0
+        self.held = None  # The latest dropped move
+
+    def accept(self, event):
+        """
+        Checks if a move should be kept.
+        :param event: The mouse move with its Position and Timestamp set.
+        :return: True if the move should be kept, false if it was dropped and is now the held move.
+        """
+        x, y = event.Position
+        if self.__last_x is not None:
+            dx = x - self.__last_x
+            dy = y - self.__last_y
+            if (dx * dx + dy * dy < self.__min_distance_squared or
+                    event.Timestamp - self.__last_timestamp < self.__min_interval):
+                self.held = event
+                return False
+
+        self.__last_x = x
+        self.__last_y = y
+        self.__last_timestamp = event.Timestamp
+        self.held = None
+        return True
+
+    def take_held(self):
+        """
+        Takes the held move, which then counts as kept.
+        :return: The held move, or None if the last move was kept.
+        """
+        held = self.held
+        if held is not None:
+            self.__last_x, self.__last_y = held.Position
+            self.__last_timestamp = held.Timestamp
+            self.held = None
+        return held
+
+
+class PathDecimator:
+    """
+    Collects mouse moves into paths and simplifies each path with the Ramer-Douglas-Peucker algorithm, so a drag is
+    replayed as a handful of points within a pixel tolerance of the original. A path ends at the first event that
+    isn't a move, at a pause longer than pause seconds or once it holds max_points moves.
+    """
+    # The largest distance, in pixels, a dropped move may be from the simplified path
+    DEFAULT_TOLERANCE = 2.0
+    # A pause this many seconds long ends a path, so hovering is kept
+    DEFAULT_PAUSE = 0.25
+    # The most moves simplified at once
+    DEFAULT_MAX_POINTS = 4096
+
+    def __init__(self, tolerance=DEFAULT_TOLERANCE, pause=DEFAULT_PAUSE, max_points=DEFAULT_MAX_POINTS,
+                 use_numpy=None):
+        """
+        Initializes a new instance of the PathDecimator class.
+        :param tolerance: The largest distance, in pixels, a dropped move may be from the simplified path.
+        :param pause: The seconds between two moves that ends a path.
+        :param max_points: The most moves simplified at once.
+        :param use_numpy: True to use NumPy, false for pure Python or None to choose per path, see simplify.
+        """
+        self.tolerance = tolerance
+        self.__pause = int(pause * 1000000000)
+        self.__max_points = max_points
+        self.__use_numpy = use_numpy
+        self.__path = []
+        self.moves = 0  # The number of moves added
+        self.kept = 0  # The number of moves kept
+
+    def append(self, event):
+        """
+        Adds a mouse move.
+        :param event: The mouse move with its Position and Timestamp set.
+        :return: The list of moves kept from the path this move ended, usually empty.
+        """
+        self.moves += 1
+        kept = []
+        path = self.__path
+        if path and (event.Timestamp - path[-1].Timestamp > self.__pause or len(path) >= self.__max_points):
+            kept = self.flush()
+        self.__path.append(event)
+        return kept
+
+    def flush(self):
+        """
+        Ends the current path.
+        :return: The list of moves kept from the path.
+        """
+        path = self.__path
+        if not path:
+            return []
+
+        self.__path = []
+        indices = simplify([x.Position[0] for x in path], [x.Position[1] for x in path], self.tolerance,
+                           self.__use_numpy)
+        self.kept += len(indices)
+        return [path[index] for index in indices]
@@ -0,0 +1,198 @@
+import atexit
+import json
+import os
+import sys
+import threading
+
+import recording.constants as constants
+import utilities.metrics as metrics
+
+PipelineGauge = constants.PipelineGauge
+PipelineStage = constants.PipelineStage
+
+# The environment variable that turns the instrumentation on when set, to the file it's dumped to at exit or - for
+# the standard error
+ENVIRONMENT_VARIABLE = 'KEY_FERRY_INSTRUMENTATION'
+
+_instrumentation = None
+
+
+class PipelineInstrumentation:
+    """
+    Per-stage latency histograms and queue depth gauges of the capture pipeline, answering how long an input event
+    took to get from the hook callback to each stage. Every stage is measured from the event's capture timestamp,
+    perf_counter_ns is system wide so the stages timed in the hook manager's process line up with the ones timed in
+    this process.
+
+    The instrumentation is off until enable is called. Callers check the enabled attribute before timing anything, so
+    when it's off the pipeline only pays for that check.
+    """
+
+    def __init__(self):
+        """
+        Initializes a new instance of the PipelineInstrumentation class.
+        """
+        self.enabled = False
+        self.__stages = {x: metrics.Histogram() for x in PipelineStage.ALL}
+        self.__gauges = {x: metrics.Gauge() for x in PipelineGauge.ALL}
+        self.__sources = []
+        self.__lock = threading.Lock()
+        self.__dump_file = None
+        self.__dump_registered = False
+
+    def enable(self, dump_file=None):
+        """
+        Starts timing the pipeline.
+        :param dump_file: The file the snapshot is written to when the program exits, - for the standard error or None
+                          to not write it.
+        """
+        with self.__lock:
+            self.enabled = True
+            if dump_file is not None:
+                self.__dump_file = dump_file
+                if not self.__dump_registered:
+                    self.__dump_registered = True
+                    atexit.register(self.__dump_at_exit)
+            sources = list(self.__sources)
+        for source in sources:
+            source.set_instrumented(True)
+
+    def disable(self):
+        """
+        Stops timing the pipeline. The samples taken so far are kept.
+        """
+        with self.__lock:
+            self.enabled = False
+            sources = list(self.__sources)
+        for source in sources:
+            source.set_instrumented(False)
+
+    def record_stage(self, stage, timestamp, now=None):
+        """
+        Records an event reaching a stage of the pipeline.
+        :param stage: The PipelineStage.
+        :param timestamp: The event's capture timestamp in nanoseconds.
+        :param now: The perf_counter_ns value the stage was reached at, the current one if None.
+        """
+        if now is None:
+            now = metrics.perf_counter_ns()
+        self.__stages[stage].record(now - timestamp)
+
+    def record_gauge(self, gauge, value):
+        """
+        Samples a queue depth.
+        :param gauge: The PipelineGauge.
+        :param value: The number of events in the queue.
+        """
+        self.__gauges[gauge].record(value)
+
+    def add_source(self, source):
+        """
+        Adds a source of stages and gauges timed in another process, such as the hook manager's process.
+        :param source: An object with a set_instrumented(enabled) method, called whenever the instrumentation is
+                       turned on or off, and a get_instrumentation() method returning a tuple of dictionaries of the
+                       Histograms of its stages and the Gauges of its gauges.
+        """
+        with self.__lock:
+            self.__sources.append(source)
+            enabled = self.enabled
+        source.set_instrumented(enabled)
+
+    def remove_source(self, source):
+        """
+        Removes a source added by add_source, keeping the samples it took so far.
+        :param source: The source to remove.
+        """
+        with self.__lock:
+            if source not in self.__sources:
+                return
+            self.__sources.remove(source)
+
+        stages, gauges = source.get_instrumentation()
+        for stage, histogram in stages.items():
+            self.__stages[stage].merge(histogram)
+        for gauge, value in gauges.items():
+            self.__gauges[gauge].samples.merge(value.samples)
+            self.__gauges[gauge].value = value.value
+
+    def snapshot(self):
+        """
+        Summarizes the samples taken so far.
+        :return: Dictionary with a 'stages' dictionary of the count, mean, p50, p95, p99 and max nanoseconds every
+                 PipelineStage was reached in and a 'gauges' dictionary of the summary of every PipelineGauge.
+        """
+        stages = {x: metrics.Histogram() for x in PipelineStage.ALL}
+        gauges = {x: metrics.Histogram() for x in PipelineGauge.ALL}
+        current = {x: self.__gauges[x].value for x in PipelineGauge.ALL}
+        for stage, histogram in self.__stages.items():
+            stages[stage].merge(histogram)
+        for gauge, value in self.__gauges.items():
+            gauges[gauge].merge(value.samples)
+
+        with self.__lock:
+            sources = list(self.__sources)
+        for source in sources:
+            source_stages, source_gauges = source.get_instrumentation()
+            for stage, histogram in source_stages.items():
+                stages[stage].merge(histogram)
+            for gauge, value in source_gauges.items():
+                gauges[gauge].merge(value.samples)
+                current[gauge] = value.value
+
+        summary = {'enabled': self.enabled, 'stages': {}, 'gauges': {}}
+        for stage in PipelineStage.ALL:
+            summary['stages'][stage] = stages[stage].summary()
+        for gauge in PipelineGauge.ALL:
+            summary['gauges'][gauge] = gauges[gauge].summary()
+            summary['gauges'][gauge]['current'] = current[gauge]
+        return summary
+
+    def reset(self):
+        """
+        Removes the samples taken in this process. Sources keep their own samples.
+        """
+        for histogram in self.__stages.values():
+            histogram.reset()
+        for gauge in self.__gauges.values():
+            gauge.reset()
+
+    def dump(self, file=None):
+        """
+        Writes the snapshot as JSON.
+        :param file: The string filename or file object to write to, the standard error if None.
+        """
+        snapshot = self.snapshot()
+        if file is None or isinstance(file, str) and file == '-':
+            file = sys.stderr
+        if isinstance(file, str):
+            with open(file, 'w') as f:
+                json.dump(snapshot, f, indent=2)
+        else:
+            json.dump(snapshot, file, indent=2)
+            file.write('\n')
+
+    def __dump_at_exit(self):
+        """
+        Writes the snapshot to the dump file when the program exits.
+        """
+        if self.__dump_file is None:
+            return
+        try:
+            self.dump(self.__dump_file)
+        except (OSError, ValueError):
+            pass
+
+
+def get_instrumentation():
+    """
+    Gets the pipeline instrumentation of this process, creating it the first time it's called. It's enabled straight
+    away when the environment variable is set.
+    :return: The shared PipelineInstrumentation.
+    """
+    global _instrumentation
+    if _instrumentation is None:
+        _instrumentation = PipelineInstrumentation()
+        dump_file = os.environ.get(ENVIRONMENT_VARIABLE)
+        if dump_file:
+            _instrumentation.enable(dump_file)
+    return _instrumentation
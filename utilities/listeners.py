@@ -1,23 +1,111 @@
 from __future__ import print_function
+import collections
 import threading
 import multiprocessing
+import traceback
 
-import pyHook
-
-import pythoncom
-
+import backends.selection as selection
 import recording.constants as constants
 import recording.exceptions as exceptions
+import utilities.decimation as decimation
+import utilities.instrumentation as instrumentation
+import utilities.metrics as metrics
+import utilities.transports as transports
 
 ArgumentError = exceptions.ArgumentError
+EventMask = constants.EventMask
+EventType = constants.EventType
+PipelineGauge = constants.PipelineGauge
+PipelineStage = constants.PipelineStage
+
+# Where each histogram is in the metrics shared by the hook manager's process: the callback time, the batch size, the
+# hook and enqueue stage latencies and the pending events depth, followed by the latest pending events depth.
+_CALLBACK_TIME_OFFSET = 0
+_BATCH_SIZE_OFFSET = metrics.Histogram.EXPORT_SIZE
+_HOOK_STAGE_OFFSET = 2 * metrics.Histogram.EXPORT_SIZE
+_ENQUEUE_STAGE_OFFSET = 3 * metrics.Histogram.EXPORT_SIZE
+_PENDING_EVENTS_OFFSET = 4 * metrics.Histogram.EXPORT_SIZE
+_PENDING_EVENTS_VALUE_OFFSET = 5 * metrics.Histogram.EXPORT_SIZE
+_HOOK_METRICS_SIZE = _PENDING_EVENTS_VALUE_OFFSET + 1
+
+
+class Subscription:
+    """
+    A listener's subscription to the WindowsListener's events.
+    """
+    __slots__ = ('listener', 'event_types', 'key_ids', 'window_names', 'callbacks', 'dispatch_time', 'errors')
+
+    def __init__(self, listener, event_types, key_ids, window_names):
+        """
+        Initializes a new instance of the Subscription class.
+        :param listener: The subscribed listener.
+        :param event_types: The EventMask of the event types delivered to the listener.
+        :param key_ids: The set of keyboard KeyIDs delivered to the listener, or None for every key.
+        :param window_names: The set of window names events are delivered from, or None for every window.
+        """
+        self.listener = listener
+        self.event_types = event_types
+        self.key_ids = key_ids
+        self.window_names = window_names
+        # The listener's handlers indexed by EventType
+        self.callbacks = (getattr(listener, 'on_mouse_event', None), getattr(listener, 'on_keyboard_event', None))
+        # Nanoseconds the listener spends handling each event
+        self.dispatch_time = metrics.Histogram()
+        # The number of events the listener raised an exception for
+        self.errors = 0
+
+
+class DispatchIndex:
+    """
+    The subscriptions to deliver each event to, precomputed whenever a listener is added or removed so dispatching an
+    event only touches the subscriptions that want it. Never modified once built, the listener thread can read it
+    while a new one is being built.
+    """
+
+    def __init__(self, subscriptions):
+        """
+        Initializes a new instance of the DispatchIndex class.
+        :param subscriptions: The subscriptions in the order they were added.
+        """
+        self.subscriptions = tuple(subscriptions)
+        self.mouse = tuple(x for x in self.subscriptions if x.event_types & EventMask.MOUSE)
+
+        # Keyboard subscriptions for every key, and for each key that was asked for the subscriptions for every key
+        # merged with the subscriptions for that key, keeping the order they were added in.
+        keyboard = [x for x in self.subscriptions if x.event_types & EventMask.KEYBOARD]
+        self.any_key = tuple(x for x in keyboard if x.key_ids is None)
+        key_ids = set()
+        for x in keyboard:
+            if x.key_ids is not None:
+                key_ids.update(x.key_ids)
+        self.by_key = {key_id: tuple(x for x in keyboard if x.key_ids is None or key_id in x.key_ids)
+                       for key_id in key_ids}
+
+    def lookup(self, event):
+        """
+        Gets the subscriptions an event may be delivered to. Window names still need to be checked.
+        :param event: The event to deliver.
+        :return: The tuple of subscriptions.
+        """
+        if event.Type == EventType.KEYBOARD:
+            return self.by_key.get(event.KeyID, self.any_key)
+        return self.mouse
 
 
 class WindowsListener:
     """
-    Hooks onto Windows keyboard and mouse events, pushing callbacks to the subscribing class.
+    Hooks onto keyboard and mouse events through the input backend, pushing callbacks to the subscribing class.
     """
     __instance = None
 
+    # The hook callbacks only buffer events, a sender thread in the hook manager's process flushes them to the
+    # listener thread once BATCH_SIZE events are waiting or BATCH_INTERVAL seconds have passed.
+    BATCH_SIZE = 32
+    BATCH_INTERVAL = 0.002
+
+    # Seconds release waits for the listener thread to close the transport
+    RELEASE_TIMEOUT = 1.0
+
     def __init__(self):
         """
         Initializes a new instance of the WindowsListener class. An object of type WindowsListener expects full use of
@@ -29,17 +117,39 @@ class WindowsListener:
         if not self.__initialized:
             self.__initialized = True
 
-            # Create the list of input listeners
-            self.__listeners = []
+            # Create the index of listener subscriptions
+            self.__dispatch_index = DispatchIndex(())
+            self.__subscriptions_lock = threading.Lock()
 
-            # Create the list that will pass information from the hook manager's
-            # process to this process.
-            manager = multiprocessing.Manager()
-            self.__inputs_queue = manager.Queue()
+            # Held by the listener thread while it delivers an event, so removing a listener can wait for it
+            self.__dispatch_lock = threading.Lock()
+
+            # The backend that captures the events
+            self.__backend = selection.get_backend()
 
-            # Create the process that will listen for inputs from the user.
-            self.__hook_manager_process = multiprocessing.Process(target=self.hook_manager_process,
-                                                                  name='Hook Manager Process')
+            # Create the transport that will pass information from the hook manager's
+            # process to this process.
+            self.__inputs_queue = transports.create_transport()
+
+            # Shared snapshot of the callback time, batch size and instrumentation histograms kept by the hook
+            # manager's process.
+            self.__hook_metrics = multiprocessing.Array('q', _HOOK_METRICS_SIZE, lock=False)
+
+            # Shared flag indicating if the hook manager's process times the pipeline stages
+            self.__instrumented = multiprocessing.Value('b', 0, lock=False)
+            instrumentation.get_instrumentation().add_source(self)
+
+            # Shared flag indicating if mouse moves and wheel scrolls are sent to the listeners
+            self.__capture_moves = multiprocessing.Value('b', 0, lock=False)
+
+            # Create the process that will listen for inputs from the user. Backends that don't need their own
+            # process, like the simulated backend, capture on a thread instead.
+            if self.__backend.IN_PROCESS:
+                self.__hook_manager_process = threading.Thread(target=self.hook_manager_process,
+                                                               name='Hook Manager Thread')
+            else:
+                self.__hook_manager_process = multiprocessing.Process(target=self.hook_manager_process,
+                                                                      name='Hook Manager Process')
             self.__hook_manager_process.daemon = True
             self.__hook_manager_process.start()
 
@@ -61,22 +171,58 @@ class WindowsListener:
             cls.__initialized = False
         return cls.__instance
 
+    def __getstate__(self):
+        """
+        Pickles the listener so it can be handed to the hook manager's process. The locks can't be pickled and are
+        left behind, the hook manager's process never touches the subscriptions.
+        """
+        state = self.__dict__.copy()
+        del state['_WindowsListener__subscriptions_lock']
+        del state['_WindowsListener__dispatch_lock']
+        return state
+
+    def __setstate__(self, state):
+        """
+        Restores a listener pickled for the hook manager's process with locks of its own.
+        """
+        self.__dict__.update(state)
+        self.__subscriptions_lock = threading.Lock()
+        self.__dispatch_lock = threading.Lock()
+
     def __hook_listener(self):
         """
-        This function is launched in a separate 'User Cancel Thread' thread which polls the output of the
-        'Key Logger Worker Process' process to determine if the user has requested the playback to stop.
+        This function is launched in a separate 'Input Listener Thread' thread which receives the events from the
+        hook manager's process and delivers them to the listeners subscribed to them.
         """
+        perf_counter_ns = metrics.perf_counter_ns
+        pipeline = instrumentation.get_instrumentation()
+        dispatch_lock = self.__dispatch_lock
         while True:
             event = self.__inputs_queue.get()
             if event is None:
+                self.__inputs_queue.close()
                 return
 
-            if event.Type == constants.EventType.KEYBOARD:
-                for x in self.__listeners:
-                    x.on_keyboard_event(event)
-            elif event.Type == constants.EventType.MOUSE:
-                for x in self.__listeners:
-                    x.on_mouse_event(event)
+            if pipeline.enabled:
+                pipeline.record_stage(PipelineStage.DEQUEUE, event.Timestamp)
+                pipeline.record_gauge(PipelineGauge.TRANSPORT_BACKLOG, self.__inputs_queue.backlog())
+
+            with dispatch_lock:
+                for subscription in self.__dispatch_index.lookup(event):
+                    if subscription.window_names is not None and event.WindowName not in subscription.window_names:
+                        continue
+
+                    start = perf_counter_ns()
+                    if pipeline.enabled:
+                        pipeline.record_stage(PipelineStage.DISPATCH, event.Timestamp, start)
+                    try:
+                        subscription.callbacks[event.Type](event)
+                    except Exception:
+                        # A failing listener mustn't keep the events from the others, such as the playback's stop key
+                        subscription.errors += 1
+                        print('[Error] Listener %r failed to handle an event:' % (subscription.listener,))
+                        traceback.print_exc()
+                    subscription.dispatch_time.record(perf_counter_ns() - start)
 
     def hook_manager_process(self):
         """
@@ -86,28 +232,120 @@ class WindowsListener:
         # Save thread identifier
         # self.__main_thread_id = win32api.GetCurrentThreadId()
 
-        # Create the hook manager
-        hook_manager = pyHook.HookManager()
+        # Create the buffer the hook callbacks append to and the thread that sends it to the listener thread
+        self.__pending_events = collections.deque()
+        self.__flush_requested = threading.Event()
+        self.__callback_time = metrics.Histogram()
+        self.__batch_sizes = metrics.Histogram()
+        self.__hook_latency = metrics.Histogram()
+        self.__enqueue_latency = metrics.Histogram()
+        self.__pending_depth = metrics.Gauge()
+        self.__move_filter = decimation.MoveFilter()
+        hook_sender_thread = threading.Thread(target=self.__hook_sender, name='Hook Sender Thread')
+        hook_sender_thread.daemon = True
+        hook_sender_thread.start()
+
+        # Capture mouse and keyboard events until the backend is stopped
+        self.__backend.capture(self.__on_mouse_event, self.__on_keyboard_event)
+
+    def __hook_sender(self):
+        """
+        This function is launched in a separate 'Hook Sender Thread' thread inside of the hook manager's process which
+        sends the events buffered by the hook callbacks to the listener thread in batches.
+        """
+        pending_events = self.__pending_events
+        while True:
+            self.__flush_requested.wait(self.BATCH_INTERVAL)
+            self.__flush_requested.clear()
+            if not pending_events:
+                continue
+
+            batch = []
+            while pending_events:
+                batch.append(pending_events.popleft())
+            self.__inputs_queue.put_many(batch)
+
+            self.__batch_sizes.record(len(batch))
+            self.__callback_time.export_to(self.__hook_metrics, _CALLBACK_TIME_OFFSET)
+            self.__batch_sizes.export_to(self.__hook_metrics, _BATCH_SIZE_OFFSET)
+            if self.__instrumented.value:
+                now = metrics.perf_counter_ns()
+                for event in batch:
+                    self.__enqueue_latency.record(now - event.Timestamp)
+                self.__hook_latency.export_to(self.__hook_metrics, _HOOK_STAGE_OFFSET)
+                self.__enqueue_latency.export_to(self.__hook_metrics, _ENQUEUE_STAGE_OFFSET)
+                self.__pending_depth.samples.export_to(self.__hook_metrics, _PENDING_EVENTS_OFFSET)
+                self.__hook_metrics[_PENDING_EVENTS_VALUE_OFFSET] = len(pending_events)
+
+    def __buffer_event(self, event, start):
+        """
+        Buffers an event for the sender thread. Called from inside of the hook callbacks so it must stay O(1).
+        :param event: The decorated event.
+        :param start: The perf_counter_ns value when the callback was entered.
+        """
+        self.__pending_events.append(event)
+        pending = len(self.__pending_events)
+        if pending >= self.BATCH_SIZE:
+            self.__flush_requested.set()
+        now = metrics.perf_counter_ns()
+        self.__callback_time.record(now - start)
+        if self.__instrumented.value:
+            # Held mouse moves were captured before this callback, so the stage is timed from the event's timestamp
+            self.__hook_latency.record(now - event.Timestamp)
+            self.__pending_depth.record(pending)
+
+    def __buffer_held_move(self, start):
+        """
+        Buffers the last mouse move dropped by the move filter, so the path ends where the mouse stopped.
+        :param start: The perf_counter_ns value when the callback was entered.
+        """
+        held = self.__move_filter.take_held()
+        if held is not None:
+            self.__buffer_event(held, start)
 
-        # Register mouse and keyboard events globally
-        hook_manager.MouseLeftDown = lambda event: WindowsListener.__on_mouse_event(self, event, is_left=True,
-                                                                                    is_down=True)
-        hook_manager.MouseLeftUp = lambda event: WindowsListener.__on_mouse_event(self, event, is_left=True, is_up=True)
-        hook_manager.MouseRightDown = lambda event: WindowsListener.__on_mouse_event(self, event, is_right=True,
-                                                                                     is_down=True)
-        hook_manager.MouseRightUp = lambda event: WindowsListener.__on_mouse_event(self, event, is_right=True,
-                                                                                   is_up=True)
-        hook_manager.KeyDown = lambda event: WindowsListener.__on_keyboard_event(self, event, True)
-        hook_manager.KeyUp = lambda event: WindowsListener.__on_keyboard_event(self, event, False)
+    def get_hook_metrics(self):
+        """
+        Gets the latest metrics published by the hook manager's process.
+        :return: Dictionary with a 'callback_ns' Histogram of the time spent inside of the hook callbacks and a
+                 'batch_size' Histogram of the number of events sent per batch.
+        """
+        return {
+            'callback_ns': metrics.Histogram.import_from(self.__hook_metrics, _CALLBACK_TIME_OFFSET),
+            'batch_size': metrics.Histogram.import_from(self.__hook_metrics, _BATCH_SIZE_OFFSET),
+        }
 
-        # Hook into the mouse and keyboard events
-        hook_manager.HookMouse()
-        hook_manager.HookKeyboard()
+    def set_instrumented(self, enabled):
+        """
+        Sets if the hook manager's process times the pipeline stages. Called by the PipelineInstrumentation.
+        :param enabled: True to time the stages, false to stop.
+        """
+        self.__instrumented.value = 1 if enabled else 0
 
-        # Suspend the thread indefinitely waiting for callbacks
-        pythoncom.PumpMessages()
+    def get_instrumentation(self):
+        """
+        Gets the latest pipeline stages and gauges published by the hook manager's process.
+        :return: Tuple of a dictionary of the Histograms of the HOOK and ENQUEUE stages and a dictionary of the
+                 PENDING_EVENTS Gauge.
+        """
+        pending_events = metrics.Gauge()
+        pending_events.samples = metrics.Histogram.import_from(self.__hook_metrics, _PENDING_EVENTS_OFFSET)
+        pending_events.value = self.__hook_metrics[_PENDING_EVENTS_VALUE_OFFSET]
+        stages = {
+            PipelineStage.HOOK: metrics.Histogram.import_from(self.__hook_metrics, _HOOK_STAGE_OFFSET),
+            PipelineStage.ENQUEUE: metrics.Histogram.import_from(self.__hook_metrics, _ENQUEUE_STAGE_OFFSET),
+        }
+        return stages, {PipelineGauge.PENDING_EVENTS: pending_events}
+
+    def set_move_capture(self, enabled):
+        """
+        Sets if mouse moves and wheel scrolls are sent to the listeners. They're dropped by the hook callbacks
+        otherwise, and moves are always thinned out by a MoveFilter before they're sent.
+        :param enabled: True to send mouse moves and wheel scrolls, false to drop them.
+        """
+        self.__capture_moves.value = 1 if enabled else 0
 
-    def __on_mouse_event(self, event, is_left=False, is_right=False, is_down=False, is_up=False):
+    def __on_mouse_event(self, event, is_left=False, is_right=False, is_down=False, is_up=False, is_move=False,
+                         is_wheel=False):
         """
         Handles recording mouse events.
         :param event: The event that occurred.
@@ -115,17 +353,35 @@ class WindowsListener:
         :param is_right: The right button was clicked.
         :param is_down: The button was pressed down.
         :param is_up: The button was released.
+        :param is_move: The mouse was moved.
+        :param is_wheel: The wheel was scrolled.
         :return: True indicating the event should be passed to other event handlers.
         """
-        event.Type = constants.EventType.MOUSE
+        # Timestamp the event first thing, everything downstream works from this capture time
+        start = event.Timestamp = metrics.perf_counter_ns()
+        if (is_move or is_wheel) and not self.__capture_moves.value:
+            return True
+
+        event.Type = EventType.MOUSE
         event.Is_Left = is_left
         event.Is_Right = is_right
         event.Is_Down = is_down
         event.Is_Up = is_up
         event.Is_Double = False
+        event.Is_Move = is_move
+        if not is_wheel:
+            event.Wheel = 0
+
+        # Moves arrive at hundreds of hertz, drop the ones too close to the last move sent. The end of a path is
+        # sent ahead of the next event that isn't a move.
+        if is_move:
+            if not self.__move_filter.accept(event):
+                return True
+        else:
+            self.__buffer_held_move(start)
 
         # Notify listeners
-        self.__inputs_queue.put(event)
+        self.__buffer_event(event, start)
 
         # print('Is_Left', event.Is_Left)
         # print('Is_Right', event.Is_Right)
@@ -153,11 +409,14 @@ class WindowsListener:
         :param is_down: The key press was down.
         :return: True indicating the event should be passed to other event handlers.
         """
-        event.Type = constants.EventType.KEYBOARD
+        # Timestamp the event first thing, everything downstream works from this capture time
+        start = event.Timestamp = metrics.perf_counter_ns()
+        event.Type = EventType.KEYBOARD
         event.Is_Down = is_down
 
         # Notify listeners
-        self.__inputs_queue.put(event)
+        self.__buffer_held_move(start)
+        self.__buffer_event(event, start)
 
         # print('Is_Down:', event.Is_Down)
         # print('MessageName:', event.MessageName)
@@ -179,39 +438,79 @@ class WindowsListener:
         # return False to stop the event from propagating
         return True
 
-    def add_listener(self, listener):
+    def add_listener(self, listener, event_types=EventMask.ALL, key_ids=None, window_names=None):
         """
-        Adds a listener to the listener list.
-        :param listener: The listener to subscribe. Listeners should have a on_mouse_event(self, event) and
+        Subscribes a listener to events.
+        :param listener: The listener to subscribe. Listeners subscribed to mouse events should have a
+                         on_mouse_event(self, event) method, listeners subscribed to keyboard events should have a
                          on_keyboard_event(self, event) method.
+        :param event_types: The EventMask of the event types to deliver.
+        :param key_ids: The iterable of keyboard KeyIDs to deliver, or None for every key.
+        :param window_names: The iterable of window names to deliver events from, or None for every window.
         :exception ValueError: Thrown if the listener is already subscribed.
         """
-        if self in self.__listeners:
-            raise ValueError("list.append(x): x already in list")
-
-        x_methods = dir(listener)
-        if 'on_mouse_event' not in x_methods:
+        if event_types & EventMask.MOUSE and 'on_mouse_event' not in dir(listener):
             raise ArgumentError("listeners must define a on_mouse_event(event) method")
-        elif 'on_keyboard_event' not in x_methods:
+        if event_types & EventMask.KEYBOARD and 'on_keyboard_event' not in dir(listener):
             raise ArgumentError("listeners must define a on_keyboard_event(event) method")
-        self.__listeners.append(listener)
+
+        subscription = Subscription(listener, event_types, None if key_ids is None else frozenset(key_ids),
+                                    None if window_names is None else frozenset(window_names))
+        with self.__subscriptions_lock:
+            subscriptions = self.__dispatch_index.subscriptions
+            if any(x.listener is listener for x in subscriptions):
+                raise ValueError("listener is already subscribed")
+            self.__dispatch_index = DispatchIndex(subscriptions + (subscription,))
 
     def remove_listener(self, listener):
         """
-        Removes a listener from the listener list.
+        Un-subscribes a listener. Waits for the event being delivered to finish, so once this returns the listener is
+        never called again and whatever it writes to can be closed.
         :param listener: The listener to un-subscribe.
         :exception ValueError: Thrown if the listener is not already subscribed.
         """
-        self.__listeners.remove(listener)
+        with self.__subscriptions_lock:
+            subscriptions = self.__dispatch_index.subscriptions
+            remaining = [x for x in subscriptions if x.listener is not listener]
+            if len(remaining) == len(subscriptions):
+                raise ValueError("listener is not subscribed")
+            self.__dispatch_index = DispatchIndex(remaining)
+
+        # Events delivered after this look up the new index. A listener removing itself from one of its own callbacks
+        # is already on the listener thread and has nothing to wait for.
+        if threading.current_thread() is not self.__input_listener_thread:
+            with self.__dispatch_lock:
+                pass
+
+    def get_dispatch_metrics(self):
+        """
+        Gets the time each subscribed listener has spent handling events, to spot a slow listener.
+        :return: Dictionary of a Histogram of the nanoseconds spent per event keyed by listener.
+        """
+        return {x.listener: x.dispatch_time for x in self.__dispatch_index.subscriptions}
+
+    def get_dispatch_errors(self):
+        """
+        Gets the number of events each subscribed listener has raised an exception for.
+        :return: Dictionary of the number of failed events keyed by listener.
+        """
+        return {x.listener: x.errors for x in self.__dispatch_index.subscriptions}
 
     def release(self):
         """
         Releases the resources used by the current instance of the class.
         """
-        self.__listeners.clear()
+        with self.__subscriptions_lock:
+            self.__dispatch_index = DispatchIndex(())
+        instrumentation.get_instrumentation().remove_source(self)
         self.__instance = None
         self.__initialized = False
-        self.__inputs_queue.put(None)
+        self.__inputs_queue.shutdown()
+        self.__backend.stop_capture()
+
+        # Give the listener thread the chance to close the transport so its shared memory isn't leaked
+        if threading.current_thread() is not self.__input_listener_thread:
+            self.__input_listener_thread.join(self.RELEASE_TIMEOUT)
 
         # These need to happen on inside of the hook manager process...but we don't care about
         # cleaning them up because we only clean up the hook manager's process when the program ends.
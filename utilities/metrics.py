@@ -0,0 +1,190 @@
+import time
+
+try:
+    perf_counter_ns = time.perf_counter_ns
+except AttributeError:  # Python < 3.7
+    def perf_counter_ns():
+        return int(time.perf_counter() * 1000000000)
+
+# Every power of two is split into 2 ** _SUB_BUCKET_BITS buckets, so a percentile is off by at most 1/8th.
+_SUB_BUCKET_BITS = 3
+_SUB_BUCKETS = 1 << _SUB_BUCKET_BITS
+_BUCKETS = 64 * _SUB_BUCKETS
+
+
+def _bucket_index(value):
+    """
+    Gets the bucket a sample falls into.
+    :param value: The non-negative integer sample.
+    :return: The bucket index.
+    """
+    shift = value.bit_length() - _SUB_BUCKET_BITS - 1
+    if shift <= 0:
+        return value
+    return (shift + 1) * _SUB_BUCKETS + (value >> shift) - _SUB_BUCKETS
+
+
+def _bucket_upper_bound(index):
+    """
+    Gets the largest sample that falls into a bucket.
+    :param index: The bucket index.
+    :return: The largest value in the bucket.
+    """
+    if index < 2 * _SUB_BUCKETS:
+        return index
+    shift = index // _SUB_BUCKETS - 1
+    mantissa = index % _SUB_BUCKETS + _SUB_BUCKETS
+    return ((mantissa + 1) << shift) - 1
+
+
+class Histogram:
+    """
+    A histogram of non-negative integer samples, such as nanoseconds or batch sizes, using logarithmic buckets.
+    Recording a sample is O(1) and the memory used is fixed no matter how many samples are recorded.
+    """
+    # The number of values export_to writes.
+    EXPORT_SIZE = _BUCKETS + 3
+
+    def __init__(self):
+        """
+        Initializes a new instance of the Histogram class.
+        """
+        self.counts = [0] * _BUCKETS
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def record(self, value):
+        """
+        Adds a sample to the histogram.
+        :param value: The non-negative integer sample.
+        """
+        value = int(value)
+        if value < 0:
+            value = 0
+        self.counts[_bucket_index(value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, fraction):
+        """
+        Gets the approximate value below which a fraction of the samples fall.
+        :param fraction: The percentile as a fraction between 0 and 1.
+        :return: The upper bound of the bucket holding the percentile, or 0 if there are no samples.
+        """
+        if self.count == 0:
+            return 0
+
+        target = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= target:
+                return min(_bucket_upper_bound(index), self.max)
+        return self.max
+
+    def mean(self):
+        """
+        Gets the mean of the samples.
+        :return: The mean, or 0 if there are no samples.
+        """
+        return self.total / self.count if self.count else 0
+
+    def merge(self, other):
+        """
+        Adds all the samples of another histogram to this one.
+        :param other: The Histogram to merge in.
+        """
+        for index, count in enumerate(other.counts):
+            self.counts[index] += count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def reset(self):
+        """
+        Removes all samples from the histogram.
+        """
+        self.counts = [0] * _BUCKETS
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def summary(self):
+        """
+        Summarizes the histogram.
+        :return: Dictionary with the count, mean, p50, p95, p99 and max of the samples.
+        """
+        return {
+            'count': self.count,
+            'mean': self.mean(),
+            'p50': self.percentile(0.50),
+            'p95': self.percentile(0.95),
+            'p99': self.percentile(0.99),
+            'max': self.max,
+        }
+
+    def export_to(self, array, offset=0):
+        """
+        Copies the histogram into a flat integer array, such as a multiprocessing.Array shared with another process.
+        :param array: The array to write EXPORT_SIZE values into.
+        :param offset: The index to start writing at.
+        """
+        array[offset] = self.count
+        array[offset + 1] = self.total
+        array[offset + 2] = self.max
+        array[offset + 3:offset + Histogram.EXPORT_SIZE] = self.counts
+
+    @staticmethod
+    def import_from(array, offset=0):
+        """
+        Creates a histogram from the values written by export_to.
+        :param array: The array to read EXPORT_SIZE values from.
+        :param offset: The index to start reading at.
+        :return: The new Histogram.
+        """
+        histogram = Histogram()
+        histogram.count = array[offset]
+        histogram.total = array[offset + 1]
+        histogram.max = array[offset + 2]
+        histogram.counts = list(array[offset + 3:offset + Histogram.EXPORT_SIZE])
+        return histogram
+
+
+class Gauge:
+    """
+    A sampled level, such as the depth of a queue: the latest sample and a histogram of every sample.
+    """
+
+    def __init__(self):
+        """
+        Initializes a new instance of the Gauge class.
+        """
+        self.value = 0
+        self.samples = Histogram()
+
+    def record(self, value):
+        """
+        Samples the level.
+        :param value: The non-negative integer level.
+        """
+        self.value = value
+        self.samples.record(value)
+
+    def reset(self):
+        """
+        Removes all samples from the gauge.
+        """
+        self.value = 0
+        self.samples.reset()
+
+    def summary(self):
+        """
+        Summarizes the gauge.
+        :return: Dictionary with the latest sample and the count, mean, p50, p95, p99 and max of the samples.
+        """
+        summary = self.samples.summary()
+        summary['current'] = self.value
+        return summary
@@ -0,0 +1,156 @@
+import multiprocessing
+import struct
+import time
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:  # Python < 3.8
+    shared_memory = None
+
+# Shared header: number of slots written, number of slots read and the shutdown flag. The counters only ever increase,
+# the slot for a counter value is counter % capacity.
+_HEADER = struct.Struct('<QQB7x')
+_WRITTEN_OFFSET = 0
+_READ_OFFSET = 8
+_SHUTDOWN_OFFSET = 16
+_COUNTER = struct.Struct('<Q')
+
+# How long the producer sleeps between checks for a free slot when the buffer is full.
+_FULL_POLL_INTERVAL = 0.0005
+
+
+def is_supported():
+    """
+    Checks if the interpreter supports shared memory ring buffers.
+    :return: True if multiprocessing.shared_memory is available, false otherwise.
+    """
+    return shared_memory is not None
+
+
+class RingBuffer:
+    """
+    A single-producer/single-consumer ring buffer of fixed size records in shared memory. One process may put records
+    and one process (or thread) may get them. Records are copied straight into the shared block, the only kernel call
+    per batch of records is the semaphore used to wake a waiting consumer.
+    """
+
+    def __init__(self, slot_size, capacity=4096):
+        """
+        Initializes a new instance of the RingBuffer class, allocating the shared memory block.
+        :param slot_size: The size in bytes of every record.
+        :param capacity: The number of records the buffer can hold before the producer has to wait.
+        """
+        self.slot_size = slot_size
+        self.capacity = capacity
+        self.__owner = True
+        self.__memory = shared_memory.SharedMemory(create=True, size=_HEADER.size + slot_size * capacity)
+        self.__buffer = self.__memory.buf
+        _HEADER.pack_into(self.__buffer, 0, 0, 0, 0)
+        self.__signal = multiprocessing.Semaphore(0)
+
+    def __getstate__(self):
+        """
+        Pickles the ring buffer so the other end can be handed to a child process.
+        """
+        return self.__memory.name, self.slot_size, self.capacity, self.__signal
+
+    def __setstate__(self, state):
+        """
+        Attaches to a ring buffer created in another process.
+        """
+        name, self.slot_size, self.capacity, self.__signal = state
+        self.__owner = False
+        self.__memory = shared_memory.SharedMemory(name=name)
+        self.__buffer = self.__memory.buf
+
+    @property
+    def is_shutdown(self):
+        """
+        Indicates if shutdown has been called by either end of the buffer.
+        """
+        return bool(self.__buffer[_SHUTDOWN_OFFSET])
+
+    def __len__(self):
+        """
+        The number of records waiting to be read.
+        """
+        buffer = self.__buffer
+        return _COUNTER.unpack_from(buffer, _WRITTEN_OFFSET)[0] - _COUNTER.unpack_from(buffer, _READ_OFFSET)[0]
+
+    def put(self, record):
+        """
+        Copies a record into the buffer. Only one process may put records. Blocks while the buffer is full.
+        :param record: The bytes to write, must be no larger than slot_size.
+        :return: False if the buffer was shut down, true otherwise.
+        """
+        return self.put_many((record,))
+
+    def put_many(self, records):
+        """
+        Copies a batch of records into the buffer, waking the consumer once for the whole batch. Only one process may
+        put records. Blocks while the buffer is full.
+        :param records: The iterable of bytes to write, each must be no larger than slot_size.
+        :return: False if the buffer was shut down, true otherwise.
+        """
+        buffer = self.__buffer
+        capacity = self.capacity
+        written = _COUNTER.unpack_from(buffer, _WRITTEN_OFFSET)[0]
+        for record in records:
+            while written - _COUNTER.unpack_from(buffer, _READ_OFFSET)[0] >= capacity:
+                if buffer[_SHUTDOWN_OFFSET]:
+                    return False
+                # Make sure the consumer is awake to drain what we've written so far
+                self.__signal.release()
+                time.sleep(_FULL_POLL_INTERVAL)
+
+            offset = _HEADER.size + (written % capacity) * self.slot_size
+            buffer[offset:offset + len(record)] = record
+            written += 1
+            _COUNTER.pack_into(buffer, _WRITTEN_OFFSET, written)
+
+        self.__signal.release()
+        return True
+
+    def get(self, timeout=None):
+        """
+        Reads the next record out of the buffer. Only one process may get records. Blocks until a record is available.
+        :param timeout: The maximum number of seconds to wait, or None to wait forever.
+        :return: The record's bytes, or None if the buffer was shut down or the timeout expired.
+        """
+        buffer = self.__buffer
+        while True:
+            read = _COUNTER.unpack_from(buffer, _READ_OFFSET)[0]
+            if read != _COUNTER.unpack_from(buffer, _WRITTEN_OFFSET)[0]:
+                offset = _HEADER.size + (read % self.capacity) * self.slot_size
+                record = bytes(buffer[offset:offset + self.slot_size])
+                _COUNTER.pack_into(buffer, _READ_OFFSET, read + 1)
+                return record
+
+            if buffer[_SHUTDOWN_OFFSET]:
+                return None
+
+            # The signal is released once per batch, so it may wake us when there is nothing left to read
+            if not self.__signal.acquire(timeout=timeout):
+                return None
+
+    def shutdown(self):
+        """
+        Wakes the consumer with the shutdown sentinel and stops the producer from waiting on a full buffer. Records
+        already in the buffer are still delivered before the sentinel.
+        """
+        self.__buffer[_SHUTDOWN_OFFSET] = 1
+        self.__signal.release()
+
+    def close(self):
+        """
+        Detaches from the shared memory block, destroying it if this instance created it.
+        """
+        if self.__memory is None:
+            return
+
+        self.__buffer.release()
+        self.__buffer = None
+        self.__memory.close()
+        if self.__owner:
+            self.__memory.unlink()
+        self.__memory = None
@@ -0,0 +1,83 @@
+class StringTable:
+    """
+    Interns the strings repeated throughout a recording, such as window names, so each distinct string is stored once
+    and events refer to it by a small integer id. Ids are handed out in the order strings are first seen, starting at
+    0, so a reader that adds the strings in the order they were written gets the same ids.
+    """
+
+    def __init__(self, strings=()):
+        """
+        Initializes a new instance of the StringTable class.
+        :param strings: The strings to add, in id order.
+        """
+        self.__strings = []
+        self.__ids = {}
+        for string in strings:
+            self.add(string)
+
+    def __len__(self):
+        """
+        The number of distinct strings in the table.
+        """
+        return len(self.__strings)
+
+    def __getitem__(self, string_id):
+        """
+        Gets the string with an id.
+        :param string_id: The integer id.
+        :return: The string.
+        """
+        return self.__strings[string_id]
+
+    def __contains__(self, string):
+        return string in self.__ids
+
+    def get_id(self, string):
+        """
+        Gets the id of a string already in the table.
+        :param string: The string.
+        :return: The integer id, or None if the string isn't in the table.
+        """
+        return self.__ids.get(string)
+
+    def add(self, string):
+        """
+        Adds a string to the table if it isn't already in it.
+        :param string: The string.
+        :return: The integer id of the string.
+        """
+        string_id = self.__ids.get(string)
+        if string_id is None:
+            string_id = self.__ids[string] = len(self.__strings)
+            self.__strings.append(string)
+        return string_id
+
+    def intern(self, string):
+        """
+        Gets the table's copy of a string, adding the string if it isn't in the table yet, so equal strings decoded
+        separately share one object.
+        :param string: The string.
+        :return: The interned string.
+        """
+        return self.__strings[self.add(string)]
+
+    def clear(self):
+        """
+        Removes every string from the table.
+        """
+        self.__strings = []
+        self.__ids = {}
+
+    @property
+    def strings(self):
+        """
+        The strings in the table, indexed by id.
+        """
+        return tuple(self.__strings)
+
+    @property
+    def nbytes(self):
+        """
+        The number of bytes the strings take encoded as UTF-8.
+        """
+        return sum(len((x or '').encode('utf-8')) for x in self.__strings)
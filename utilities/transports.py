@@ -0,0 +1,337 @@
+import collections
+import multiprocessing
+import struct
+
+import recording.constants as constants
+import utilities.converter as converter
+import utilities.ring_buffer as ring_buffer
+import utilities.string_table as string_table
+
+EventType = constants.EventType
+
+
+class Transport:
+    """
+    The transport enumeration contains the ways input events can be moved from the hook manager's process to the
+    listener thread.
+
+    Attributes:
+        QUEUE: A multiprocessing.Manager().Queue(), every put and get is a round trip to the manager's process.
+        RING_BUFFER: A shared memory ring buffer of fixed size records.
+    """
+    QUEUE = 'queue'
+    RING_BUFFER = 'ring_buffer'
+
+
+# The transport used when none is requested. Falls back to the queue when shared memory isn't supported.
+DEFAULT_TRANSPORT = Transport.RING_BUFFER
+
+# A single input event: type, flags, message, key id or wheel delta, scan code, ascii, window handle, capture timestamp
+# in nanoseconds, x, y, hook time, the id of the window name and the length of the string that follows the record.
+INPUT_RECORD = struct.Struct('<BBHHHHQqiiIIH')
+
+# Record type that defines a window name. Window names only cross the ring buffer the first time they're seen, the
+# event records refer to them by id. The string follows the record.
+STRING_RECORD = 0xFF
+
+# Window names longer than this are truncated when crossing the ring buffer.
+MAX_WINDOW_NAME = 256
+SLOT_SIZE = INPUT_RECORD.size + MAX_WINDOW_NAME
+
+# Input event flags
+FLAG_DOWN = 0x01
+FLAG_UP = 0x02
+FLAG_LEFT = 0x04
+FLAG_RIGHT = 0x08
+FLAG_INJECTED = 0x10
+FLAG_EXTENDED = 0x20
+FLAG_DOUBLE = 0x40
+FLAG_MOVE = 0x80
+
+
+class InputEvent:
+    """
+    An input event decoded from a ring buffer record. Exposes the same attributes as the pyHook events decorated by
+    the WindowsListener.
+    """
+    __slots__ = ('Type', 'Message', 'KeyID', 'ScanCode', 'Ascii', 'Window', 'WindowName', 'Position', 'Timestamp',
+                 'Time', 'Injected', 'Extended', 'Is_Down', 'Is_Up', 'Is_Left', 'Is_Right', 'Is_Double', 'Is_Move',
+                 'Wheel', 'Is_Shift', 'Is_Ctrl', 'Is_Alt')
+
+    def __init__(self, record, window_name):
+        """
+        Initializes a new instance of the InputEvent class.
+        :param record: The unpacked INPUT_RECORD tuple.
+        :param window_name: The decoded window name.
+        """
+        event_type, flags, message, key_id, scan_code, ascii_code, window, timestamp, x, y, time, _, _ = record
+        self.Type = event_type
+        self.Message = message
+        self.KeyID = key_id
+        self.ScanCode = scan_code
+        self.Ascii = ascii_code
+        self.Window = window
+        self.WindowName = window_name
+        self.Position = (x, y)
+        self.Timestamp = timestamp
+        self.Time = time
+        self.Injected = bool(flags & FLAG_INJECTED)
+        self.Extended = bool(flags & FLAG_EXTENDED)
+        self.Is_Down = bool(flags & FLAG_DOWN)
+        self.Is_Up = bool(flags & FLAG_UP)
+        self.Is_Left = bool(flags & FLAG_LEFT)
+        self.Is_Right = bool(flags & FLAG_RIGHT)
+        self.Is_Double = bool(flags & FLAG_DOUBLE)
+        self.Is_Move = bool(flags & FLAG_MOVE)
+        self.Wheel = 0
+        if event_type == EventType.MOUSE:
+            # Mouse records carry the signed wheel delta in the key id
+            self.KeyID = 0
+            self.Wheel = key_id - 0x10000 if key_id & 0x8000 else key_id
+        self.Is_Shift = False
+        self.Is_Ctrl = False
+        self.Is_Alt = False
+
+    @property
+    def Key(self):
+        """
+        The name of the key, as pyHook would have reported it.
+        """
+        return converter.to_key_name(self.KeyID)
+
+
+def encode_input_event(event, window_name_id):
+    """
+    Packs an input event decorated by the WindowsListener into a ring buffer record.
+    :param event: The event to pack.
+    :param window_name_id: The id of the event's window name, defined by an earlier string record.
+    :return: The packed bytes.
+    """
+    flags = FLAG_INJECTED if event.Injected else 0
+    if event.Is_Down:
+        flags |= FLAG_DOWN
+
+    if event.Type == EventType.KEYBOARD:
+        if event.Extended:
+            flags |= FLAG_EXTENDED
+        return INPUT_RECORD.pack(event.Type, flags, event.Message, event.KeyID, event.ScanCode, event.Ascii,
+                                 event.Window or 0, event.Timestamp, 0, 0, event.Time, window_name_id, 0)
+
+    if event.Is_Up:
+        flags |= FLAG_UP
+    if event.Is_Left:
+        flags |= FLAG_LEFT
+    if event.Is_Right:
+        flags |= FLAG_RIGHT
+    if event.Is_Double:
+        flags |= FLAG_DOUBLE
+    if event.Is_Move:
+        flags |= FLAG_MOVE
+    x, y = event.Position
+    return INPUT_RECORD.pack(event.Type, flags, event.Message, event.Wheel & 0xFFFF, 0, 0, event.Window or 0,
+                             event.Timestamp, x, y, event.Time, window_name_id, 0)
+
+
+def encode_string(string_id, string):
+    """
+    Packs the definition of a window name into a ring buffer record.
+    :param string_id: The id event records refer to the string by.
+    :param string: The string, truncated to MAX_WINDOW_NAME bytes.
+    :return: The packed bytes.
+    """
+    encoded = (string or '').encode('utf-8')[:MAX_WINDOW_NAME]
+    return INPUT_RECORD.pack(STRING_RECORD, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, string_id, len(encoded)) + encoded
+
+
+def decode_input_event(data, window_names):
+    """
+    Unpacks a ring buffer record into an InputEvent, or adds the string it defines to the window names.
+    :param data: The record's bytes.
+    :param window_names: The dictionary of the window names defined so far keyed by id.
+    :return: The decoded InputEvent, or None for a string record.
+    """
+    record = INPUT_RECORD.unpack_from(data)
+    if record[0] == STRING_RECORD:
+        start = INPUT_RECORD.size
+        window_names[record[-2]] = data[start:start + record[-1]].decode('utf-8', 'replace')
+        return None
+    return InputEvent(record, window_names[record[-2]])
+
+
+class QueueTransport:
+    """
+    Moves whole pickled events through a multiprocessing.Manager().Queue(). Batches are sent as a single list.
+    """
+
+    def __init__(self):
+        """
+        Initializes a new instance of the QueueTransport class.
+        """
+        # The proxy keeps the manager alive, so we don't need to hold on to it
+        self.__queue = multiprocessing.Manager().Queue()
+        self.__received = collections.deque()
+
+    def put(self, event):
+        """
+        Sends an event to the consumer.
+        :param event: The event to send.
+        """
+        self.__queue.put([event])
+
+    def put_many(self, events):
+        """
+        Sends a batch of events to the consumer in one round trip.
+        :param events: The list of events to send.
+        """
+        self.__queue.put(list(events))
+
+    def get(self):
+        """
+        Blocks until the next event is available.
+        :return: The next event, or None once the transport has been shut down.
+        """
+        if not self.__received:
+            batch = self.__queue.get()
+            if batch is None:
+                return None
+            self.__received.extend(batch)
+        return self.__received.popleft()
+
+    def backlog(self):
+        """
+        Gets the number of events received but not yet read. Batches still on the queue aren't counted, counting them
+        would take a round trip to the manager's process.
+        :return: The number of events.
+        """
+        return len(self.__received)
+
+    def shutdown(self):
+        """
+        Sends the shutdown sentinel to the consumer.
+        """
+        self.__queue.put(None)
+
+    def close(self):
+        """
+        Releases the resources used by the transport.
+        """
+        pass
+
+
+class RingBufferTransport:
+    """
+    Moves fixed size event records through a shared memory ring buffer. Window names are dictionary encoded, each one
+    is sent once and the events that follow refer to it by id, so every event decoded from the same window shares one
+    string.
+    """
+
+    def __init__(self, capacity=4096):
+        """
+        Initializes a new instance of the RingBufferTransport class.
+        :param capacity: The number of events that can be in flight before the producer has to wait.
+        """
+        self.__ring = ring_buffer.RingBuffer(SLOT_SIZE, capacity)
+        self.__sent_window_names = string_table.StringTable()  # Producer's side
+        self.__window_names = {}  # Consumer's side, keyed by id
+
+    def __encode(self, event, records):
+        """
+        Packs an event, preceded by the definition of its window name if it hasn't been sent yet.
+        :param event: The event to pack.
+        :param records: The list the records are appended to.
+        """
+        window_name_id = self.__sent_window_names.get_id(event.WindowName)
+        if window_name_id is None:
+            window_name_id = self.__sent_window_names.add(event.WindowName)
+            records.append(encode_string(window_name_id, event.WindowName))
+        records.append(encode_input_event(event, window_name_id))
+
+    def put(self, event):
+        """
+        Sends an event to the consumer.
+        :param event: The event to send.
+        """
+        self.put_many([event])
+
+    def put_many(self, events):
+        """
+        Sends a batch of events to the consumer, waking it once for the whole batch.
+        :param events: The list of events to send.
+        """
+        records = []
+        for event in events:
+            self.__encode(event, records)
+        self.__ring.put_many(records)
+
+    def get(self):
+        """
+        Blocks until the next event is available.
+        :return: The next event, or None once the transport has been shut down.
+        """
+        while True:
+            record = self.__ring.get()
+            if record is None:
+                return None
+            event = decode_input_event(record, self.__window_names)
+            if event is not None:
+                return event
+
+    def backlog(self):
+        """
+        Gets the number of events sent but not yet read.
+        :return: The number of events.
+        """
+        return len(self.__ring)
+
+    def shutdown(self):
+        """
+        Sends the shutdown sentinel to the consumer.
+        """
+        self.__ring.shutdown()
+
+    def close(self):
+        """
+        Releases the resources used by the transport.
+        """
+        self.__ring.close()
+
+
+def create_transport(kind=None):
+    """
+    Creates a transport for moving input events between processes.
+    :param kind: The Transport to create, DEFAULT_TRANSPORT if None.
+    :return: The new transport.
+    """
+    kind = kind or DEFAULT_TRANSPORT
+    if kind == Transport.RING_BUFFER and ring_buffer.is_supported():
+        return RingBufferTransport()
+    return QueueTransport()
+
+
+if __name__ == "__main__":
+    import types
+
+    def mouse_event(x, y, timestamp, is_down=False, is_up=False, is_left=False, is_right=False, is_double=False,
+                    is_move=False):
+        return types.SimpleNamespace(Type=EventType.MOUSE, Message=0x0200, KeyID=0, ScanCode=0, Ascii=0, Window=1,
+                                     WindowName='Window', Position=(x, y), Timestamp=timestamp, Time=0, Wheel=0,
+                                     Injected=False, Extended=False, Is_Down=is_down, Is_Up=is_up, Is_Left=is_left,
+                                     Is_Right=is_right, Is_Double=is_double, Is_Move=is_move)
+
+    print('-' * 20 + 'Mouse Flags Round Trip' + '-' * 20)
+    left_down = mouse_event(10, 20, 1000, is_down=True, is_left=True)
+    right_up = mouse_event(30, 40, 2000, is_up=True, is_right=True)
+    double_click = mouse_event(50, 60, 3000, is_down=True, is_left=True, is_double=True)
+    move = mouse_event(70, 80, 4000, is_move=True)
+
+    window_names = {}
+    decode_input_event(encode_string(0, 'Window'), window_names)
+    for name, event in (('left down', left_down), ('right up', right_up), ('double click', double_click),
+                        ('move', move)):
+        decoded = decode_input_event(encode_input_event(event, 0), window_names)
+        for attribute in ('Is_Down', 'Is_Up', 'Is_Left', 'Is_Right', 'Is_Double', 'Is_Move', 'Position',
+                          'WindowName'):
+            if getattr(decoded, attribute) != getattr(event, attribute):
+                raise RuntimeError("%s: expected %s %s, received %s" % (name, attribute, getattr(event, attribute),
+                                                                        getattr(decoded, attribute)))
+        print('Successfully verified: ' + name)
@@ -0,0 +1,152 @@
+import collections
+import threading
+import time
+
+import backends.selection as selection
+
+_window_cache = None
+
+
+class WindowInfo:
+    """
+    What's known about a window: the process that owns it and its name.
+    """
+    __slots__ = ('window', 'process_id', 'window_name', 'looked_up')
+
+    def __init__(self, window, process_id, window_name, looked_up):
+        """
+        Initializes a new instance of the WindowInfo class.
+        :param window: The window handle.
+        :param process_id: The process identifier of the window's owner.
+        :param window_name: The name of the window when it was looked up, None if it wasn't known.
+        :param looked_up: The time.monotonic() value the owner was looked up at.
+        """
+        self.window = window
+        self.process_id = process_id
+        self.window_name = window_name
+        self.looked_up = looked_up
+
+
+class WindowCache:
+    """
+    Caches the metadata of windows by window handle, so filters that check every event's window, like ignoring our
+    own process, only ask the backend about a window the first time it's seen. The least recently used windows are
+    evicted once there are more than the capacity.
+
+    Windows reuses the handles of destroyed windows, so an entry is looked up again when the event's window name no
+    longer matches the cached one. The maximum age only catches a reused handle whose new window has the same name, so
+    it's long enough for a user to keep clicking in the same windows without the backend being asked again.
+    """
+    DEFAULT_CAPACITY = 256
+
+    # Seconds an entry is trusted for before the owner is looked up again
+    DEFAULT_MAX_AGE = 300.0
+
+    def __init__(self, backend=None, capacity=DEFAULT_CAPACITY, max_age=DEFAULT_MAX_AGE):
+        """
+        Initializes a new instance of the WindowCache class.
+        :param backend: The InputBackend windows are looked up with, the default backend if None.
+        :param capacity: The number of windows kept.
+        :param max_age: The seconds an entry is trusted for, None to trust it until the window name changes.
+        """
+        self.backend = backend or selection.get_backend()
+        self.__capacity = capacity
+        self.__max_age = max_age
+        self.__windows = collections.OrderedDict()  # Window handle to WindowInfo, least recently used first
+        self.__lock = threading.Lock()
+        self.hits = 0  # Lookups answered from the cache
+        self.misses = 0  # Lookups of windows that weren't cached
+        self.invalidations = 0  # Lookups of cached windows that were renamed, reused or too old
+        self.evictions = 0  # Windows dropped to stay within the capacity
+
+    def __len__(self):
+        """
+        The number of windows cached.
+        """
+        return len(self.__windows)
+
+    @property
+    def hit_rate(self):
+        """
+        The fraction of lookups answered from the cache.
+        """
+        lookups = self.hits + self.misses + self.invalidations
+        return float(self.hits) / lookups if lookups else 0.0
+
+    def stats(self):
+        """
+        Gets the cache's counters.
+        :return: Dictionary of the hits, misses, invalidations, evictions, hit rate and windows cached.
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'invalidations': self.invalidations,
+            'evictions': self.evictions,
+            'hit_rate': self.hit_rate,
+            'windows': len(self.__windows),
+        }
+
+    def lookup(self, window, window_name=None):
+        """
+        Gets the metadata of a window, looking it up with the backend if it isn't cached or the cached entry is stale.
+        :param window: The window handle.
+        :param window_name: The window's current name, such as an event's WindowName, None if it isn't known.
+        :return: The WindowInfo.
+        """
+        now = time.monotonic()
+        with self.__lock:
+            info = self.__windows.get(window)
+            if info is not None and (window_name is None or window_name == info.window_name) and \
+                    (self.__max_age is None or now - info.looked_up < self.__max_age):
+                self.__windows.move_to_end(window)
+                self.hits += 1
+                return info
+
+            if info is not None:
+                self.invalidations += 1
+            else:
+                self.misses += 1
+
+        # Don't hold the lock while the backend is asked, it may be slow
+        info = WindowInfo(window, self.backend.get_window_process_id(window), window_name, now)
+        with self.__lock:
+            self.__windows[window] = info
+            self.__windows.move_to_end(window)
+            while len(self.__windows) > self.__capacity:
+                self.__windows.popitem(last=False)
+                self.evictions += 1
+        return info
+
+    def get_process_id(self, window, window_name=None):
+        """
+        Gets the process that owns a window.
+        :param window: The window handle.
+        :param window_name: The window's current name, such as an event's WindowName, None if it isn't known.
+        :return: The process identifier.
+        """
+        return self.lookup(window, window_name).process_id
+
+    def invalidate(self, window=None):
+        """
+        Drops a window from the cache, such as when it's known to have been destroyed.
+        :param window: The window handle, None to drop every window.
+        """
+        with self.__lock:
+            if window is None:
+                self.__windows.clear()
+            else:
+                self.__windows.pop(window, None)
+
+
+def get_window_cache():
+    """
+    Gets the window cache shared by the recorder and the filters of this process, creating it the first time it's
+    called or when the backend has changed since.
+    :return: The shared WindowCache.
+    """
+    global _window_cache
+    backend = selection.get_backend()
+    if _window_cache is None or _window_cache.backend is not backend:
+        _window_cache = WindowCache(backend)
+    return _window_cache